@@ -0,0 +1,94 @@
+"""Compare a full read of route.parquet with the row-group index on a synthetic route table.
+
+Tracks are random walks around a few cities, one exercise per day. The query is a bounding box around one city
+during one week. Example:
+
+    poetry run python benchmarks/bench_route_query.py --points 50000000 --path /tmp/bench_route
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from exif_gps_mapper import GpxMaterializer
+
+CITIES = [(60.17, 24.94), (65.01, 25.47), (61.50, 23.76), (59.33, 18.07), (52.52, 13.40)]
+POINTS_PER_EXERCISE = 5000
+
+
+def create_route(path: str, n_points: int, row_group_size: int) -> GpxMaterializer:
+    gpx_materializer = GpxMaterializer(path, row_group_size=row_group_size)
+    if os.path.exists(path) and len(pd.read_parquet(path, columns=["exercise_id"])) == n_points:
+        return gpx_materializer
+
+    rng = np.random.default_rng(0)
+    n_exercises = n_points // POINTS_PER_EXERCISE
+
+    exercise_id = np.repeat(np.arange(n_exercises, dtype="int64"), POINTS_PER_EXERCISE)
+    city = np.array(CITIES)[exercise_id % len(CITIES)]
+    steps = rng.normal(0, 1e-4, size=(n_exercises, POINTS_PER_EXERCISE, 2)).cumsum(axis=1).reshape(-1, 2)
+
+    # One exercise per day from 2000 onwards, one point per second
+    day = pd.Timestamp("2000-01-01").to_datetime64() + exercise_id.astype("timedelta64[D]")
+    second = np.tile(np.arange(POINTS_PER_EXERCISE), n_exercises).astype("timedelta64[s]")
+
+    gpx_materializer.add_columns({
+        "exercise_id": exercise_id,
+        "latitude": city[:, 0] + steps[:, 0],
+        "longitude": city[:, 1] + steps[:, 1],
+        "point_time": (day + second).astype("datetime64[ns]")
+    })
+    gpx_materializer.close()
+
+    return gpx_materializer
+
+
+def full_read(path: str, bbox: tuple, start, end) -> pd.DataFrame:
+    # The pd.read_parquet based query before the index
+    df = pd.read_parquet(path)
+    south, west, north, east = bbox
+
+    return df[
+        df["latitude"].between(south, north) & df["longitude"].between(west, east) &
+        (df.index >= start) & (df.index <= end)
+    ]
+
+
+def timed(func, *args) -> tuple[float, int]:
+    started = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - started, len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default="bench_route", help="Where the synthetic table is created (reused if found)")
+    parser.add_argument("--points", type=int, default=50_000_000)
+    parser.add_argument("--row-group-size", type=int, default=65536)
+    args = parser.parse_args()
+
+    os.makedirs(args.path, exist_ok=True)
+    path = os.path.join(args.path, "route.parquet")
+
+    print(f"[INFO] Creating {args.points} route points in {path}")
+    gpx_materializer = create_route(path, args.points, args.row_group_size)
+
+    # Helsinki, one week in the middle of the table
+    bbox = (60.0, 24.7, 60.3, 25.2)
+    start = pd.Timestamp("2000-01-01") + pd.Timedelta(days=args.points // POINTS_PER_EXERCISE // 2)
+    end = start + pd.Timedelta(days=7)
+
+    full_seconds, n_full = timed(full_read, path, bbox, start, end)
+    index_seconds, n_index = timed(gpx_materializer.query, bbox, start, end)
+
+    assert n_full == n_index, f"Queries disagree: {n_full} != {n_index}"
+
+    print(f"full read    : {full_seconds:8.3f} s ({n_full} points)")
+    print(f"route index  : {index_seconds:8.3f} s ({n_index} points)")
+    print(f"speed-up     : {full_seconds / index_seconds:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Compare the directory walkers on a synthetic image tree.
+
+The legacy maintenance run (`upsert` followed by `apply_deletes`) walked the tree twice with os.walk. `sync` walks it
+once with the os.scandir based walker. Example:
+
+    poetry run python benchmarks/bench_scan.py --files 1000000 --path /tmp/bench_tree
+"""
+import argparse
+import os
+import time
+
+from exif_gps_mapper.helpers.scanner import scan_tree
+
+
+def legacy_scan(lookup_path: str, ignore_dirs: list, file_extensions: list) -> dict:
+    # The os.walk based scan_images before the scandir walker, including its per-file stat
+    found_images = {}
+
+    for root, dirs, file_names in os.walk(lookup_path, topdown=True):
+
+        dirs[:] = set(dirs) - set(ignore_dirs)
+
+        for file_name in file_names:
+            e = [x.lower() for x in file_extensions]
+            fn = file_name.lower()
+
+            if fn.endswith(tuple(e)):
+                full_path = os.path.normpath(os.path.join(os.path.abspath(root), file_name))
+                st = os.stat(full_path)
+                found_images[full_path] = (st.st_mtime_ns, st.st_size)
+
+    return found_images
+
+
+def create_tree(path: str, n_files: int, files_per_dir: int):
+    # Year/album layout. Every tenth file is a sidecar that the scan must skip.
+    marker = os.path.join(path, f".complete-{n_files}-{files_per_dir}")
+    if os.path.exists(marker):
+        return
+
+    for i in range(0, n_files, files_per_dir):
+        directory = os.path.join(path, f"{2000 + i // (files_per_dir * 100)}", f"album_{i // files_per_dir:06d}")
+        os.makedirs(directory, exist_ok=True)
+
+        for j in range(i, min(i + files_per_dir, n_files)):
+            extension = ".xmp" if j % 10 == 0 else ".NEF"
+            open(os.path.join(directory, f"DSC_{j:07d}{extension}"), "w").close()
+
+    open(marker, "w").close()
+
+
+def timed(func, *args) -> tuple[float, int]:
+    started = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - started, len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default="bench_tree", help="Where the synthetic tree is created (reused if found)")
+    parser.add_argument("--files", type=int, default=1_000_000)
+    parser.add_argument("--files-per-dir", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"[INFO] Creating {args.files} files under {args.path}")
+    create_tree(args.path, args.files, args.files_per_dir)
+
+    ignore_dirs = ["Trash", "Cache"]
+    extensions = [".nef"]
+
+    # Two walks: upsert and apply_deletes each scanned the tree
+    legacy_seconds = 0.0
+    for _ in range(2):
+        seconds, n_legacy = timed(legacy_scan, args.path, ignore_dirs, extensions)
+        legacy_seconds += seconds
+
+    sync_seconds, n_sync = timed(scan_tree, args.path, ignore_dirs, extensions)
+
+    assert n_legacy == n_sync, f"Walkers disagree: {n_legacy} != {n_sync}"
+
+    print(f"legacy os.walk x2 : {legacy_seconds:8.2f} s ({n_legacy} images)")
+    print(f"sync scandir x1   : {sync_seconds:8.2f} s ({n_sync} images)")
+    print(f"speed-up          : {legacy_seconds / sync_seconds:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
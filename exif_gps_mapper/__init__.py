@@ -2,3 +2,8 @@ from exif_gps_mapper.materialisers.exercise_materializer import ExerciseMaterial
 from exif_gps_mapper.materialisers.gpx_materializer import GpxMaterializer
 from exif_gps_mapper.accesslink.transaction_pool import TransactionPool
 from exif_gps_mapper.exifdatabase import ExifDatabase
+from exif_gps_mapper.route_joiner import RouteJoiner
+from exif_gps_mapper.incremental_join import IncrementalJoiner
+from exif_gps_mapper.geotag_writer import GeotagWriter
+from exif_gps_mapper.preview_cache import PreviewCache
+from exif_gps_mapper.map_export import MapExporter
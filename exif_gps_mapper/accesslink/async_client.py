@@ -0,0 +1,160 @@
+import asyncio
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from exif_gps_mapper.accesslink.session import AccesslinkSession
+from exif_gps_mapper.accesslink.transaction import Transaction
+from exif_gps_mapper.accesslink.transaction_pool import TransactionPool
+
+
+class AsyncAccesslinkClient:
+    """Drives the Accesslink transactions of many users in one event loop.
+
+    The HTTP calls are the same as in Transaction and run on the client's own `max_concurrency` worker threads, so the
+    number of calls in flight across every pool created from this client is exactly that, whatever the size of the
+    loop's default executor. Call close() when done. Example:
+
+        async def sync_user(pool):
+            async for transaction in pool:
+                async for exercise, gpx in transaction:
+                    ...
+
+        client = AsyncAccesslinkClient(max_concurrency=8)
+        await asyncio.gather(*(sync_user(client.pool(token, user_id)) for token, user_id in users))
+        client.close()
+    """
+
+    def __init__(self, max_concurrency: int = 8, session: AccesslinkSession | None = None):
+        self.max_concurrency = max_concurrency
+        self._owns_session = session is None
+        self.session = session if session is not None else AccesslinkSession(pool_maxsize=max(16, max_concurrency))
+
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="accesslink")
+
+        # One semaphore per event loop, since a semaphore is bound to the loop it is first used in
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    async def call(self, func, *args):
+        loop = asyncio.get_running_loop()
+
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+
+        # Waiting calls queue on the semaphore, not in the executor, so that cancelled ones never start
+        async with semaphore:
+            return await loop.run_in_executor(self._executor, func, *args)
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+        if self._owns_session:
+            self.session.close()
+
+    def pool(self, access_token: str, user_id: str, ordered: bool = True) -> "AsyncTransactionPool":
+        return AsyncTransactionPool(self, access_token, user_id, ordered)
+
+
+class AsyncTransaction:
+    """`async for exercise, gpx in transaction`. Every exercise of the transaction is fetched concurrently."""
+
+    def __init__(self, client: AsyncAccesslinkClient, transaction: Transaction, ordered: bool = True):
+        self._client = client
+        self.transaction = transaction
+        self.ordered = ordered
+
+    @property
+    def transaction_id(self) -> int | None:
+        return self.transaction.transaction_id
+
+    async def populate(self) -> bool:
+        return await self._client.call(self.transaction.populate)
+
+    async def commit(self):
+        await self._client.call(self.transaction.commit)
+
+    async def _iterate(self):
+        tasks = [
+            asyncio.create_task(self._client.call(self.transaction._fetch, url))
+            for url in self.transaction._exercise_urls
+        ]
+
+        try:
+            for task in (tasks if self.ordered else asyncio.as_completed(tasks)):
+                result = await task
+
+                # Counted like in Transaction.__next__, so that commit() knows everything was fetched
+                self.transaction._i += 1
+                yield result
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def __aiter__(self):
+        return self._iterate()
+
+    def __len__(self):
+        return len(self.transaction)
+
+    def __str__(self):
+        return f"AsyncTransaction({self.transaction_id})"
+
+    def __repr__(self):
+        return f"AsyncTransaction({self.transaction_id})"
+
+
+class AsyncTransactionPool:
+    """`async for transaction in pool`. Same create/list/commit semantics as TransactionPool."""
+
+    max_round_trips = TransactionPool.max_round_trips
+
+    def __init__(self, client: AsyncAccesslinkClient, access_token: str, user_id: str, ordered: bool = True):
+        # API elements
+        self._client = client
+        self._access_token = access_token
+        self._user_id = user_id
+        self.ordered = ordered
+
+        self.current_transaction = None
+        self.previous_transactions = []
+
+    def get_transaction(self) -> AsyncTransaction:
+        transaction = Transaction(self._access_token, self._user_id, session=self._client.session)
+        self.current_transaction = AsyncTransaction(self._client, transaction, self.ordered)
+        return self.current_transaction
+
+    async def commit_current(self):
+        if self.current_transaction is not None:
+            # Commit
+            await self.current_transaction.commit()
+
+            # Mark it previous
+            self.previous_transactions.append(self.current_transaction)
+            self.current_transaction = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> AsyncTransaction:
+
+        # Commit current Transaction if can
+        await self.commit_current()
+
+        # Avoid infinite loop
+        if len(self.previous_transactions) >= self.max_round_trips:
+            raise StopAsyncIteration
+
+        # Get new Transaction
+        transaction = self.get_transaction()
+
+        # Try to fetch a list of exercises
+        if await transaction.populate():
+            return transaction
+
+        raise StopAsyncIteration
+
+    def __str__(self):
+        return f"AsyncTransactionPool({self._user_id}, {self.current_transaction})"
+
+    def __repr__(self):
+        return f"AsyncTransactionPool({self._user_id}, {self.current_transaction})"
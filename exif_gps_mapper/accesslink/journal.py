@@ -0,0 +1,98 @@
+import json
+import os
+
+from exif_gps_mapper.helpers.fsync import fsync_dir
+
+
+class TransactionJournal:
+    """Write-ahead journal of downloaded Accesslink transactions.
+
+    Accesslink does not serve a committed transaction again, so the raw exercises and GPX files are sealed here, with
+    fsync and an atomic rename, before the transaction is committed. Once the materializers have written the rows,
+    the journal is marked applied and removed. A journal that is still sealed after a crash is replayed on the next
+    run; the materializers skip keys they already hold, so replaying twice is harmless.
+    """
+
+    PREFIX = "transaction-"
+    SUFFIX = ".json"
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, transaction_id: int) -> str:
+        return os.path.join(self.path, f"{self.PREFIX}{transaction_id}{self.SUFFIX}")
+
+    def seal(self, transaction_id: int, entries: list):
+        """Durably store the (exercise, gpx) pairs of a transaction. Call before committing it."""
+        path = self._file(transaction_id)
+        tmp_path = f"{path}.tmp"
+
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "transaction_id": transaction_id,
+                    "exercises": [{"exercise": exercise, "gpx": gpx} for exercise, gpx in entries]
+                },
+                f
+            )
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp_path, path)
+        fsync_dir(self.path)
+
+    def mark_applied(self, transaction_id: int):
+        """Forget a transaction once its rows have been written."""
+        os.remove(self._file(transaction_id))
+        fsync_dir(self.path)
+
+    def pending(self) -> list:
+        """Transaction ids that are sealed but not applied, oldest first."""
+        ids = [
+            int(name[len(self.PREFIX):-len(self.SUFFIX)])
+            for name in os.listdir(self.path)
+            if name.startswith(self.PREFIX) and name.endswith(self.SUFFIX)
+        ]
+        return sorted(ids)
+
+    def load(self, transaction_id: int) -> list:
+        with open(self._file(transaction_id), "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        return [(x["exercise"], x["gpx"]) for x in data["exercises"]]
+
+    def replay(self, exercise_materializer, gpx_materializer) -> int:
+        """Write every pending transaction into the materializers. Returns the number of transactions replayed."""
+        # An unfinished seal means the transaction was never committed; Accesslink serves it again
+        for name in os.listdir(self.path):
+            if name.endswith(".tmp"):
+                os.remove(os.path.join(self.path, name))
+
+        pending = self.pending()
+
+        for transaction_id in pending:
+            for exercise, gpx in self.load(transaction_id):
+                exercise_materializer.add(exercise)
+
+                if gpx:
+                    gpx_materializer.add(gpx, exercise["id"])
+
+            # The rows are on disk before the journal is removed
+            exercise_materializer.flush(fsync=True)
+            gpx_materializer.flush(fsync=True)
+            self.mark_applied(transaction_id)
+
+        if pending:
+            print(f"[INFO] Replayed {len(pending)} journaled transactions: {pending}")
+
+        return len(pending)
+
+    def __len__(self):
+        return len(self.pending())
+
+    def __str__(self):
+        return f"TransactionJournal({self.path})"
+
+    def __repr__(self):
+        return f"TransactionJournal({self.path})"
@@ -0,0 +1,64 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from exif_gps_mapper.accesslink.session import AccesslinkSession
+from exif_gps_mapper.accesslink.transaction_pool import TransactionPool
+
+
+class MultiUserSync:
+    """Drive the TransactionPools of many users on a thread pool.
+
+    `handler(user_id, exercise, gpx)` is called for every downloaded exercise, from several threads at once, so it must
+    be thread-safe. A transaction is committed only after the handler has returned for all of its exercises. An
+    exception stops that user only; the transaction stays uncommitted and the other users carry on.
+    """
+
+    def __init__(self, users: list, handler: Callable[[str, dict, str | None], None], max_workers: int = 4,
+                 session: AccesslinkSession | None = None, **pool_kwargs):
+        # Settings. Users are dicts with the "user_id" and "access_token" keys of secrets.yaml.
+        self.users = users
+        self.handler = handler
+        self.max_workers = max_workers
+        self.pool_kwargs = pool_kwargs
+
+        # One connection pool for all users
+        self.session = session if session is not None else AccesslinkSession(pool_maxsize=max(16, max_workers))
+
+    def _run_user(self, user: dict) -> dict:
+        user_id = user["user_id"]
+        result = {"status": "ok", "transactions": 0, "exercises": 0, "error": None}
+        pool = None
+
+        try:
+            pool = TransactionPool.for_user(user["access_token"], user_id, session=self.session, **self.pool_kwargs)
+
+            # The pool commits the previous transaction when the next one is requested
+            for transaction in pool:
+                for exercise, gpx in transaction:
+                    self.handler(user_id, exercise, gpx)
+                    result["exercises"] += 1
+
+                result["transactions"] += 1
+
+        except Exception as err:
+            print(f"[ERROR] Sync failed for user {user_id}: {err!r}")
+            result["status"] = "failed"
+            result["error"] = err
+
+            # The transaction stays uncommitted, and the next run starts from a fresh one
+            if pool is not None:
+                pool.abort()
+
+        return result
+
+    def run(self) -> dict:
+        """Return {user_id: {"status", "transactions", "exercises", "error"}}."""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = executor.map(self._run_user, self.users)
+            return {user["user_id"]: result for user, result in zip(self.users, results)}
+
+    def __str__(self):
+        return f"MultiUserSync({len(self.users)} users)"
+
+    def __repr__(self):
+        return f"MultiUserSync({len(self.users)} users)"
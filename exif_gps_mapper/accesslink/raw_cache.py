@@ -0,0 +1,48 @@
+import json
+from datetime import datetime, timezone
+
+from exif_gps_mapper.helpers.object_store import ObjectStore
+
+
+class RawCache(ObjectStore):
+    """Compressed, content-addressed copy of every downloaded exercise JSON and GPX file.
+
+    Accesslink serves each exercise once, so this is the only way to materialize the tables again after a schema
+    change or a parser fix. Contents are stored once per SHA-256 in `objects/<sha[:2]>/<sha>.gz`. `index.jsonl` has
+    one line per download, mapping the exercise id to the hashes of its JSON and GPX; the last line of an id wins.
+    """
+
+    def __init__(self, path: str, compresslevel: int = 6):
+        super().__init__(path, compresslevel)
+
+    def put(self, exercise: dict, gpx: str | None, transaction_id: int | None = None) -> dict:
+        """Store one downloaded exercise. Returns its index entry."""
+        entry = {
+            "exercise_id": exercise["id"],
+            "transaction_id": transaction_id,
+            "exercise": self.put_object(json.dumps(exercise, sort_keys=True).encode("utf-8")),
+            "gpx": self.put_object(gpx.encode("utf-8")) if gpx else None,
+            "fetched": datetime.now(timezone.utc).isoformat(timespec="seconds")
+        }
+
+        self._append_index([entry])
+        return entry
+
+    def get(self, entry: dict) -> tuple:
+        """Return (exercise, gpx) of an index entry."""
+        exercise = json.loads(self.get_object(entry["exercise"]))
+        gpx = self.get_object(entry["gpx"]).decode("utf-8") if entry["gpx"] else None
+        return exercise, gpx
+
+    def entries(self) -> list:
+        """The latest index entry of each exercise, ordered by exercise id."""
+        latest = {entry["exercise_id"]: entry for entry in self._read_index()}
+        return [latest[exercise_id] for exercise_id in sorted(latest)]
+    def __len__(self):
+        return len(self.entries())
+
+    def __str__(self):
+        return f"RawCache({self.path})"
+
+    def __repr__(self):
+        return f"RawCache({self.path})"
@@ -0,0 +1,126 @@
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class AccesslinkSession:
+    """HTTP layer shared by Transaction and TransactionPool.
+
+    Keeps connections alive in a pool, so consecutive calls skip the TCP and TLS handshakes. Responses with a status
+    in RETRY_STATUSES and connection errors are retried with jittered exponential backoff, honouring Retry-After.
+    Latency is counted per endpoint, with numeric path segments folded into "{id}".
+    """
+
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+    def __init__(self, max_retries: int = 5, backoff_factor: float = 0.5, max_backoff: float = 60.0,
+                 pool_maxsize: int = 16, timeout: float = 60.0):
+        # Settings
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+        # Retries are handled here, not by urllib3, so that every attempt is counted
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=pool_maxsize, max_retries=0)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+        # Latency counters per endpoint
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(lambda: {"count": 0, "seconds": 0.0, "max_seconds": 0.0, "retries": 0})
+
+    @staticmethod
+    def endpoint(method: str, url: str) -> str:
+        path = "/".join("{id}" if x.isdigit() else x for x in urlsplit(url).path.split("/"))
+        return f"{method} {path}"
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: anywhere between zero and the exponential cap
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * 2 ** attempt))
+
+    def _retry_after(self, response: requests.Response) -> float | None:
+        value = response.headers.get("Retry-After")
+        if value is None:
+            return None
+
+        # Either delay-seconds or an HTTP-date
+        try:
+            seconds = float(value)
+        except ValueError:
+            try:
+                seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+            except (TypeError, ValueError):
+                return None
+
+        return min(max(seconds, 0.0), self.max_backoff)
+
+    def _record(self, endpoint: str, seconds: float, retry: bool):
+        with self._lock:
+            counter = self._latencies[endpoint]
+            counter["count"] += 1
+            counter["seconds"] += seconds
+            counter["max_seconds"] = max(counter["max_seconds"], seconds)
+            counter["retries"] += int(retry)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Send with retries. The last response is returned as is when retries run out; call raise_for_status()."""
+        endpoint = self.endpoint(method, url)
+        kwargs.setdefault("timeout", self.timeout)
+
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            started = time.perf_counter()
+
+            try:
+                response = self._session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self._record(endpoint, time.perf_counter() - started, retry=not last_attempt)
+                if last_attempt:
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+
+            retry = response.status_code in self.RETRY_STATUSES and not last_attempt
+            self._record(endpoint, time.perf_counter() - started, retry=retry)
+
+            if not retry:
+                return response
+
+            delay = self._retry_after(response)
+            time.sleep(self._backoff(attempt) if delay is None else delay)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PUT", url, **kwargs)
+
+    @property
+    def latencies(self) -> dict:
+        """{endpoint: {count, seconds, max_seconds, mean_seconds, retries}}"""
+        with self._lock:
+            return {
+                endpoint: dict(counter, mean_seconds=counter["seconds"] / counter["count"])
+                for endpoint, counter in self._latencies.items()
+            }
+
+    def close(self):
+        self._session.close()
+
+    def __str__(self):
+        return f"AccesslinkSession({len(self._latencies)} endpoints)"
+
+    def __repr__(self):
+        return f"AccesslinkSession({len(self._latencies)} endpoints)"
@@ -1,13 +1,29 @@
-import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from exif_gps_mapper.accesslink.session import AccesslinkSession
 
 
 class Transaction:
     # Class variables
 
-    def __init__(self, access_token: str, user_id: str):
+    def __init__(self, access_token: str, user_id: str, max_workers: int = 1, ordered: bool = True,
+                 session: AccesslinkSession | None = None):
         self._user_id = user_id
         self._access_token = access_token
 
+        # Pooled connections and retries. TransactionPool shares one session between its transactions, and only a
+        # session created here is closed by close().
+        self._owns_session = session is None
+        self._session = session if session is not None else AccesslinkSession()
+
+        # Concurrent fetching: number of exercises downloaded at once and whether they are yielded in list order
+        # (True) or as soon as they finish (False). One worker is the serial mode.
+        assert max_workers >= 1, "Transaction needs at least one worker."
+        self.max_workers = max_workers
+        self.ordered = ordered
+        self._executor: ThreadPoolExecutor | None = None
+        self._pending = None
+
         # Base uri for API
         self.API_URL = f"https://www.polaraccesslink.com/v3/users/{user_id}/exercise-transactions"
 
@@ -24,7 +40,7 @@ class Transaction:
 
     def populate(self) -> bool:
         # Get new transaction
-        r = requests.post(self.API_URL, headers=self._get_headers("json"))
+        r = self._session.post(self.API_URL, headers=self._get_headers("json"))
         r.raise_for_status()
 
         # Get transaction id
@@ -44,7 +60,7 @@ class Transaction:
         return True
 
     def _get_transaction(self) -> int | None:
-        r = requests.post(self.API_URL, headers=self._get_headers("json"))
+        r = self._session.post(self.API_URL, headers=self._get_headers("json"))
         r.raise_for_status()
 
         if r.status_code == 204:
@@ -52,12 +68,31 @@ class Transaction:
 
         return int(r.json()["transaction-id"])
 
+    @property
+    def completed(self) -> bool:
+        # All exercises have been fetched successfully
+        return self._i == len(self._exercise_urls)
+
     def commit(self):
+        # Accesslink does not serve committed exercises again. Never commit before everything has been fetched.
+        if not self.completed:
+            raise RuntimeError(f"{self} has {len(self) - self._i} exercises that have not been fetched. "
+                               f"Refusing to commit.")
+
         # Tell Accesslink API that we are done
         uri = self._form_url(self.API_URL, self.transaction_id)
-        r = requests.put(uri, headers=self._get_headers(None))
+        r = self._session.put(uri, headers=self._get_headers(None))
         r.raise_for_status()
 
+        self.close()
+
+    def close(self):
+        """Stop the prefetch threads of an unfinished iteration, and close a session of this transaction's own."""
+        self._shutdown(cancel=True)
+
+        if self._owns_session:
+            self._session.close()
+
     def _get_headers(self, content_type: str | None) -> dict:
         x = {
             "json": "application/json",
@@ -74,20 +109,20 @@ class Transaction:
 
         # Call
         uri = self._form_url(self.API_URL, self.transaction_id)
-        r = requests.get(uri, headers=self._get_headers("json"))
+        r = self._session.get(uri, headers=self._get_headers("json"))
         r.raise_for_status()
 
         return r.json().get("exercises", [])
 
     def _get_exercise(self, exercise_url) -> dict:
-        r = requests.get(exercise_url, headers=self._get_headers("json"))
+        r = self._session.get(exercise_url, headers=self._get_headers("json"))
         r.raise_for_status()
 
         return r.json()
 
     def _get_gpx(self, exercise_url) -> str | None:
         uri = self._form_url(exercise_url, "gpx")
-        r = requests.get(uri, headers=self._get_headers("gpx"))
+        r = self._session.get(uri, headers=self._get_headers("gpx"))
         r.raise_for_status()
 
         # Some sports do not contain GPX data
@@ -96,21 +131,61 @@ class Transaction:
 
         return r.text
 
+    def _fetch(self, exercise_url) -> tuple:
+        # Call exercise and exercise/gpx APIs
+        exercise = self._get_exercise(exercise_url)
+        gpx = self._get_gpx(exercise_url)
+        return exercise, gpx
+
+    def _shutdown(self, cancel: bool = False):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=cancel)
+            self._executor = None
+
+    def _next_concurrent(self) -> tuple:
+        if self._pending is None:
+            # Submit every exercise at once. The pool size bounds the number of requests in flight.
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            futures = [self._executor.submit(self._fetch, url) for url in self._exercise_urls]
+            self._pending = iter(futures) if self.ordered else as_completed(futures)
+
+        try:
+            future = next(self._pending)
+        except StopIteration:
+            self._shutdown()
+            raise
+
+        try:
+            result = future.result()
+        except Exception:
+            # One failed fetch fails the whole transaction. It stays uncommitted.
+            self._shutdown(cancel=True)
+            raise
+
+        # Increment
+        self._i += 1
+        return result
+
     def __iter__(self):
         return self
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
     def __next__(self) -> tuple:
+        if self.max_workers > 1:
+            return self._next_concurrent()
+
         if self._i < len(self._exercise_urls):
             # Fetch the nth url
-            exercise_url = self._exercise_urls[self._i]
-
-            # Call exercise and exercise/gpx APIs
-            exercise = self._get_exercise(exercise_url)
-            gpx = self._get_gpx(exercise_url)
+            result = self._fetch(self._exercise_urls[self._i])
 
             # Increment
             self._i += 1
-            return exercise, gpx
+            return result
 
         raise StopIteration
 
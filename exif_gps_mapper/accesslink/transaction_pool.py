@@ -1,37 +1,87 @@
-# Transaction Pool should be a singleton object. It needs a shared state for the current transactions transaction id,
-# which is only given once per 10 minutes unless a transaction has been committed.
-from exif_gps_mapper.accesslink.transaction import Transaction
-
-
-class Singleton(type):
-    _instances = {}
+# There should be one Transaction Pool per user. It needs a shared state for the user's current transaction id,
+# which is only given once per 10 minutes unless a transaction has been committed. Use TransactionPool.for_user()
+# to get the pool of a user; pools of different users are independent.
+import threading
 
-    def __call__(cls, *args, **kwargs):
-        if cls not in cls._instances:
-            cls._instances[cls] = super(Singleton, cls).__call__(*args, **kwargs)
-        return cls._instances[cls]
+from exif_gps_mapper.accesslink.session import AccesslinkSession
+from exif_gps_mapper.accesslink.transaction import Transaction
 
 
-class TransactionPool(metaclass=Singleton):
+class TransactionPool:
     # Class Variables
-    # Maximum number of transactions created in this pool. Each can contain up to 50 exercises.
+    # Maximum number of transactions created in one run (iteration) of this pool. Each can contain up to 50 exercises.
     # This protects our tool from infinite loop if Accesslink API would not register our commit.
     max_round_trips = 10
 
-    def __init__(self, access_token: str, user_id: str):
+    # Pools by user_id
+    _registry = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, access_token: str, user_id: str, max_workers: int = 1, ordered: bool = True,
+                 session: AccesslinkSession | None = None):
         # API elements
         self._access_token = access_token
         self._user_id = user_id
 
+        # One connection pool for every transaction of this pool
+        self.session = session if session is not None else AccesslinkSession(pool_maxsize=max(16, max_workers))
+
+        # Concurrent fetching within each Transaction
+        self.max_workers = max_workers
+        self.ordered = ordered
+
         self.current_transaction = None
         self.previous_transactions = []
 
+    @classmethod
+    def for_user(cls, access_token: str, user_id: str, max_workers: int | None = None, ordered: bool | None = None,
+                 session: AccesslinkSession | None = None) -> "TransactionPool":
+        """Return the pool of `user_id`, creating it on the first call.
+
+        Later calls update the pool with the given token, session and settings, since tokens are refreshed and
+        sessions closed between runs.
+        """
+        with cls._registry_lock:
+            pool = cls._registry.get(user_id)
+
+            if pool is None:
+                kwargs = {"max_workers": max_workers, "ordered": ordered, "session": session}
+                pool = cls(access_token, user_id, **{k: v for k, v in kwargs.items() if v is not None})
+                cls._registry[user_id] = pool
+            else:
+                pool._access_token = access_token
+                pool.max_workers = max_workers if max_workers is not None else pool.max_workers
+                pool.ordered = ordered if ordered is not None else pool.ordered
+                pool.session = session if session is not None else pool.session
+
+            return pool
+
+    @classmethod
+    def from_config(cls, config: dict, access_token: str, user_id: str,
+                    session: AccesslinkSession | None = None) -> "TransactionPool":
+        """The pool of `user_id` with the accesslink.max_workers and accesslink.ordered settings of `config`."""
+        c = config.get("accesslink") or {}
+
+        return cls.for_user(
+            access_token, user_id, max_workers=c.get("max_workers"), ordered=c.get("ordered"), session=session
+        )
+
+    @property
+    def user_id(self) -> str:
+        return self._user_id
+
     def get_transaction(self) -> Transaction | None:
         # Otherwise, create new
-        transaction = Transaction(self._access_token, self._user_id)
+        transaction = Transaction(self._access_token, self._user_id, self.max_workers, self.ordered, self.session)
         self.current_transaction = transaction
         return transaction
 
+    def abort(self):
+        """Drop the current transaction without committing it. Accesslink serves its exercises again later."""
+        if self.current_transaction is not None:
+            self.current_transaction.close()
+            self.current_transaction = None
+
     def commit_current(self):
         if self.current_transaction is not None:
             # Commit
@@ -42,6 +92,9 @@ class TransactionPool(metaclass=Singleton):
             self.current_transaction = None
 
     def __iter__(self):
+        # A new run. A transaction left over from a failed run was not fully handled, so it is never committed.
+        self.abort()
+        self.previous_transactions = []
         return self
 
     def __next__(self) -> Transaction:
@@ -65,7 +118,7 @@ class TransactionPool(metaclass=Singleton):
         raise StopIteration
 
     def __str__(self):
-        return f"TransactionPool({self.current_transaction})"
+        return f"TransactionPool({self._user_id}, {self.current_transaction})"
 
     def __repr__(self):
-        return f"TransactionPool({self.current_transaction})"
+        return f"TransactionPool({self._user_id}, {self.current_transaction})"
@@ -1,23 +1,69 @@
+import base64
 import os
+import shutil
+from typing import Iterator
 
-import exiftool
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from exif_gps_mapper.exiftool_pool import ExifToolPool
+from exif_gps_mapper.helpers.blob_store import BlobStore
+from exif_gps_mapper.helpers.dataset_store import MONTH_PARTITION_SCHEMA, PartitionedStore, month_partitions
+from exif_gps_mapper.helpers.exif_time import parse_exif_datetime, parse_exif_offset
+from exif_gps_mapper.helpers.scanner import FileStat, scan_tree, scan_tree_parallel
+
+# Types of the configurable EXIF columns (input.exif_fields)
+FIELD_TYPES = {
+    "string": pa.string(),
+    "category": pa.dictionary(pa.int32(), pa.string()),
+    "float": pa.float64(),
+    "int": pa.int64(),
+    "datetime": pa.timestamp("ms")
+}
 
 
 class ExifDatabase:
-    # Should we get these from Config?
+    # Columns that every table has. More can be configured with `fields`.
     chosen_exif_fields = [
         "EXIF:CreateDate",
+        "EXIF:SubSecTimeDigitized",
+        "EXIF:OffsetTimeDigitized",
         "EXIF:GPSLatitude",
         "EXIF:GPSLongitude",
-        "EXIF:LensModel",
-        # "EXIF:JpgFromRaw" # requires -b arg
+        "EXIF:LensModel"
     ]
 
-    schema = ["created", "lat", "long", "lens"]
+    schema = ["created", "subsec", "created_offset", "lat", "long", "lens"]
+
+    # Types of the written table. Every batch is cast to these so that row groups can be appended to one file.
+    # `created` is the local camera time, `created_offset` its offset from UTC in minutes when the camera wrote one.
+    # Lens models and directories repeat a lot, so they are stored once per row group (dictionary encoded).
+    arrow_schema = pa.schema([
+        ("filepath", pa.string()),
+        ("directory", pa.dictionary(pa.int32(), pa.string())),
+        ("created", pa.timestamp("ms")),
+        ("created_offset", pa.int16()),
+        ("lat", pa.float64()),
+        ("long", pa.float64()),
+        ("lens", pa.dictionary(pa.int32(), pa.string())),
+        ("st_mtime_ns", pa.int64()),
+        ("st_size", pa.int64())
+    ])
+
+    # Arrow -> pandas: strings stay in Arrow buffers instead of one Python object per row, integers stay nullable
+    pandas_types = {
+        pa.string(): pd.StringDtype("pyarrow"),
+        pa.int64(): pd.Int64Dtype(),
+        pa.int16(): pd.Int16Dtype()
+    }
 
     def __init__(self, db_path: str, lookup_path: str, ignore_dirs: list, file_extensions: list,
-                 case_sensitive_extensions=False):
+                 case_sensitive_extensions=False, exiftool_workers: int = 1, exiftool_chunk_size: int = 500,
+                 batch_size: int = 5000, scanner: str = "sequential", scan_workers: int = 16, layout: str = "file",
+                 fields: dict | None = None, blob_fields: dict | None = None, blob_path: str | None = None,
+                 blob_chunk_size: int = 20):
         # Settings
 
         self.db_path = db_path
@@ -26,16 +72,90 @@ class ExifDatabase:
         self.file_extensions = file_extensions
         self.case_sensitive_extensions = case_sensitive_extensions
 
+        # Number of parallel exiftool processes and the number of files sent to a process at once
+        self.exiftool_workers = exiftool_workers
+        self.exiftool_chunk_size = exiftool_chunk_size
+
+        # Number of rows per committed batch (and parquet row group) during a full load
+        self.batch_size = batch_size
+
+        # Directory walker: "sequential" or "parallel" (lists directories concurrently, e.g. for SMB shares)
+        assert scanner in ("sequential", "parallel"), f"Unknown scanner ({scanner})."
+        self.scanner = scanner
+        self.scan_workers = scan_workers
+
+        # "file": one parquet file. "partitioned": append-only dataset by year/month of `created`, see PartitionedStore.
+        assert layout in ("file", "partitioned"), f"Unknown layout ({layout})."
+        self.layout = layout
+
+        # Extra columns: {name: {"tag": "EXIF:ISO", "type": "int"}}, see FIELD_TYPES. Columns added here after the
+        # table was written are read for the stored images by evolve_schema().
+        self.fields = dict(fields or {})
+        for name, field in self.fields.items():
+            assert name not in self.arrow_schema.names, f"Field {name} is already a column."
+            assert field.get("type", "string") in FIELD_TYPES, f"Unknown type of field {name} ({field.get('type')})."
+
+        self.chosen_exif_fields = self.chosen_exif_fields + [x["tag"] for x in self.fields.values()]
+        self.schema = self.schema + list(self.fields)
+        self.arrow_schema = pa.schema(list(self.arrow_schema) + [
+            (name, FIELD_TYPES[field.get("type", "string")]) for name, field in self.fields.items()
+        ])
+
+        # Binary tags read with exiftool -b into a BlobStore, not into the table: {name: "EXIF:JpgFromRaw"}.
+        # They are read in smaller chunks, since one embedded preview can be several megabytes. The store keeps them
+        # uncompressed and uncapped, about the size of the embedded previews times the number of images.
+        self.blob_fields = dict(blob_fields or {})
+        self.blob_chunk_size = blob_chunk_size
+        self.blob_store = None
+        if self.blob_fields:
+            assert blob_path is not None, "Blob fields need a blob path."
+            self.blob_store = BlobStore(blob_path)
+
+        self.store = None
+        if layout == "partitioned":
+            self.store = PartitionedStore(
+                db_path, "filepath", MONTH_PARTITION_SCHEMA, partitioner=self._partitions, deduplicate=True,
+                schema=self.arrow_schema
+            )
+
         # In-Memory DataBase
         self._db: pd.DataFrame | None = None
 
         # Validate that schema is doable
         assert len(self.chosen_exif_fields) == len(self.schema)
 
+    @classmethod
+    def from_config(cls, config: dict):
+        """Build from a config that has been passed through `helpers.config.add_config_filenames`."""
+        c = config["input"]
+
+        return cls(
+            db_path=config["db"]["exif"],
+            lookup_path=c["lookup_path"],
+            ignore_dirs=c.get("ignore_dirs") or [],
+            file_extensions=c["file_extensions"],
+            case_sensitive_extensions=c.get("case_sensitive_extensions", False),
+            exiftool_workers=c.get("exiftool_workers", 1),
+            exiftool_chunk_size=c.get("exiftool_chunk_size", 500),
+            batch_size=c.get("batch_size", 5000),
+            scanner=c.get("scanner", "sequential"),
+            scan_workers=c.get("scan_workers", 16),
+            layout=config["db"].get("layout", "file"),
+            fields=c.get("exif_fields"),
+            blob_fields=c.get("exif_blobs"),
+            blob_path=config["db"].get("blobs"),
+            blob_chunk_size=c.get("blob_chunk_size", 20)
+        )
+
     @property
     def as_df(self):
         return self._db
 
+    @property
+    def staging_dir(self) -> str:
+        # Batches committed by an unfinished full load
+        return f"{self.db_path}.staging"
+
     def upsert(self):
         # Read DB
         self._db = self.read()
@@ -45,12 +165,57 @@ class ExifDatabase:
         else:
             self.incremental_load()
 
+        self.extract_blobs()
+
+    @classmethod
+    def _partitions(cls, df: pd.DataFrame) -> pd.DataFrame:
+        return month_partitions(parse_exif_datetime(df["created"]))
+
     def read(self):
+        if self.layout == "partitioned":
+            df = self.store.read()
+            return None if df is None else self._to_pandas(self._to_table(df))
+
         if os.path.exists(self.db_path):
-            return pd.read_parquet(self.db_path)
+            table = pq.read_table(self.db_path)
+
+            # Tables written before the typed schema: `created` as "YYYY:MM:DD HH:MM:SS", no directory column
+            if not table.schema.equals(self.arrow_schema):
+                table = self._to_table(table.to_pandas())
+
+            return self._to_pandas(table)
         else:
             return None
 
+    @staticmethod
+    def _directories(filepath: pd.Series) -> pd.Series:
+        return filepath.astype("string").str.rsplit(os.sep, n=1).str[0]
+
+    def _to_table(self, df: pd.DataFrame) -> pa.Table:
+        # Cast a DataFrame, possibly of an older layout, to arrow_schema
+        df = df.copy()
+        df["created"] = parse_exif_datetime(df["created"])
+
+        if "directory" not in df.columns:
+            df["directory"] = self._directories(df["filepath"])
+
+        df = df.reindex(columns=self.arrow_schema.names)
+
+        for field in self.arrow_schema:
+            # Categories of concatenated tables may differ. The dictionary is rebuilt from plain strings.
+            if pa.types.is_dictionary(field.type):
+                df[field.name] = df[field.name].astype("string")
+
+        return pa.Table.from_pandas(df, schema=self.arrow_schema, preserve_index=False)
+
+    def _to_pandas(self, table: pa.Table) -> pd.DataFrame:
+        # Without the pandas metadata, the dtypes follow arrow_schema and not the DataFrame the table was made from
+        return table.replace_schema_metadata().to_pandas(types_mapper=self.pandas_types.get)
+
+    def _write(self, df: pd.DataFrame):
+        pq.write_table(self._to_table(df), f"{self.db_path}.tmp")
+        os.replace(f"{self.db_path}.tmp", self.db_path)
+
     def apply_deletes(self):
 
         # Read DB
@@ -58,112 +223,417 @@ class ExifDatabase:
 
         assert self._db is not None, "You have no database. Deletes do not make sense."
 
+        scanned = self.scan_images()
+
         # Set of deleted images (exist only in DB but not in look-up directory)
-        deleted_images = self._get_deleted_images()
+        deleted_images = self._get_deleted_images(scanned)
 
-        # Apply filter
-        df_filtered = self._db[~self._db["filepath"].isin(deleted_images)]
+        self._apply_changes(scanned, extract=set(), drop=deleted_images, force_write=True)
 
-        # Write
-        df_filtered.to_parquet(self.db_path)
+    def sync(self) -> dict:
+        """Walk the look-up path once and apply new, changed and deleted images together.
 
-        # Reload the In-Memory DB to be the newly written DB
+        Returns the sets of paths that were added, refreshed and removed.
+        """
+        # Read DB
         self._db = self.read()
 
-    def full_load(self):
+        scanned = self.scan_images()
+
+        if self._db is None:
+            self.full_load(scanned)
+            self.extract_blobs()
+            return {"new": set(scanned), "changed": set(), "deleted": set()}
+
+        self.evolve_schema(scanned)
+        backfilled = self._backfill_file_stats(scanned)
+
+        new_images = self._get_new_images(scanned)
+        changed_images = self._get_changed_images(scanned)
+        deleted_images = self._get_deleted_images(scanned)
+
+        self._apply_changes(
+            scanned,
+            extract=new_images | changed_images,
+            drop=changed_images | deleted_images,
+            force_write=backfilled
+        )
+        self.extract_blobs()
 
-        all_files = self.scan_images()
+        return {"new": new_images, "changed": changed_images, "deleted": deleted_images}
+
+    def full_load(self, scanned: dict | None = None):
+
+        all_files = self.scan_images() if scanned is None else scanned
 
         assert len(all_files), f"You are trying to perform a full load from path ({self.lookup_path}) that does not " \
                                f"contain any images into db {self.db_path}. No need to proceed!"
 
-        # Load Exif for all files in lookup path
-        df_full_load = self.get_exif_dataframe(all_files)
+        if self.layout == "partitioned":
+            # Every batch is appended as it arrives. A rerun skips the images that were already appended.
+            stored = set(self.store.keys())
+            remaining = {path: stat for path, stat in all_files.items() if path not in stored}
+
+            for table in self.iter_exif_batches(remaining):
+                self.store.append(self._to_pandas(table))
 
-        # Materialize
-        df_full_load.to_parquet(self.db_path)
+            self._db = self.read()
+            return
+
+        os.makedirs(self.staging_dir, exist_ok=True)
+
+        # Resume: files in batches committed by an interrupted load are not read again
+        staged = self._get_staged_images()
+        remaining = {path: stat for path, stat in all_files.items() if path not in staged}
+
+        # Load Exif batch by batch. Each batch is committed to its own file before the next one is read.
+        n_staged = len(self._get_staged_parts())
+        for table in self.iter_exif_batches(remaining):
+            self._commit_staged_part(table, n_staged)
+            n_staged += 1
+
+        # Materialize by streaming the committed batches into one file as row groups
+        self._merge_staged_parts(set(all_files))
 
         # Reload the In-Memory DB to be the newly written DB
         self._db = self.read()
 
-    def _get_new_images(self) -> set:
-        return self.scan_images() - set(self._db.filepath)
+    def _get_staged_parts(self) -> list:
+        if not os.path.exists(self.staging_dir):
+            return []
+
+        parts = [x for x in os.listdir(self.staging_dir) if x.endswith(".parquet")]
+        return [os.path.join(self.staging_dir, x) for x in sorted(parts)]
+
+    def _get_staged_images(self) -> set:
+        staged = set()
+        for part in self._get_staged_parts():
+            staged.update(pq.read_table(part, columns=["filepath"]).column("filepath").to_pylist())
+        return staged
+
+    def _commit_staged_part(self, table: pa.Table, n: int):
+        # Write to a temporary name first. A crash mid-write must not leave a half-written part behind.
+        part = os.path.join(self.staging_dir, f"part-{n:06d}.parquet")
+        pq.write_table(table, f"{part}.tmp")
+        os.replace(f"{part}.tmp", part)
+
+    def _merge_staged_parts(self, keep_images: set):
+        tmp_path = f"{self.db_path}.tmp"
+
+        # Only the images that still exist. The lookup path may have changed since an interrupted load.
+        keep = pa.array(list(keep_images), type=pa.string())
+
+        with pq.ParquetWriter(tmp_path, self.arrow_schema) as writer:
+            for part in self._get_staged_parts():
+                table = pq.read_table(part, schema=self.arrow_schema)
+                writer.write_table(table.filter(pc.is_in(table.column("filepath"), value_set=keep)))
+
+        os.replace(tmp_path, self.db_path)
+        shutil.rmtree(self.staging_dir)
+
+    def _get_new_images(self, scanned: dict) -> set:
+        return set(scanned) - set(self._db.filepath)
+
+    def _get_deleted_images(self, scanned: dict) -> set:
+        return set(self._db.filepath) - set(scanned)
+
+    def _get_changed_images(self, scanned: dict) -> set:
+        # Images in both the DB and the look-up directory whose modification time or size differ
+        df_scanned = pd.DataFrame(list(scanned.values()), index=list(scanned.keys()), columns=FileStat._fields)
+        df_joined = self._db.join(df_scanned, on="filepath", how="inner", rsuffix="_scanned")
 
-    def _get_deleted_images(self) -> set:
-        return set(self._db.filepath) - self.scan_images()
+        changed = (df_joined["st_mtime_ns"] != df_joined["st_mtime_ns_scanned"]) | \
+                  (df_joined["st_size"] != df_joined["st_size_scanned"])
+        changed = changed.fillna(True).astype(bool)
+
+        return set(df_joined.loc[changed, "filepath"])
+
+    def _backfill_file_stats(self, scanned: dict) -> bool:
+        # Databases written before the stat columns existed: assume that the files have not changed since
+        if set(FileStat._fields) <= set(self._db.columns) and self._db["st_mtime_ns"].notna().all():
+            return False
+
+        stats = self._db["filepath"].map(scanned)
+
+        for i, col in enumerate(FileStat._fields):
+            backfill = stats.map(lambda x: x[i], na_action="ignore")
+
+            if col in self._db.columns:
+                backfill = self._db[col].fillna(backfill)
+
+            self._db[col] = backfill.astype("Int64")
+
+        return True
 
     def incremental_load(self):
 
-        # New files only
-        new_images = self._get_new_images()
+        scanned = self.scan_images()
+        self.evolve_schema(scanned)
+        backfilled = self._backfill_file_stats(scanned)
+
+        # New and changed files only. Unchanged files cost nothing beyond the stat in scan_images.
+        new_images = self._get_new_images(scanned)
+        changed_images = self._get_changed_images(scanned)
+
+        # Outdated rows of the changed files are replaced
+        self._apply_changes(scanned, extract=new_images | changed_images, drop=changed_images, force_write=backfilled)
+
+    def _apply_changes(self, scanned: dict, extract: set, drop: set, force_write: bool = False):
+
+        if self.layout == "partitioned":
+            # Tombstones first: the re-extracted rows of changed images are appended after them and stay visible
+            self.store.delete(drop)
+
+            for table in self.iter_exif_batches({path: scanned[path] for path in extract}):
+                self.store.append(self._to_pandas(table))
+
+            self._db = self.read()
+            return
 
         # New batch of data. Can be None.
-        df_batch = self.get_exif_dataframe(new_images)
+        df_batch = self.get_exif_dataframe({path: scanned[path] for path in extract})
 
-        df_union = pd.concat([self._db, df_batch], axis="rows", ignore_index=True)
+        df_kept = self._db[~self._db["filepath"].isin(drop)]
+        df_union = pd.concat([df_kept, df_batch], axis="rows", ignore_index=True)
 
-        # If new rows were added
-        if len(df_union) > len(self._db):
-            df_union.to_parquet(self.db_path)
+        # If rows were added, refreshed or removed
+        if len(extract) or len(drop) or force_write:
+            self._write(df_union)
 
         # Reload the In-Memory DB to be the newly written DB
         self._db = self.read()
 
-    def get_exif_dataframe(self, image_paths: set) -> pd.DataFrame | None:
-        if not len(image_paths):
+    def update_rows(self, df_update: pd.DataFrame):
+        """Overwrite columns of existing rows, keyed by `filepath`, without reading the image files again.
+
+        For example the coordinates and file stats of images that have just been geotagged.
+        """
+        df_db = self.read()
+        assert df_db is not None, "You have no database. Updates do not make sense."
+
+        df_update = df_update.drop_duplicates("filepath", keep="last").set_index("filepath")
+        rows = df_db["filepath"].isin(df_update.index)
+
+        for col in df_update.columns:
+            # Categoricals only accept values of their categories. _write() encodes the column again.
+            if isinstance(df_db[col].dtype, pd.CategoricalDtype):
+                df_db[col] = df_db[col].astype("string")
+
+            df_db[col] = df_db["filepath"].map(df_update[col]).where(rows, df_db[col])
+
+        if self.layout == "partitioned":
+            # The appended versions win over the old ones
+            self.store.append(df_db[rows])
+        elif rows.any():
+            self._write(df_db)
+
+        self._db = self.read()
+
+    def _stored_columns(self) -> set:
+        # Columns of the written table, before read() adds the missing ones as null
+        if self.layout == "partitioned":
+            return self.store.columns()
+
+        if os.path.exists(self.db_path):
+            return set(pq.read_schema(self.db_path).names)
+        return set()
+
+    def evolve_schema(self, scanned: dict | None = None) -> list:
+        """Read the fields that were configured after the table was written, for the stored images only.
+
+        Only the missing tags are read and the other columns are kept, so adding a field does not need a full load.
+        `scanned` ({path: FileStat}) limits the pass to images that still exist. Returns the added columns.
+        """
+        stored = self._stored_columns()
+        missing = [name for name in self.fields if name not in stored]
+
+        if not stored or not missing:
+            return []
+
+        df_db = self.read()
+        images = df_db["filepath"].tolist()
+        if scanned is not None:
+            images = [x for x in images if x in scanned]
+
+        tags = {self.fields[name]["tag"]: name for name in missing}
+        collected = []
+
+        with ExifToolPool(self.exiftool_workers, self.exiftool_chunk_size) as pool:
+            for chunk in pool.imap_chunks(sorted(images), tags=list(tags)):
+                collected.extend(chunk)
+
+        df = pd.DataFrame(collected).rename(columns={**tags, "SourceFile": "filepath"})
+        df = df.reindex(columns=["filepath"] + missing)
+        df["filepath"] = df["filepath"].apply(os.path.normpath)
+
+        for name in missing:
+            df[name] = self._convert(df[name], self.arrow_schema.field(name).type)
+
+        self.update_rows(df)
+
+        # Files written before the new columns are rewritten, so that the columns are not read again
+        self.compact()
+
+        print(f"[INFO] Added columns {', '.join(missing)} for {len(df)} images")
+        return missing
+
+    @staticmethod
+    def _convert(values: pd.Series, arrow_type: pa.DataType) -> pd.Series:
+        # exiftool -n returns numbers for numeric tags, but text for anything else
+        if pa.types.is_timestamp(arrow_type):
+            return parse_exif_datetime(values)
+        if pa.types.is_integer(arrow_type):
+            return pd.to_numeric(values, errors="coerce").round().astype("Int64")
+        if pa.types.is_floating(arrow_type):
+            return pd.to_numeric(values, errors="coerce").astype("float64")
+
+        return values.map(str, na_action="ignore").astype("string")
+
+    def extract_blobs(self, images: pd.DataFrame | None = None) -> int:
+        """Read the binary fields (`blob_fields`) of the stored images into the blob store with exiftool -b.
+
+        This is a pass of its own, in chunks of `blob_chunk_size`, so the table never holds binary data. Images that
+        have not changed since their blobs were read are skipped. Returns the number of images read.
+        """
+        if not self.blob_fields:
+            return 0
+
+        df = self._db if images is None else images
+        if df is None or not len(df):
+            return 0
+
+        stats = dict(zip(df["filepath"], zip(df["st_mtime_ns"], df["st_size"])))
+        outdated = [
+            path for path, (st_mtime_ns, st_size) in stats.items()
+            if not all(self.blob_store.is_current(name, path, st_mtime_ns, st_size) for name in self.blob_fields)
+        ]
+
+        if not len(outdated):
+            return 0
+
+        tags = {tag: name for name, tag in self.blob_fields.items()}
+
+        with ExifToolPool(self.exiftool_workers, self.blob_chunk_size) as pool:
+            for chunk in pool.imap_chunks(sorted(outdated), tags=list(tags), params=["-b"]):
+                entries = []
+
+                for row in chunk:
+                    path = os.path.normpath(row["SourceFile"])
+                    st_mtime_ns, st_size = stats[path]
+
+                    for tag, name in tags.items():
+                        data = self._decode_blob(row.get(tag))
+                        sha = self.blob_store.put_object(data) if data is not None else None
+
+                        entries.append({
+                            "field": name, "filepath": path, "st_mtime_ns": int(st_mtime_ns), "st_size": int(st_size),
+                            "sha": sha
+                        })
+
+                # One index write per chunk
+                self.blob_store.add_entries(entries)
+
+        print(f"[INFO] Read {', '.join(self.blob_fields)} of {len(outdated)} images into {self.blob_store.path}")
+        return len(outdated)
+
+    @staticmethod
+    def _decode_blob(value) -> bytes | None:
+        # In JSON output, exiftool -b writes binary values as "base64:..."
+        if value is None:
             return None
+        if isinstance(value, str) and value.startswith("base64:"):
+            return base64.b64decode(value[len("base64:"):])
+        return str(value).encode("utf-8")
 
-        # Map names to custom names
-        col_name_map = dict(zip(self.chosen_exif_fields, self.schema))
-        col_name_map["SourceFile"] = "filepath"  # ExifToolHelper adds SourceFile
+    def get_blob(self, row: pd.Series, name: str) -> bytes | None:
+        """The binary field `name` of an exif table row, or None if the image has changed since it was read."""
+        assert name in self.blob_fields, f"Unknown blob field ({name})."
+        return self.blob_store.get(name, row["filepath"], row["st_mtime_ns"], row["st_size"])
+
+    def compact(self):
+        """Rewrite the partitioned dataset without deleted rows and outdated versions."""
+        if self.layout == "partitioned":
+            self.store.compact()
+            self._db = self.read()
+
+    def iter_exif_batches(self, images: dict) -> Iterator[pa.Table]:
+        """Yield the EXIF data of `images` ({path: FileStat}) as Arrow tables of at most `batch_size` rows.
 
-        # If JpgFromRaw, pass this ExifToolHelper(custom_args=exif_tool_args)
-        # exif_tool_args = ['-G', '-n', '-b']
+        Only one batch is held in memory at a time, so the memory use does not grow with the library size.
+        """
+        if not len(images):
+            return
+
+        # Binary tags such as JpgFromRaw are read by extract_blobs()
 
         # Container
         collected = []
 
-        with exiftool.ExifToolHelper() as et:
-            for d in et.get_tags(image_paths, tags=self.chosen_exif_fields):
-                collected.append(d)
+        # Sorted paths keep the rows in a deterministic order
+        with ExifToolPool(self.exiftool_workers, self.exiftool_chunk_size) as pool:
+            for chunk in pool.imap_chunks(sorted(images), tags=self.chosen_exif_fields):
+                collected.extend(chunk)
+
+                if len(collected) >= self.batch_size:
+                    yield self._to_arrow(collected, images)
+                    collected = []
+
+        if collected:
+            yield self._to_arrow(collected, images)
+
+    def _to_arrow(self, collected: list, images: dict) -> pa.Table:
+        # Map names to custom names
+        col_name_map = dict(zip(self.chosen_exif_fields, self.schema))
+        col_name_map["SourceFile"] = "filepath"  # ExifToolHelper adds SourceFile
 
-        # Convert to DataFrame and rename columns using the map
+        # Convert to DataFrame and rename columns using the map. Tags missing from every file still get a column.
         df = pd.DataFrame(collected).rename(columns=col_name_map)
+        df = df.reindex(columns=["filepath"] + self.schema)
 
         # Normalize paths to make sure that forward/backward slashes are correct for OS
         df["filepath"] = df["filepath"].apply(os.path.normpath)
-        return df
+        df["directory"] = self._directories(df["filepath"])
 
-    def scan_images(self) -> set:
+        # "YYYY:MM:DD HH:MM:SS" plus SubSecTime digits, and the OffsetTime of the same moment
+        df["created"] = parse_exif_datetime(df["created"], df["subsec"])
+        df["created_offset"] = parse_exif_offset(df["created_offset"])
 
-        if not os.path.exists(self.lookup_path):
-            raise OSError(f"Path ({self.lookup_path}) does not exist.")
+        # File stats captured while scanning. Used to detect changed files in incremental loads.
+        stats = [images[x] for x in df["filepath"]]
+        df["st_mtime_ns"] = [x.st_mtime_ns for x in stats]
+        df["st_size"] = [x.st_size for x in stats]
 
-        # Container
-        found_images = []
+        # Some tags can be read as numbers (e.g. a lens model "50")
+        for field in self.arrow_schema:
+            if pa.types.is_string(field.type) or pa.types.is_dictionary(field.type):
+                df[field.name] = df[field.name].map(str, na_action="ignore").astype("string")
 
-        for root, dirs, file_names in os.walk(self.lookup_path, topdown=True):
+        for name in self.fields:
+            df[name] = self._convert(df[name], self.arrow_schema.field(name).type)
 
-            dirs[:] = set(dirs) - set(self.ignore_dirs)
+        df = df.reindex(columns=self.arrow_schema.names)
+        return pa.Table.from_pandas(df, schema=self.arrow_schema, preserve_index=False)
 
-            for file_name in file_names:
+    def get_exif_dataframe(self, images: dict) -> pd.DataFrame | None:
+        if not len(images):
+            return None
 
-                if not self.case_sensitive_extensions:
-                    e = [x.lower() for x in self.file_extensions]
-                    fn = file_name.lower()
-                else:
-                    e = self.file_extensions
-                    fn = file_name
+        tables = list(self.iter_exif_batches(images))
+        return self._to_pandas(pa.concat_tables(tables))
 
-                if fn.endswith(tuple(e)):
-                    # Combine full path
-                    full_path = os.path.join(os.path.abspath(root), file_name)
-                    found_images.append(full_path)
+    def scan_images(self) -> dict:
+        """Return {path: FileStat} of all images in the look-up path."""
+
+        if not os.path.exists(self.lookup_path):
+            raise OSError(f"Path ({self.lookup_path}) does not exist.")
 
-        # Normalize paths
-        found_images = [os.path.normpath(x) for x in found_images]
+        if self.scanner == "parallel":
+            return scan_tree_parallel(
+                self.lookup_path, self.ignore_dirs, self.file_extensions, self.case_sensitive_extensions,
+                max_workers=self.scan_workers
+            )
 
-        return set(found_images)
+        return scan_tree(self.lookup_path, self.ignore_dirs, self.file_extensions, self.case_sensitive_extensions)
 
     def __str__(self):
         return f"ExifDatabase({self.db_path})"
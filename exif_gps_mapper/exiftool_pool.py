@@ -0,0 +1,145 @@
+import queue
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
+
+import exiftool
+
+
+class ExifToolPool:
+    """A pool of long-lived exiftool processes.
+
+    The paths are split into chunks, and each chunk is sent to whichever exiftool process is idle. Python threads only
+    wait for the subprocess pipes, so the actual parsing work runs in parallel across the exiftool processes. Results
+    are always returned in the order of the input paths.
+    """
+
+    def __init__(self, n_workers: int = 1, chunk_size: int = 500, common_args: list | None = None):
+        assert n_workers >= 1, "ExifToolPool needs at least one worker."
+        assert chunk_size >= 1, "Chunk size must be a positive integer."
+
+        # Settings
+        self.n_workers = n_workers
+        self.chunk_size = chunk_size
+        self.common_args = common_args
+
+        # Idle exiftool processes
+        self._helpers: list = []
+        self._idle: queue.Queue = queue.Queue()
+
+        # Throughput of the latest call
+        self.stats: dict = {}
+
+    def start(self):
+        for _ in range(self.n_workers):
+            if self.common_args is None:
+                helper = exiftool.ExifToolHelper()
+            else:
+                helper = exiftool.ExifToolHelper(common_args=self.common_args)
+            helper.run()
+
+            self._helpers.append(helper)
+            self._idle.put(helper)
+
+    def terminate(self):
+        for helper in self._helpers:
+            helper.terminate()
+
+        self._helpers = []
+        self._idle = queue.Queue()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.terminate()
+
+    def _chunks(self, paths: list) -> list:
+        return [paths[i:i + self.chunk_size] for i in range(0, len(paths), self.chunk_size)]
+
+    def _borrow(self, func, *args):
+        # Borrow an idle process for the duration of one chunk
+        helper = self._idle.get()
+        try:
+            return func(helper, *args)
+        finally:
+            self._idle.put(helper)
+
+    def _imap(self, func, chunks: Iterable) -> Iterator:
+        # At most two chunks per worker are in flight, so the memory used by pending results stays bounded
+        assert self._helpers, "ExifToolPool has not been started. Use it as a context manager."
+
+        with ThreadPoolExecutor(max_workers=self.n_workers) as executor:
+            pending = deque()
+
+            for chunk in chunks:
+                pending.append(executor.submit(self._borrow, func, *chunk))
+
+                if len(pending) >= 2 * self.n_workers:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+
+    def imap_chunks(self, paths: list, tags: list, params: list | None = None) -> Iterator[list]:
+        """Yield the tag dicts chunk by chunk, in input order. `params` are extra exiftool arguments, such as -b.
+
+        At most two chunks per worker are in flight, so the memory used by pending results stays bounded no matter
+        how many paths are passed in.
+        """
+        assert self._helpers, "ExifToolPool has not been started. Use it as a context manager."
+
+        paths = list(paths)
+        started = time.perf_counter()
+        n_files = 0
+
+        def get_tags(helper, chunk: list):
+            if params:
+                return helper.get_tags(chunk, tags=tags, params=params)
+            return helper.get_tags(chunk, tags=tags)
+
+        for result in self._imap(get_tags, ((chunk,) for chunk in self._chunks(paths))):
+            n_files += len(result)
+            yield result
+
+        self._record_stats(n_files, time.perf_counter() - started)
+
+    def imap_execute(self, commands: Iterable[list]) -> Iterator:
+        """Run each list of command-line arguments on an idle process. Yields (output, error) in input order.
+
+        A failing command does not stop the others. Its error is returned in place of the output.
+        """
+        def execute(helper, params: list):
+            try:
+                return helper.execute(*params), None
+            except Exception as err:
+                return None, err
+
+        yield from self._imap(execute, ((params,) for params in commands))
+
+    def get_tags(self, paths: list, tags: list, params: list | None = None) -> list:
+        collected = []
+        for chunk in self.imap_chunks(paths, tags, params):
+            collected.extend(chunk)
+        return collected
+
+    def _record_stats(self, n_files: int, seconds: float):
+        files_per_second = n_files / seconds if seconds > 0 else float("inf")
+
+        self.stats = {
+            "files": n_files,
+            "seconds": seconds,
+            "files_per_second": files_per_second,
+            "workers": self.n_workers
+        }
+
+        print(f"[INFO] exiftool read {n_files} files in {seconds:.1f} s "
+              f"({files_per_second:.1f} files/s, {self.n_workers} processes)")
+
+    def __str__(self):
+        return f"ExifToolPool({self.n_workers})"
+
+    def __repr__(self):
+        return f"ExifToolPool({self.n_workers})"
@@ -0,0 +1,201 @@
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from exif_gps_mapper.exifdatabase import ExifDatabase
+from exif_gps_mapper.exiftool_pool import ExifToolPool
+
+
+class GeotagWriter:
+    """Write matched coordinates into the image files with batched exiftool runs.
+
+    Each chunk of images becomes one CSV file that a single exiftool command imports (`-csv=FILE`), so the cost of
+    starting exiftool and the per-command round trip is paid once per chunk instead of once per image. The chunks
+    are spread over an ExifToolPool of long-lived processes.
+
+    Images with an extension in `sidecar_extensions` (RAW files such as .NEF) are left untouched; the coordinates
+    go into an XMP sidecar next to them instead, `image.NEF` -> `image.xmp`.
+    """
+
+    # Columns of the plan returned by write()
+    PLAN_COLUMNS = ["filepath", "target", "mode", "latitude", "longitude", "status"]
+
+    def __init__(self, n_workers: int = 1, chunk_size: int = 500, sidecar_extensions: list | None = None,
+                 dry_run: bool = False, overwrite: bool = False, min_confidence: float | None = None,
+                 preserve_mtime: bool = True):
+        # Settings
+        self.n_workers = n_workers
+        self.chunk_size = chunk_size
+        self.sidecar_extensions = {x.lower() for x in (sidecar_extensions or [])}
+        self.dry_run = dry_run
+
+        # Images that already have coordinates are skipped, unless overwrite
+        self.overwrite = overwrite
+
+        # With the "bracket" matcher of RouteJoiner, weak matches can be left out
+        self.min_confidence = min_confidence
+
+        # exiftool -P: keep the file modification time
+        self.preserve_mtime = preserve_mtime
+
+        self.stats = {}
+
+    @classmethod
+    def from_config(cls, config: dict, **kwargs):
+        c = config.get("geotag") or {}
+
+        return cls(
+            n_workers=c.get("workers", 1),
+            chunk_size=c.get("chunk_size", 500),
+            sidecar_extensions=c.get("sidecar_extensions"),
+            overwrite=c.get("overwrite", False),
+            min_confidence=c.get("min_confidence"),
+            preserve_mtime=c.get("preserve_mtime", True),
+            **kwargs
+        )
+
+    @staticmethod
+    def sidecar_path(filepath: str) -> str:
+        # exiftool's %d%f.xmp
+        return f"{os.path.splitext(filepath)[0]}.xmp"
+
+    def plan(self, df_joined: pd.DataFrame) -> pd.DataFrame:
+        """Which file gets which coordinates, and how. Nothing is written."""
+        df = df_joined[df_joined["latitude"].notna() & df_joined["longitude"].notna()]
+
+        if self.min_confidence is not None and "confidence" in df.columns:
+            df = df[df["confidence"] >= self.min_confidence]
+
+        # Coordinates read from the file itself by ExifDatabase
+        if not self.overwrite and "lat" in df.columns:
+            df = df[df["lat"].isna()]
+
+        extensions = df["filepath"].map(lambda x: os.path.splitext(x)[1].lower())
+        sidecar = extensions.isin(self.sidecar_extensions).to_numpy()
+        sidecar_paths = df["filepath"].map(self.sidecar_path)
+
+        # An existing sidecar is updated in place, a missing one is created from its image
+        mode = np.where(sidecar, np.where(sidecar_paths.map(os.path.exists), "sidecar", "new_sidecar"), "file")
+
+        return pd.DataFrame({
+            "filepath": df["filepath"].to_numpy(),
+            "target": np.where(sidecar, sidecar_paths, df["filepath"]),
+            "mode": mode,
+            "latitude": df["latitude"].to_numpy("float64"),
+            "longitude": df["longitude"].to_numpy("float64"),
+            "status": "planned"
+        }, columns=self.PLAN_COLUMNS)
+
+    def _csv(self, rows: pd.DataFrame, mode: str) -> pd.DataFrame:
+        # exiftool matches the CSV rows to the processed files by SourceFile
+        source = rows["filepath"] if mode == "new_sidecar" else rows["target"]
+
+        if mode == "file":
+            return pd.DataFrame({
+                "SourceFile": source.to_numpy(),
+                "EXIF:GPSLatitude": rows["latitude"].abs().to_numpy(),
+                "EXIF:GPSLatitudeRef": np.where(rows["latitude"] >= 0, "N", "S"),
+                "EXIF:GPSLongitude": rows["longitude"].abs().to_numpy(),
+                "EXIF:GPSLongitudeRef": np.where(rows["longitude"] >= 0, "E", "W")
+            })
+
+        # XMP coordinates carry their own direction
+        return pd.DataFrame({
+            "SourceFile": source.to_numpy(),
+            "XMP:GPSLatitude": rows["latitude"].to_numpy(),
+            "XMP:GPSLongitude": rows["longitude"].to_numpy()
+        })
+
+    def _commands(self, plan: pd.DataFrame, tmp_dir: str) -> list:
+        """[(params, plan index)] with one exiftool command per chunk of the same mode."""
+        commands = []
+
+        for mode, rows in plan.groupby("mode", sort=False):
+            for i in range(0, len(rows), self.chunk_size):
+                chunk = rows.iloc[i:i + self.chunk_size]
+
+                csv_path = os.path.join(tmp_dir, f"{mode}-{len(commands):06d}.csv")
+                self._csv(chunk, mode).to_csv(csv_path, index=False, float_format="%.8f")
+
+                params = [f"-csv={csv_path}"]
+                if self.preserve_mtime:
+                    params.append("-P")
+
+                if mode == "new_sidecar":
+                    params += ["-o", "%d%f.xmp"] + chunk["filepath"].tolist()
+                else:
+                    params += ["-overwrite_original"] + chunk["target"].tolist()
+
+                commands.append((params, chunk.index))
+
+        return commands
+
+    def write(self, df_joined: pd.DataFrame, exif_database: ExifDatabase | None = None) -> pd.DataFrame:
+        """Geotag the matched images of `df_joined` (the output of RouteJoiner). Returns the plan with a status.
+
+        With `exif_database`, the coordinates and file stats of the written images are updated in its table, so the next
+        sync does not read them again and the next plan skips them. That includes images geotagged through a sidecar.
+        """
+        plan = self.plan(df_joined)
+
+        if self.dry_run or not len(plan):
+            for mode, n in plan["mode"].value_counts().items():
+                print(f"[INFO] Dry run: {n} images would be geotagged ({mode})")
+            return plan
+
+        started = time.perf_counter()
+        tmp_dir = tempfile.mkdtemp(prefix="geotag-")
+
+        try:
+            commands = self._commands(plan, tmp_dir)
+
+            with ExifToolPool(self.n_workers, self.chunk_size) as pool:
+                results = pool.imap_execute(params for params, _ in commands)
+
+                for (params, index), (_, err) in zip(commands, results):
+                    if err is None:
+                        plan.loc[index, "status"] = "written"
+                    else:
+                        # The next sync notices the files that did change and reads them again
+                        print(f"[ERROR] exiftool failed for a chunk of {len(index)} images: {err!r}")
+                        plan.loc[index, "status"] = "failed"
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        seconds = time.perf_counter() - started
+        self.stats = {"images": len(plan), "failed": int((plan["status"] == "failed").sum()), "seconds": seconds}
+        print(f"[INFO] Geotagged {self.stats['images'] - self.stats['failed']} of {self.stats['images']} images in "
+              f"{seconds:.1f} s ({self.n_workers} processes)")
+
+        if exif_database is not None:
+            self._update_database(plan, exif_database)
+
+        return plan
+
+    @staticmethod
+    def _update_database(plan: pd.DataFrame, exif_database: ExifDatabase):
+        # Images written in place now hold the coordinates, and have a new size. Images with a sidecar are unchanged
+        # themselves, but have coordinates now.
+        written = plan[plan["status"] == "written"]
+        if not len(written):
+            return
+
+        stats = [os.stat(x) for x in written["filepath"]]
+
+        exif_database.update_rows(pd.DataFrame({
+            "filepath": written["filepath"].to_numpy(),
+            "lat": written["latitude"].to_numpy(),
+            "long": written["longitude"].to_numpy(),
+            "st_mtime_ns": [x.st_mtime_ns for x in stats],
+            "st_size": [x.st_size for x in stats]
+        }))
+
+    def __str__(self):
+        return f"GeotagWriter({self.n_workers})"
+
+    def __repr__(self):
+        return f"GeotagWriter({self.n_workers})"
@@ -0,0 +1,55 @@
+from exif_gps_mapper.helpers.object_store import ObjectStore
+
+
+class BlobStore(ObjectStore):
+    """Content-addressed store for binary EXIF fields, such as embedded previews, that do not belong in a table.
+
+    Contents are stored once per SHA-256 in `objects/<sha[:2]>/<sha>`, uncompressed since they are mostly JPEG
+    data. `index.jsonl` maps (field, filepath) to the hash together with the file stats the blob was read from,
+    so a blob of an image that has changed since is not returned. The last line of a (field, filepath) wins.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+
+        # Latest index entry per (field, filepath), read on first use
+        self._entries: dict | None = None
+
+    def add_entries(self, entries: list):
+        """Append index entries: dicts of field, filepath, st_mtime_ns, st_size and sha (None if the tag is missing)."""
+        if not len(entries):
+            return
+
+        with self._lock:
+            self._append_index(entries)
+
+            for entry in entries:
+                self.entries()[(entry["field"], entry["filepath"])] = entry
+
+    def entries(self) -> dict:
+        """{(field, filepath): latest index entry}"""
+        if self._entries is None:
+            self._entries = {(entry["field"], entry["filepath"]): entry for entry in self._read_index()}
+
+        return self._entries
+
+    def is_current(self, field: str, filepath: str, st_mtime_ns: int, st_size: int) -> bool:
+        """Whether the field has been read from the file as it is now (also when the file did not have the tag)."""
+        entry = self.entries().get((field, filepath))
+        return entry is not None and entry["st_mtime_ns"] == st_mtime_ns and entry["st_size"] == st_size
+
+    def get(self, field: str, filepath: str, st_mtime_ns: int, st_size: int) -> bytes | None:
+        if not self.is_current(field, filepath, st_mtime_ns, st_size):
+            return None
+
+        sha = self.entries()[(field, filepath)]["sha"]
+        return self.get_object(sha) if sha is not None else None
+
+    def __len__(self):
+        return len(self.entries())
+
+    def __str__(self):
+        return f"BlobStore({self.path})"
+
+    def __repr__(self):
+        return f"BlobStore({self.path})"
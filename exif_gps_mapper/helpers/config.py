@@ -17,16 +17,38 @@ def add_config_filenames(config: dict) -> dict:
     # Create Data directories
     os.makedirs(config["db"]["dir"], exist_ok=True)
 
-    data_tables = ["exif", "route", "exercise"]
+    # route_simplified is only written with db.route_simplify
+    data_tables = ["exif", "route", "route_simplified", "exercise"]
+
+    # The partitioned layout stores each table as a dataset directory
+    partitioned = config["db"].get("layout", "file") == "partitioned"
 
     for table in data_tables:
         # File name and path
-        file_name = f"{table}.parquet"
+        file_name = table if partitioned else f"{table}.parquet"
         table_path = os.path.join(os.getcwd(), config["db"]["dir"], file_name)
 
         # Add to config
         config["db"][table] = table_path
 
+    # Photos joined to routes, kept up to date by IncrementalJoiner
+    config["db"]["joined"] = os.path.join(os.getcwd(), config["db"]["dir"], "joined.parquet")
+
+    # Accesslink transactions that are downloaded but not yet written
+    config["db"]["journal"] = os.path.join(os.getcwd(), config["db"]["dir"], "journal")
+
+    # Every downloaded exercise JSON and GPX file, for rebuilding the tables
+    config["db"]["raw"] = os.path.join(os.getcwd(), config["db"]["dir"], "raw")
+
+    # Binary EXIF fields (input.exif_blobs)
+    config["db"]["blobs"] = os.path.join(os.getcwd(), config["db"]["dir"], "blobs")
+
+    # Downsized previews for the map, see PreviewCache
+    config["db"]["previews"] = os.path.join(os.getcwd(), config["db"]["dir"], "previews")
+
+    # Map pages and the track and photo files that they load, see MapExporter
+    config["db"]["map"] = os.path.join(os.getcwd(), config["db"]["dir"], "map")
+
     return config
 
 
@@ -0,0 +1,264 @@
+import os
+import shutil
+import uuid
+from typing import Callable
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from exif_gps_mapper.helpers.fsync import fsync_tree
+
+# Year/month partitions derived from a timestamp column
+MONTH_PARTITION_SCHEMA = pa.schema([("year", pa.int16()), ("month", pa.int8())])
+
+
+def month_partitions(timestamps: pd.Series) -> pd.DataFrame:
+    """Year and month columns of a datetime Series. Rows without a timestamp go to year=0/month=0."""
+    timestamps = pd.to_datetime(timestamps, errors="coerce")
+
+    return pd.DataFrame({
+        "year": timestamps.dt.year.fillna(0).astype("int16"),
+        "month": timestamps.dt.month.fillna(0).astype("int8")
+    }, index=timestamps.index)
+
+
+class PartitionedStore:
+    """Append-only, hive-partitioned parquet dataset.
+
+    Every append goes to new files and is stamped with an increasing sequence number. Deletes are written as
+    tombstones (key, sequence) that hide all older versions of a key. Nothing is rewritten until `compact()`.
+    With `deduplicate`, only the latest version of each key is read, which turns an append into an upsert.
+
+    With a `schema`, the rows are written with those types and read with those columns: files written before a
+    column was added read it as null.
+    """
+
+    SEQ = "_seq"
+    TOMBSTONE_DIR = "_tombstones"
+    SEQUENCE_FILE = "_sequence"
+
+    def __init__(self, path: str, key: str, partition_schema: pa.Schema,
+                 partitioner: Callable[[pd.DataFrame], pd.DataFrame] | None = None, deduplicate: bool = False,
+                 schema: pa.Schema | None = None):
+        # Settings
+        self.path = path
+        self.key = key
+        self.partition_schema = partition_schema
+        self.deduplicate = deduplicate
+        self.schema = schema
+
+        # Derives the partition columns from the data. If None, the partition columns are data columns.
+        self.partitioner = partitioner
+
+    @property
+    def partitioning(self) -> ds.Partitioning:
+        return ds.partitioning(self.partition_schema, flavor="hive")
+
+    def exists(self) -> bool:
+        return os.path.exists(os.path.join(self.path, self.SEQUENCE_FILE))
+
+    def _last_seq(self) -> int:
+        if not self.exists():
+            return 0
+
+        with open(os.path.join(self.path, self.SEQUENCE_FILE)) as f:
+            return int(f.read())
+
+    def _next_seq(self) -> int:
+        seq = self._last_seq() + 1
+
+        # Write to a temporary name first, then atomically replace
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = os.path.join(self.path, f"{self.SEQUENCE_FILE}.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(str(seq))
+        os.replace(tmp_path, os.path.join(self.path, self.SEQUENCE_FILE))
+
+        return seq
+
+    def _to_table(self, df: pd.DataFrame, seq: int) -> pa.Table:
+        if self.schema is not None:
+            df_data = df.reindex(columns=self.schema.names)
+            table = pa.Table.from_pandas(df_data, schema=self.schema, preserve_index=False)
+        else:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+
+        if self.partitioner is not None:
+            for name, values in self.partitioner(df).items():
+                table = table.append_column(name, pa.array(values.to_numpy()))
+
+        table = table.append_column(self.SEQ, pa.array([seq] * len(table), type=pa.int64()))
+
+        # Partition columns must have the types of the partitioning schema
+        for field in self.partition_schema:
+            i = table.schema.get_field_index(field.name)
+            table = table.set_column(i, field, table.column(i).cast(field.type))
+
+        return table
+
+    def _write(self, table: pa.Table, base_dir: str, seq: int) -> list:
+        # Returns the paths of the written files
+        written = []
+
+        ds.write_dataset(
+            table,
+            base_dir,
+            format="parquet",
+            partitioning=self.partitioning,
+            basename_template=f"part-{seq:08d}-{uuid.uuid4().hex}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+            file_visitor=lambda x: written.append(x.path)
+        )
+
+        return written
+
+    def append(self, df: pd.DataFrame, fsync: bool = False):
+        """Write `df` into new files. Existing files are never touched.
+
+        With `fsync`, the new files, the sequence file and the partition directories are on disk when this returns.
+        """
+        if not len(df):
+            return
+
+        seq = self._next_seq()
+        written = self._write(self._to_table(df, seq), self.path, seq)
+
+        if fsync:
+            fsync_tree(self.path, written + [os.path.join(self.path, self.SEQUENCE_FILE)])
+
+    def delete(self, keys: set):
+        """Record tombstones for `keys`. Rows appended after this call are not affected."""
+        if not len(keys):
+            return
+
+        seq = self._next_seq()
+
+        tombstone_dir = os.path.join(self.path, self.TOMBSTONE_DIR)
+        os.makedirs(tombstone_dir, exist_ok=True)
+
+        df = pd.DataFrame({self.key: list(keys), self.SEQ: seq})
+        df.to_parquet(os.path.join(tombstone_dir, f"tombstone-{seq:08d}.parquet"), index=False)
+
+    def _tombstones(self) -> pd.Series:
+        # Latest deletion sequence per key
+        tombstone_dir = os.path.join(self.path, self.TOMBSTONE_DIR)
+
+        if not os.path.exists(tombstone_dir) or not os.listdir(tombstone_dir):
+            return pd.Series(dtype="int64")
+
+        df = ds.dataset(tombstone_dir, format="parquet").to_table().to_pandas()
+        return df.groupby(self.key)[self.SEQ].max()
+
+    def _dataset_schema(self) -> pa.Schema | None:
+        # `schema` plus the partition and sequence columns
+        if self.schema is None:
+            return None
+
+        partition_fields = list(self.partition_schema) if self.partitioner is not None else []
+        return pa.schema(list(self.schema) + partition_fields + [pa.field(self.SEQ, pa.int64())])
+
+    def _dataset(self) -> ds.Dataset:
+        # Files and directories starting with "_" or "." (tombstones, sequence) are ignored by pyarrow
+        return ds.dataset(self.path, format="parquet", partitioning=self.partitioning, schema=self._dataset_schema())
+
+    def columns(self) -> set:
+        """Columns found in every data file, i.e. the columns that no file has to read as null."""
+        if not self.exists():
+            return set()
+
+        fragments = ds.dataset(self.path, format="parquet", partitioning=self.partitioning).get_fragments()
+        return set.intersection(*[set(f.physical_schema.names) for f in fragments] or [set()])
+
+    def _live(self, df: pd.DataFrame, tombstones: pd.Series, winners: pd.Series | None) -> pd.DataFrame:
+        if len(tombstones):
+            deleted_at = df[self.key].map(tombstones)
+            df = df[deleted_at.isna() | (df[self.SEQ] > deleted_at)]
+
+        if winners is not None:
+            df = df[df[self.SEQ] == df[self.key].map(winners)]
+
+        return df
+
+    def _winners(self) -> pd.Series | None:
+        # Latest appended sequence per key. Read with the key and sequence columns only.
+        if not self.deduplicate:
+            return None
+
+        df = self._dataset().to_table(columns=[self.key, self.SEQ]).to_pandas()
+        return df.groupby(self.key)[self.SEQ].max()
+
+    def read(self, columns: list | None = None, filter: ds.Expression | None = None) -> pd.DataFrame | None:
+        """Read the live rows. `filter` on partition columns prunes whole directories."""
+        if not self.exists():
+            return None
+
+        dataset = self._dataset()
+
+        # The key and sequence are needed to resolve tombstones and versions
+        read_columns = None
+        if columns is not None:
+            read_columns = list(dict.fromkeys(columns + [self.key, self.SEQ]))
+
+        df = dataset.to_table(columns=read_columns, filter=filter).to_pandas()
+        df = self._live(df, self._tombstones(), self._winners())
+
+        # Internal columns
+        drop = [self.SEQ]
+        if self.partitioner is not None:
+            drop += self.partition_schema.names
+        if columns is not None:
+            drop += [x for x in df.columns if x not in columns]
+
+        return df.drop(columns=[x for x in dict.fromkeys(drop) if x in df.columns]).reset_index(drop=True)
+
+    def keys(self, filter: ds.Expression | None = None) -> pd.Series:
+        df = self.read(columns=[self.key], filter=filter)
+
+        if df is None:
+            return pd.Series(dtype="object")
+        return df[self.key]
+
+    def compact(self):
+        """Rewrite the dataset partition by partition without deleted rows, old versions or tombstones."""
+        if not self.exists():
+            return
+
+        dataset = self._dataset()
+        tombstones = self._tombstones()
+        winners = self._winners()
+
+        compact_dir = f"{self.path}.compact"
+        if os.path.exists(compact_dir):
+            shutil.rmtree(compact_dir)
+
+        # One partition in memory at a time
+        partitions = {str(f.partition_expression): f.partition_expression for f in dataset.get_fragments()}
+        seq = self._last_seq()
+
+        for expression in partitions.values():
+            df = dataset.to_table(filter=expression).to_pandas()
+            df = self._live(df, tombstones, winners)
+
+            if len(df):
+                table = pa.Table.from_pandas(
+                    df.assign(**{self.SEQ: seq}), schema=self._dataset_schema(), preserve_index=False
+                )
+                self._write(table, compact_dir, seq)
+
+        # The sequence continues from where it was
+        os.makedirs(compact_dir, exist_ok=True)
+        with open(os.path.join(compact_dir, self.SEQUENCE_FILE), "w") as f:
+            f.write(str(seq))
+
+        # Swap the directories
+        old_dir = f"{self.path}.old"
+        os.replace(self.path, old_dir)
+        os.replace(compact_dir, self.path)
+        shutil.rmtree(old_dir)
+
+    def __str__(self):
+        return f"PartitionedStore({self.path})"
+
+    def __repr__(self):
+        return f"PartitionedStore({self.path})"
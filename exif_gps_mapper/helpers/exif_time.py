@@ -0,0 +1,36 @@
+import pandas as pd
+
+ISO_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def parse_exif_datetime(created: pd.Series, subsec: pd.Series | None = None) -> pd.Series:
+    """Parse "YYYY:MM:DD HH:MM:SS" strings into naive datetimes, adding SubSecTime digits ("25" -> 0.25 s).
+
+    Unparseable values, such as the "0000:00:00 00:00:00" written by some cameras, become NaT.
+    """
+    if pd.api.types.is_datetime64_any_dtype(created):
+        return created
+
+    # "YYYY:MM:DD HH:MM:SS" -> "YYYY-MM-DD HH:MM:SS" lets pandas use its fast ISO 8601 parser. Anything after the
+    # seconds (a sub-second part or an offset written into the same tag) is dropped here.
+    text = created.astype("string").str.slice(0, 19)
+    iso = text.str.slice_replace(4, 5, "-").str.slice_replace(7, 8, "-")
+    timestamps = pd.to_datetime(iso, format=ISO_TIME_FORMAT, errors="coerce")
+
+    if subsec is not None:
+        # Digits of a decimal fraction, so leading zeros matter: "05" is 50 ms, "5" is 500 ms
+        digits = subsec.astype("string").str.extract(r"^\s*(\d+)", expand=False)
+        milliseconds = pd.to_numeric(digits.str.pad(3, side="right", fillchar="0").str.slice(0, 3), errors="coerce")
+        timestamps = timestamps + pd.to_timedelta(milliseconds.fillna(0).to_numpy(), unit="ms")
+
+    return timestamps
+
+
+def parse_exif_offset(offset: pd.Series) -> pd.Series:
+    """Parse OffsetTime strings ("+02:00", "-0530") into minutes east of UTC. Missing values stay missing."""
+    parts = offset.astype("string").str.extract(r"^\s*([+-])(\d{2}):?(\d{2})")
+
+    minutes = pd.to_numeric(parts[1]) * 60 + pd.to_numeric(parts[2])
+    minutes = minutes.where(parts[0] != "-", -minutes)
+
+    return minutes.astype("Int16")
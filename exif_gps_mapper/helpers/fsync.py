@@ -0,0 +1,38 @@
+import os
+
+
+def fsync_file(path: str):
+    """Flush the contents of a file to disk."""
+    with open(path, "rb+") as f:
+        os.fsync(f.fileno())
+
+
+def fsync_dir(path: str):
+    """Make the entries of a directory durable: new files, renames and removals. Not supported on Windows."""
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def fsync_tree(root: str, paths: list):
+    """fsync files written below `root`, then every directory from their parents up to the parent of `root`.
+
+    Directories created by the write, such as new partitions, are only durable once their parents are synced.
+    """
+    root = os.path.abspath(root)
+    dirs = {root, os.path.dirname(root)}
+
+    for path in paths:
+        fsync_file(path)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        while directory.startswith(root) and directory not in dirs:
+            dirs.add(directory)
+            directory = os.path.dirname(directory)
+
+    # Deepest first, so each directory is synced after the entries below it
+    for directory in sorted(dirs, key=len, reverse=True):
+        fsync_dir(directory)
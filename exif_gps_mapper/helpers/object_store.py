@@ -0,0 +1,76 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from typing import Iterator
+
+
+class ObjectStore:
+    """Content-addressed files with an append-only index, the base of RawCache and BlobStore.
+
+    Contents are stored once per SHA-256 in `objects/<sha[:2]>/<sha>`, gzip compressed with `compresslevel` (and a
+    `.gz` suffix) or as they are. `index.jsonl` holds one JSON line per entry. Lines are appended and fsynced after
+    the objects they refer to, and a torn last line from a crash is skipped when the index is read.
+    """
+
+    INDEX_FILE = "index.jsonl"
+    OBJECT_DIR = "objects"
+
+    def __init__(self, path: str, compresslevel: int | None = None):
+        self.path = path
+        self.compresslevel = compresslevel
+        self._lock = threading.RLock()
+
+        os.makedirs(os.path.join(path, self.OBJECT_DIR), exist_ok=True)
+
+    def _object_path(self, sha: str) -> str:
+        suffix = ".gz" if self.compresslevel is not None else ""
+        return os.path.join(self.path, self.OBJECT_DIR, sha[:2], f"{sha}{suffix}")
+
+    def put_object(self, data: bytes) -> str:
+        sha = hashlib.sha256(data).hexdigest()
+        path = self._object_path(sha)
+
+        # Identical content is stored once
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data if self.compresslevel is None else gzip.compress(data, compresslevel=self.compresslevel))
+            os.replace(tmp_path, path)
+
+        return sha
+
+    def get_object(self, sha: str) -> bytes:
+        with open(self._object_path(sha), "rb") as f:
+            data = f.read()
+
+        return data if self.compresslevel is None else gzip.decompress(data)
+
+    def _append_index(self, entries: list):
+        # The objects exist before the lines that refer to them
+        with self._lock, open(os.path.join(self.path, self.INDEX_FILE), "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(entry) + "\n" for entry in entries))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _read_index(self) -> Iterator[dict]:
+        index_path = os.path.join(self.path, self.INDEX_FILE)
+        if not os.path.exists(index_path):
+            return
+
+        with open(index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                # A torn last line from a crash is skipped
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def __str__(self):
+        return f"ObjectStore({self.path})"
+
+    def __repr__(self):
+        return f"ObjectStore({self.path})"
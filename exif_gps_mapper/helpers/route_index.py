@@ -0,0 +1,178 @@
+import functools
+import hashlib
+import json
+import operator
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+def grid_cells(latitude: np.ndarray, longitude: np.ndarray, cell_degrees: float) -> np.ndarray:
+    """Cell ids of a regular latitude/longitude grid, numbered row by row from (-90, -180)."""
+    rows, cols = _grid_rows_cols(latitude, longitude, cell_degrees)
+    return rows * _grid_width(cell_degrees) + cols
+
+
+def _grid_width(cell_degrees: float) -> int:
+    return int(np.ceil(360 / cell_degrees))
+
+
+def _grid_rows_cols(latitude, longitude, cell_degrees: float) -> tuple:
+    rows = np.floor((np.asarray(latitude, dtype="float64") + 90) / cell_degrees).astype("int64")
+    cols = np.floor((np.asarray(longitude, dtype="float64") + 180) / cell_degrees).astype("int64")
+
+    # Longitude 180 belongs to the last column
+    return rows, np.clip(cols, 0, _grid_width(cell_degrees) - 1)
+
+
+def route_filter(bbox: tuple | None = None, start=None, end=None) -> ds.Expression | None:
+    """Exact filter of route points. `bbox` is (south, west, north, east); `start` and `end` are inclusive."""
+    terms = []
+
+    if bbox is not None:
+        south, west, north, east = bbox
+        terms += [
+            ds.field("latitude") >= south, ds.field("latitude") <= north,
+            ds.field("longitude") >= west, ds.field("longitude") <= east
+        ]
+
+    if start is not None:
+        terms.append(ds.field("point_time") >= pd.Timestamp(start))
+
+    if end is not None:
+        terms.append(ds.field("point_time") <= pd.Timestamp(end))
+
+    return functools.reduce(operator.and_, terms) if terms else None
+
+
+def _fingerprint(pf: pq.ParquetFile) -> str:
+    # Hash of the footer: row groups, column chunk offsets and sizes, and min/max statistics. Any rewrite of the
+    # coordinates changes it, even with the same number of rows.
+    metadata = json.dumps(pf.metadata.to_dict(), sort_keys=True, default=str)
+    return hashlib.sha256(metadata.encode("utf-8")).hexdigest()
+
+
+class RouteIndex:
+    """Row-group index of a route parquet file that is sorted by point_time.
+
+    Time ranges are pruned with the point_time statistics of each row group, which are tight because the file is
+    sorted. Bounding boxes are pruned with the latitude/longitude statistics and, when it is up to date, a sidecar
+    file listing the grid cells that each row group touches. A track that only passes by the bounding box has
+    overlapping min/max statistics, but none of its cells are inside the box.
+    """
+
+    def __init__(self, path: str, cell_degrees: float = 0.05):
+        # Settings
+        self.path = path
+        self.cell_degrees = cell_degrees
+        self.sidecar_path = f"{path}.cells.parquet"
+
+    def build(self):
+        """Write the sidecar of (row_group, cell) pairs. Reads the latitude and longitude columns only."""
+        pf = pq.ParquetFile(self.path)
+        frames = []
+
+        for i in range(pf.num_row_groups):
+            table = pf.read_row_group(i, columns=["latitude", "longitude"])
+            cells = np.unique(
+                grid_cells(table["latitude"].to_numpy(), table["longitude"].to_numpy(), self.cell_degrees)
+            )
+            frames.append(pd.DataFrame({"row_group": np.full(len(cells), i, dtype="int32"), "cell": cells}))
+
+        df = pd.concat(frames) if frames else pd.DataFrame({"row_group": [], "cell": []})
+        table = pa.Table.from_pandas(df.astype({"row_group": "int32", "cell": "int64"}), preserve_index=False)
+
+        # Used to detect a sidecar that no longer matches the file
+        table = table.replace_schema_metadata({
+            "cell_degrees": str(self.cell_degrees),
+            "fingerprint": _fingerprint(pf)
+        })
+
+        pq.write_table(table, f"{self.sidecar_path}.tmp")
+        os.replace(f"{self.sidecar_path}.tmp", self.sidecar_path)
+
+    def is_current(self, pf: pq.ParquetFile | None = None) -> bool:
+        """Whether the sidecar exists and describes the file as it is now. Reads the footers only."""
+        if not os.path.exists(self.sidecar_path):
+            return False
+
+        pf = pf if pf is not None else pq.ParquetFile(self.path)
+        metadata = {k.decode(): v.decode() for k, v in (pq.read_schema(self.sidecar_path).metadata or {}).items()}
+
+        return metadata.get("cell_degrees") == str(self.cell_degrees) and \
+            metadata.get("fingerprint") == _fingerprint(pf)
+
+    def _cell_row_groups(self, pf: pq.ParquetFile, bbox: tuple) -> set | None:
+        # None: no usable sidecar
+        if not self.is_current(pf):
+            return None
+
+        table = pq.read_table(self.sidecar_path)
+
+        south, west, north, east = bbox
+        (row_min, row_max), (col_min, col_max) = _grid_rows_cols([south, north], [west, east], self.cell_degrees)
+
+        cells = table["cell"].to_numpy()
+        rows, cols = np.divmod(cells, _grid_width(self.cell_degrees))
+        inside = (rows >= row_min) & (rows <= row_max) & (cols >= col_min) & (cols <= col_max)
+
+        return set(table["row_group"].to_numpy()[inside].tolist())
+
+    def row_groups(self, bbox: tuple | None = None, start=None, end=None, pf: pq.ParquetFile | None = None) -> list:
+        """Row groups that can contain points of the query."""
+        pf = pf if pf is not None else pq.ParquetFile(self.path)
+        names = pf.schema_arrow.names
+        start = None if start is None else pd.Timestamp(start)
+        end = None if end is None else pd.Timestamp(end)
+
+        selected = []
+        for i in range(pf.num_row_groups):
+            row_group = pf.metadata.row_group(i)
+            stats = {}
+            for j in range(row_group.num_columns):
+                column = row_group.column(j)
+                if column.statistics is not None and column.statistics.has_min_max:
+                    stats[column.path_in_schema] = (column.statistics.min, column.statistics.max)
+
+            if "point_time" in stats:
+                t_min, t_max = (pd.Timestamp(x) for x in stats["point_time"])
+                if (start is not None and t_max < start) or (end is not None and t_min > end):
+                    continue
+
+            if bbox is not None and "latitude" in stats and "longitude" in stats:
+                south, west, north, east = bbox
+                if stats["latitude"][1] < south or stats["latitude"][0] > north or \
+                        stats["longitude"][1] < west or stats["longitude"][0] > east:
+                    continue
+
+            selected.append(i)
+
+        if bbox is not None and "latitude" in names:
+            cell_row_groups = self._cell_row_groups(pf, bbox)
+            if cell_row_groups is not None:
+                selected = [i for i in selected if i in cell_row_groups]
+
+        return selected
+
+    def query(self, bbox: tuple | None = None, start=None, end=None) -> pd.DataFrame:
+        """Points inside `bbox` (south, west, north, east) between `start` and `end`. Reads matching row groups only."""
+        pf = pq.ParquetFile(self.path)
+        row_groups = self.row_groups(bbox, start, end, pf=pf)
+
+        table = pf.read_row_groups(row_groups) if row_groups else pf.schema_arrow.empty_table()
+
+        expression = route_filter(bbox, start, end)
+        if expression is not None:
+            table = table.filter(expression)
+
+        return table.to_pandas()
+
+    def __str__(self):
+        return f"RouteIndex({self.path})"
+
+    def __repr__(self):
+        return f"RouteIndex({self.path})"
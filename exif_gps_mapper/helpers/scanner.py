@@ -0,0 +1,118 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import NamedTuple
+
+
+class FileStat(NamedTuple):
+    st_mtime_ns: int
+    st_size: int
+
+
+class ExtensionMatcher:
+    """Precomputed file extension test. Built once per scan instead of once per file."""
+
+    def __init__(self, file_extensions: list, case_sensitive: bool = False):
+        self.case_sensitive = case_sensitive
+
+        if case_sensitive:
+            self.extensions = tuple(file_extensions)
+        else:
+            self.extensions = tuple(x.lower() for x in file_extensions)
+
+    def __call__(self, file_name: str) -> bool:
+        if not self.case_sensitive:
+            file_name = file_name.lower()
+        return file_name.endswith(self.extensions)
+
+
+def scan_directory(directory: str, ignore_dirs: frozenset, matcher: ExtensionMatcher) -> tuple[dict, list]:
+    """List one directory. Return ({path: FileStat} of matching files, [sub-directory paths])."""
+
+    # Containers
+    found_images = {}
+    sub_dirs = []
+
+    try:
+        it = os.scandir(directory)
+    except OSError:
+        # Same as os.walk: unreadable directories are skipped
+        return found_images, sub_dirs
+
+    with it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+
+            if is_dir:
+                # Symlinked directories are not followed, like in os.walk
+                if entry.name not in ignore_dirs and not entry.is_symlink():
+                    sub_dirs.append(entry.path)
+
+            elif matcher(entry.name):
+                # DirEntry caches the stat result. On Windows it comes for free with the directory listing.
+                try:
+                    st = entry.stat()
+                except OSError:
+                    # Deleted while scanning or a broken link
+                    continue
+
+                found_images[entry.path] = FileStat(st.st_mtime_ns, st.st_size)
+
+    return found_images, sub_dirs
+
+
+def scan_tree(lookup_path: str, ignore_dirs: list, file_extensions: list, case_sensitive: bool = False) -> dict:
+    """Walk `lookup_path` recursively. Return {normalized absolute path: FileStat} of matching files."""
+
+    matcher = ExtensionMatcher(file_extensions, case_sensitive)
+    ignore_dirs = frozenset(ignore_dirs)
+
+    # Paths built from a normalized root stay normalized
+    stack = [os.path.normpath(os.path.abspath(lookup_path))]
+
+    # Container
+    found_images = {}
+
+    while stack:
+        files, sub_dirs = scan_directory(stack.pop(), ignore_dirs, matcher)
+        found_images.update(files)
+        stack.extend(sub_dirs)
+
+    return found_images
+
+
+def scan_tree_parallel(lookup_path: str, ignore_dirs: list, file_extensions: list, case_sensitive: bool = False,
+                       max_workers: int = 16) -> dict:
+    """Same result as `scan_tree`, but directories are listed concurrently on a thread pool.
+
+    Meant for network shares where every directory listing is a round-trip. Pending directories are taken from a
+    stack, so the walk stays depth-first, and at most two listings per worker are in flight at any time.
+    """
+
+    matcher = ExtensionMatcher(file_extensions, case_sensitive)
+    ignore_dirs = frozenset(ignore_dirs)
+
+    stack = [os.path.normpath(os.path.abspath(lookup_path))]
+    max_in_flight = 2 * max_workers
+
+    # Container
+    found_images = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = set()
+
+        while stack or in_flight:
+            # Fan out up to the bound
+            while stack and len(in_flight) < max_in_flight:
+                in_flight.add(executor.submit(scan_directory, stack.pop(), ignore_dirs, matcher))
+
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                files, sub_dirs = future.result()
+                found_images.update(files)
+                stack.extend(sub_dirs)
+
+    return found_images
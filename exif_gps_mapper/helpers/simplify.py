@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+
+from exif_gps_mapper.helpers.geo import EARTH_RADIUS_M, haversine
+
+# Web Mercator tiles are 256 pixels wide
+TILE_SIZE = 256
+
+
+def mercator(latitude: np.ndarray, longitude: np.ndarray) -> tuple:
+    """Web Mercator coordinates in degree units: equal distances on screen are equal distances in (x, y)."""
+    latitude = np.clip(np.asarray(latitude, dtype="float64"), -85.05112878, 85.05112878)
+    y = np.degrees(np.log(np.tan(np.pi / 4 + np.radians(latitude) / 2)))
+
+    return np.asarray(longitude, dtype="float64"), y
+
+
+def local_metres(latitude: np.ndarray, longitude: np.ndarray) -> tuple:
+    """Equirectangular x/y in metres. Accurate at the scale of one track, where the latitude changes little."""
+    latitude = np.radians(np.asarray(latitude, dtype="float64"))
+    longitude = np.radians(np.asarray(longitude, dtype="float64"))
+
+    return EARTH_RADIUS_M * longitude * np.cos(latitude), EARTH_RADIUS_M * latitude
+
+
+def pixel_degrees(zoom: float) -> float:
+    """Size of one screen pixel at a zoom level, in the units of `mercator`."""
+    return 360 / (TILE_SIZE * 2 ** zoom)
+
+
+def _segment_distance(px, py, x0, y0, x1, y1) -> np.ndarray:
+    # Distance of points to line segments, elementwise
+    dx, dy = x1 - x0, y1 - y0
+    length2 = dx * dx + dy * dy
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.clip(((px - x0) * dx + (py - y0) * dy) / length2, 0, 1)
+    t = np.where(length2 > 0, t, 0)
+
+    return np.hypot(px - (x0 + t * dx), py - (y0 + t * dy))
+
+
+def rdp_mask(x: np.ndarray, y: np.ndarray, tolerance: float, groups: np.ndarray | None = None) -> np.ndarray:
+    """Ramer-Douglas-Peucker: which points to keep so that no removed point is further than `tolerance` away.
+
+    Vectorized across segments: each iteration finds the furthest point of every open segment at once, instead of
+    recursing into one segment at a time. `groups` (e.g. exercise ids, contiguous) simplifies many tracks in one
+    call; the first and last point of each group are always kept.
+    """
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    n = len(x)
+
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+
+    # One segment per group from its first to its last point
+    if groups is None:
+        starts = np.array([0])
+    else:
+        groups = np.asarray(groups)
+        starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    ends = np.r_[starts[1:] - 1, n - 1]
+
+    keep[starts] = True
+    keep[ends] = True
+
+    while len(starts):
+        # Segments with points between their ends
+        inner = ends - starts - 1
+        open_segments = inner > 0
+        starts, ends, inner = starts[open_segments], ends[open_segments], inner[open_segments]
+
+        if not len(starts):
+            break
+
+        # Flat index of every inner point, and the segment it belongs to
+        offsets = np.cumsum(inner) - inner
+        segment = np.repeat(np.arange(len(starts)), inner)
+        points = np.repeat(starts + 1, inner) + np.arange(inner.sum()) - np.repeat(offsets, inner)
+
+        distance = _segment_distance(
+            x[points], y[points], x[starts][segment], y[starts][segment], x[ends][segment], y[ends][segment]
+        )
+
+        # Furthest point of each segment. Ties go to the first one.
+        furthest = np.maximum.reduceat(distance, offsets)
+        is_furthest = np.flatnonzero(distance == furthest[segment])
+        _, first = np.unique(segment[is_furthest], return_index=True)
+        split_at = points[is_furthest[first]]
+
+        # Segments with a point too far away are split there, the rest are done
+        split = furthest > tolerance
+        split_at = split_at[split]
+        keep[split_at] = True
+
+        starts, ends = np.r_[starts[split], split_at], np.r_[split_at, ends[split]]
+
+    return keep
+
+
+def simplify_tracks(latitude: np.ndarray, longitude: np.ndarray, groups: np.ndarray | None, zoom: float,
+                    pixel_tolerance: float = 1.0) -> np.ndarray:
+    """Keep mask of track points that looks the same as the full track at `zoom`, within `pixel_tolerance` pixels."""
+    x, y = mercator(latitude, longitude)
+    return rdp_mask(x, y, pixel_tolerance * pixel_degrees(zoom), groups)
+
+
+def _group_starts(groups: np.ndarray | None, n: int) -> np.ndarray:
+    # Boolean mask of the first point of each group
+    if groups is None:
+        return np.r_[True, np.zeros(n - 1, dtype=bool)] if n else np.zeros(0, dtype=bool)
+
+    groups = np.asarray(groups)
+    return np.r_[True, groups[1:] != groups[:-1]] if n else np.zeros(0, dtype=bool)
+
+
+def _first_per_bucket(buckets: np.ndarray, group_starts: np.ndarray) -> np.ndarray:
+    # Keep the first point of every bucket, and the last point of every group
+    keep = group_starts | np.r_[False, buckets[1:] != buckets[:-1]]
+    keep[np.r_[np.flatnonzero(group_starts)[1:] - 1, len(keep) - 1]] = True
+    return keep
+
+
+def thin_by_time(point_time: np.ndarray, groups: np.ndarray | None, min_interval) -> np.ndarray:
+    """Keep mask with at most one point per `min_interval` of each group, counted from the group's first point."""
+    n = len(point_time)
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+
+    t = np.asarray(point_time, dtype="datetime64[ns]").astype("int64")
+    starts = _group_starts(groups, n)
+
+    # Time since the first point of the group
+    first = np.maximum.accumulate(np.where(starts, np.arange(n), 0))
+    buckets = (t - t[first]) // pd.Timedelta(min_interval).value
+
+    return _first_per_bucket(buckets, starts)
+
+
+def thin_by_distance(latitude: np.ndarray, longitude: np.ndarray, groups: np.ndarray | None,
+                     min_distance: float) -> np.ndarray:
+    """Keep mask with at most one point per `min_distance` metres travelled along each group."""
+    n = len(latitude)
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+
+    latitude = np.asarray(latitude, dtype="float64")
+    longitude = np.asarray(longitude, dtype="float64")
+    starts = _group_starts(groups, n)
+
+    # Distance travelled since the first point of the group
+    steps = np.r_[0.0, haversine(latitude[:-1], longitude[:-1], latitude[1:], longitude[1:])]
+    steps[starts] = 0.0
+    travelled = np.cumsum(steps)
+    travelled -= np.maximum.accumulate(np.where(starts, travelled, 0.0))
+
+    return _first_per_bucket(np.floor(travelled / min_distance).astype("int64"), starts)
+
+
+def thin_route(latitude: np.ndarray, longitude: np.ndarray, point_time: np.ndarray, groups: np.ndarray | None,
+               tolerance: float | None = None, min_interval=None, min_distance: float | None = None) -> np.ndarray:
+    """Keep mask of the route points to store at a reduced resolution. The points are sorted by group and time.
+
+    The steps run in order, each on the points the previous one kept: time-based thinning (`min_interval`, e.g.
+    "5s"), distance-based thinning (`min_distance` metres) and RDP with `tolerance` metres. Steps that are None are
+    skipped. The first and last point of each group are always kept.
+    """
+    latitude = np.asarray(latitude, dtype="float64")
+    longitude = np.asarray(longitude, dtype="float64")
+    point_time = np.asarray(point_time)
+    groups = np.asarray(groups) if groups is not None else None
+
+    # Positions of the points kept so far
+    kept = np.arange(len(latitude))
+
+    if min_interval is not None:
+        kept = kept[thin_by_time(point_time[kept], _take(groups, kept), min_interval)]
+
+    if min_distance is not None:
+        kept = kept[thin_by_distance(latitude[kept], longitude[kept], _take(groups, kept), min_distance)]
+
+    if tolerance is not None:
+        x, y = local_metres(latitude[kept], longitude[kept])
+        kept = kept[rdp_mask(x, y, tolerance, _take(groups, kept))]
+
+    keep = np.zeros(len(latitude), dtype=bool)
+    keep[kept] = True
+    return keep
+
+
+def _take(groups: np.ndarray | None, positions: np.ndarray) -> np.ndarray | None:
+    return None if groups is None else groups[positions]
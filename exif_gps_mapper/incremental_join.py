@@ -0,0 +1,182 @@
+import json
+import os
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from exif_gps_mapper.route_joiner import RouteJoiner
+
+
+class IncrementalJoiner:
+    """Keep the output of RouteJoiner up to date without joining the whole library on every run.
+
+    The joined table is persisted together with a state file of watermarks: the exercises that have been joined
+    and their route windows. An exercise without route points has no window yet and is not a watermark until its
+    route arrives. A run re-joins only
+        * photos that are new, or whose `created`, size or mtime changed (or that are listed in `changed`),
+        * photos whose local time falls inside the window of an exercise that arrived since the last run.
+    Deleted photos are dropped. Everything else is copied from the previous output as is.
+    """
+
+    STATE_VERSION = 1
+
+    # Columns that mark a photo as changed
+    COMPARE_COLUMNS = ["created", "st_mtime_ns", "st_size"]
+
+    def __init__(self, path: str, joiner: RouteJoiner | None = None):
+        # Settings
+        self.path = path
+        self.state_path = f"{os.path.splitext(path)[0]}.state.json"
+        self.joiner = joiner if joiner is not None else RouteJoiner()
+
+        self.stats = {}
+
+    @classmethod
+    def from_config(cls, config: dict, joiner: RouteJoiner | None = None):
+        """Build from a config that has been passed through `helpers.config.add_config_filenames`."""
+        return cls(config["db"]["joined"], joiner)
+
+    def read(self) -> pd.DataFrame | None:
+        if os.path.exists(self.path):
+            return pd.read_parquet(self.path)
+        return None
+
+    def _read_state(self) -> dict:
+        if not os.path.exists(self.state_path):
+            return {"version": self.STATE_VERSION, "exercise_ids": [], "windows": []}
+
+        with open(self.state_path, "r") as f:
+            return json.load(f)
+
+    def _write(self, df: pd.DataFrame | None, exercise_ids: set, windows: pd.DataFrame):
+        # The table first: a crash before the state is written only repeats the last delta. None: table unchanged.
+        if df is not None:
+            df.to_parquet(f"{self.path}.tmp", index=False)
+            os.replace(f"{self.path}.tmp", self.path)
+
+        state = {
+            "version": self.STATE_VERSION,
+            "updated": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "max_exercise_id": max(exercise_ids, default=None),
+            "exercise_ids": sorted(exercise_ids),
+            "windows": json.loads(windows.to_json(orient="records", date_format="iso", date_unit="ns"))
+        }
+
+        with open(f"{self.state_path}.tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(f"{self.state_path}.tmp", self.state_path)
+
+    @staticmethod
+    def _windows_from_state(state: dict) -> pd.DataFrame:
+        columns = ["exercise_id", "utc_start", "utc_end", "offset", "local_start", "local_end"]
+        windows = pd.DataFrame(state["windows"], columns=columns)
+
+        for col in columns[1:]:
+            if col != "offset":
+                windows[col] = pd.to_datetime(windows[col]).dt.tz_localize(None)
+
+        return windows.astype({"exercise_id": "int64", "offset": "int64"})
+
+    def _dirty(self, df_exif: pd.DataFrame, df_joined: pd.DataFrame, changed: set) -> pd.Series:
+        # New or changed photos, aligned with df_exif
+        columns = [x for x in self.COMPARE_COLUMNS if x in df_exif.columns and x in df_joined.columns]
+
+        merged = df_exif[["filepath"] + columns].merge(
+            df_joined[["filepath"] + columns], on="filepath", how="left", suffixes=("", "_joined"), indicator=True
+        )
+
+        dirty = merged["_merge"] == "left_only"
+        for col in columns:
+            a, b = merged[col], merged[f"{col}_joined"]
+            dirty |= ~((a == b) | (a.isna() & b.isna()))
+
+        dirty |= merged["filepath"].isin(changed)
+        return pd.Series(dirty.to_numpy(), index=df_exif.index)
+
+    def _in_windows(self, df_joined: pd.DataFrame, windows: pd.DataFrame) -> set:
+        # Filepaths of previously joined photos inside the given windows. Their local time is already parsed.
+        if not len(windows) or not len(df_joined):
+            return set()
+
+        photos = df_joined.loc[df_joined["local_time"].notna(), ["filepath", "local_time"]]
+        photos = photos.rename(columns={"filepath": "_row"}).sort_values("local_time", ignore_index=True)
+
+        return set(self.joiner._assign_exercises(photos, windows)["_row"])
+
+    def update(self, df_exif: pd.DataFrame, df_exercise: pd.DataFrame, df_route: pd.DataFrame,
+               changed: set | None = None) -> pd.DataFrame:
+        """Bring the joined table up to date and return it.
+
+        `df_exif` is the full EXIF table, since photos missing from it are dropped. `changed` can list filepaths that
+        are known to have changed, for example from `ExifDatabase.sync()`.
+        """
+        assert "filepath" in df_exif.columns, "The EXIF table needs a filepath column."
+
+        df_exercise = self.joiner._as_columns(df_exercise, "id")
+        df_route = self.joiner._as_columns(df_route, "point_time")
+        df_exif = df_exif.reset_index(drop=True)
+
+        state = self._read_state()
+        df_joined = self.read()
+
+        # Watermark: exercises seen by earlier runs keep the windows they had
+        known_ids = set(state["exercise_ids"])
+        new_ids = set(df_exercise["id"]) - known_ids
+
+        new_windows = self.joiner.exercise_windows(
+            df_exercise[df_exercise["id"].isin(new_ids)],
+            df_route[df_route["exercise_id"].isin(new_ids)]
+        )
+        windows = pd.concat([self._windows_from_state(state), new_windows], ignore_index=True)
+        windows = windows.sort_values("local_start", ignore_index=True)
+
+        if df_joined is None:
+            rejoin = pd.Series(True, index=df_exif.index)
+        else:
+            rejoin = self._dirty(df_exif, df_joined, changed or set())
+            rejoin |= df_exif["filepath"].isin(self._in_windows(df_joined, new_windows))
+
+        deleted = 0 if df_joined is None else int((~df_joined["filepath"].isin(df_exif["filepath"])).sum())
+
+        # Exercises with a window are done. The others are picked up again once their route arrives.
+        exercise_ids = known_ids | set(new_windows["exercise_id"])
+
+        if df_joined is not None and not rejoin.any() and not deleted:
+            if len(new_windows):
+                self._write(None, exercise_ids, windows)
+
+            self._set_stats(0, len(new_windows), 0, len(df_exif))
+            return df_joined
+
+        df_delta = df_exif[rejoin]
+
+        # Only the windows and route points that the delta can match
+        local_time = self.joiner._to_local_time(df_delta["created"])
+        tolerance = self.joiner.tolerance
+        relevant = windows[
+            (windows["local_end"] + tolerance >= local_time.min()) &
+            (windows["local_start"] - tolerance <= local_time.max())
+        ]
+        route = df_route[df_route["exercise_id"].isin(relevant["exercise_id"])]
+
+        df_delta = self.joiner.join(df_delta, df_exercise, route, windows=relevant)
+
+        if df_joined is not None:
+            keep = df_joined["filepath"].isin(df_exif["filepath"]) & ~df_joined["filepath"].isin(df_delta["filepath"])
+            df_delta = pd.concat([df_joined[keep], df_delta], ignore_index=True)
+
+        self._write(df_delta, exercise_ids, windows)
+        self._set_stats(int(rejoin.sum()), len(new_windows), deleted, len(df_exif))
+
+        return df_delta
+
+    def _set_stats(self, rejoined: int, new_exercises: int, deleted: int, n_photos: int):
+        self.stats = {"rejoined": rejoined, "new_exercises": new_exercises, "deleted": deleted}
+        print(f"[INFO] Joined {rejoined} of {n_photos} photos "
+              f"({new_exercises} new exercises, {deleted} deleted photos)")
+
+    def __str__(self):
+        return f"IncrementalJoiner({self.path})"
+
+    def __repr__(self):
+        return f"IncrementalJoiner({self.path})"
@@ -0,0 +1,343 @@
+import html
+import json
+import os
+import shutil
+import time
+
+import folium
+import numpy as np
+import pandas as pd
+from branca.element import MacroElement
+from folium.plugins import MarkerCluster
+from jinja2 import Template
+
+from exif_gps_mapper.helpers.route_index import grid_cells
+from exif_gps_mapper.helpers.simplify import simplify_tracks
+from exif_gps_mapper.preview_cache import PreviewCache
+
+
+class _LazyLayers(MacroElement):
+    """Fetches the track and photo files in view when the map has been zoomed in far enough."""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            var cluster = {{ this.cluster.get_name() }};
+            var tracks = {{ this.tracks }};
+            var cells = {{ this.cells }};
+            var zooms = {{ this.detail_zooms }};
+            var photoZoom = {{ this.photo_zoom }};
+            var style = {{ this.style }};
+
+            var counts = L.layerGroup(cells.map(function(c) {
+                return L.circleMarker([c[6], c[7]], {radius: 4 + 2 * Math.log(c[5]), weight: 1})
+                    .bindTooltip(c[5] + " photos");
+            }));
+            var detail = L.layerGroup().addTo(map);
+            var loadedTracks = {};
+            var loadedCells = {};
+
+            function inView(bounds, item) {
+                return bounds.intersects(L.latLngBounds([item[1], item[2]], [item[3], item[4]]));
+            }
+
+            function update() {
+                var zoom = map.getZoom();
+                var bounds = map.getBounds();
+                var level = null;
+                zooms.forEach(function(z) { if (zoom >= z) { level = z; } });
+
+                tracks.forEach(function(t) {
+                    if (level === null || !inView(bounds, t)) { return; }
+                    var entry = loadedTracks[t[0]] = loadedTracks[t[0]] || {level: -1};
+                    if (entry.level >= level) { return; }
+
+                    entry.level = level;
+                    fetch("tracks/" + t[0] + "/z" + level + ".geojson")
+                        .then(function(response) { return response.json(); })
+                        .then(function(data) {
+                            if (entry.layer) { detail.removeLayer(entry.layer); }
+                            entry.layer = L.geoJSON(data, {style: style}).addTo(detail);
+                        });
+                });
+
+                if (zoom < photoZoom) {
+                    map.removeLayer(cluster);
+                    map.addLayer(counts);
+                    return;
+                }
+
+                map.removeLayer(counts);
+                map.addLayer(cluster);
+
+                cells.forEach(function(c) {
+                    if (loadedCells[c[0]] || !inView(bounds, c)) { return; }
+
+                    loadedCells[c[0]] = true;
+                    fetch("photos/" + c[0] + ".json")
+                        .then(function(response) { return response.json(); })
+                        .then(function(rows) {
+                            cluster.addLayers(rows.map(function(row) {
+                                return L.marker([row[0], row[1]]).bindPopup(row[2]);
+                            }));
+                        });
+                });
+            }
+
+            map.on("moveend", update);
+            update();
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, cluster: MarkerCluster, tracks: list, cells: list, detail_zooms: list, photo_zoom: int,
+                 style: dict):
+        super().__init__()
+        self._name = "LazyLayers"
+
+        self.cluster = cluster
+        self.tracks = json.dumps(tracks)
+        self.cells = json.dumps(cells)
+        self.detail_zooms = json.dumps(sorted(detail_zooms))
+        self.photo_zoom = int(photo_zoom)
+        self.style = json.dumps(style)
+
+
+class MapExporter:
+    """Export routes and geotagged photos as a folium map whose size does not grow with the number of points.
+
+    The output directory holds
+        index.html                   every track simplified for `overview_zoom`, and photo counts per grid cell
+        tracks/<id>/z<zoom>.geojson  each track simplified for each of `detail_zooms`
+        tracks/fingerprints.json     the points each track file was simplified from
+        photos/<cell>.json           the photo markers of each grid cell of `photo_cell_degrees`
+    The page fetches the track and photo files in view once the map is zoomed in past their level, and the photo
+    markers are clustered. Tracks are simplified with Ramer-Douglas-Peucker to `pixel_tolerance` screen pixels at
+    each zoom level. Exercises exported earlier are not simplified again, unless their points have changed.
+
+    Browsers do not fetch files from a file:// page, so serve the data directory over HTTP, for example with
+    `python -m http.server -d data`, and open /map/. Preview images are linked from the PreviewCache next to it.
+    """
+
+    STYLE = {"color": "#d7301f", "weight": 3, "opacity": 0.8}
+
+    def __init__(self, path: str, overview_zoom: int = 8, detail_zooms: tuple = (12, 15), pixel_tolerance: float = 1.0,
+                 photo_zoom: int = 11, photo_cell_degrees: float = 0.25, tiles: str = "OpenStreetMap",
+                 preview_cache: PreviewCache | None = None):
+        assert all(z > overview_zoom for z in detail_zooms), "Detail zoom levels must be above the overview zoom."
+
+        # Settings
+        self.path = path
+        self.overview_zoom = overview_zoom
+        self.detail_zooms = list(detail_zooms)
+        self.pixel_tolerance = pixel_tolerance
+        self.photo_zoom = photo_zoom
+        self.photo_cell_degrees = photo_cell_degrees
+        self.tiles = tiles
+
+        # Popups show the cached preview of the photo, if there is one
+        self.preview_cache = preview_cache
+
+        self.stats = {}
+
+    @classmethod
+    def from_config(cls, config: dict, preview_cache: PreviewCache | None = None):
+        """Build from a config that has been passed through `helpers.config.add_config_filenames`."""
+        c = config.get("map") or {}
+
+        return cls(
+            config["db"]["map"],
+            overview_zoom=c.get("overview_zoom", 8),
+            detail_zooms=tuple(c.get("detail_zooms", (12, 15))),
+            pixel_tolerance=c.get("pixel_tolerance", 1.0),
+            photo_zoom=c.get("photo_zoom", 11),
+            photo_cell_degrees=c.get("photo_cell_degrees", 0.25),
+            tiles=c.get("tiles", "OpenStreetMap"),
+            preview_cache=preview_cache
+        )
+
+    def _track_path(self, exercise_id, zoom: int) -> str:
+        return os.path.join(self.path, "tracks", str(exercise_id), f"z{zoom}.geojson")
+
+    def _fingerprints(self, df_route: pd.DataFrame) -> dict:
+        # {exercise id: [points, bounds, coordinate sums, settings]}. A rebuilt route table can change a track in place.
+        agg = df_route.groupby("exercise_id").agg(
+            points=("latitude", "size"),
+            south=("latitude", "min"), west=("longitude", "min"), north=("latitude", "max"), east=("longitude", "max"),
+            latitude=("latitude", "sum"), longitude=("longitude", "sum")
+        )
+        settings = [self.overview_zoom, *self.detail_zooms, self.pixel_tolerance]
+        coordinates = np.round(agg.drop(columns="points").to_numpy("float64"), 6).tolist()
+
+        return {str(i): [int(n), *x, *settings] for i, n, x in zip(agg.index, agg["points"], coordinates)}
+
+    def _read_fingerprints(self) -> dict:
+        path = os.path.join(self.path, "tracks", "fingerprints.json")
+        if not os.path.exists(path):
+            return {}
+
+        with open(path, "r") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _as_route(df_route: pd.DataFrame) -> pd.DataFrame:
+        # GpxMaterializer stores point_time as the index
+        if "point_time" not in df_route.columns:
+            df_route = df_route.reset_index()
+
+        df_route = df_route.dropna(subset=["latitude", "longitude"])
+        return df_route.sort_values(["exercise_id", "point_time"], kind="stable", ignore_index=True)
+
+    @staticmethod
+    def _feature(exercise_id, latitude: np.ndarray, longitude: np.ndarray) -> dict:
+        # 6 decimals is about 10 cm
+        coordinates = np.round(np.column_stack([longitude, latitude]), 6).tolist()
+
+        return {
+            "type": "Feature",
+            "properties": {"exercise_id": int(exercise_id)},
+            "geometry": {"type": "LineString", "coordinates": coordinates}
+        }
+
+    def _write_tracks(self, df_route: pd.DataFrame) -> int:
+        """Simplify and write the tracks that are new or have changed. Returns the number of tracks written."""
+        levels = [self.overview_zoom] + self.detail_zooms
+
+        fingerprints = self._fingerprints(df_route)
+        previous = self._read_fingerprints()
+
+        new_ids = [int(x) for x, fingerprint in fingerprints.items() if previous.get(x) != fingerprint]
+        if not new_ids:
+            return 0
+
+        df_new = df_route[df_route["exercise_id"].isin(new_ids)]
+        latitude = df_new["latitude"].to_numpy("float64")
+        longitude = df_new["longitude"].to_numpy("float64")
+        groups = df_new["exercise_id"].to_numpy()
+
+        for zoom in levels:
+            # All new tracks in one vectorized pass per zoom level
+            keep = simplify_tracks(latitude, longitude, groups, zoom, self.pixel_tolerance)
+            kept = df_new.loc[keep, ["exercise_id", "latitude", "longitude"]]
+
+            for exercise_id, track in kept.groupby("exercise_id", sort=False):
+                path = self._track_path(exercise_id, zoom)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+
+                with open(f"{path}.tmp", "w") as f:
+                    json.dump(self._feature(exercise_id, track["latitude"], track["longitude"]), f)
+                os.replace(f"{path}.tmp", path)
+
+        # Written last: an interrupted export simplifies the tracks again
+        path = os.path.join(self.path, "tracks", "fingerprints.json")
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(fingerprints, f)
+        os.replace(f"{path}.tmp", path)
+
+        return len(new_ids)
+
+    def _overview(self, exercise_ids) -> dict:
+        features = []
+        for exercise_id in exercise_ids:
+            with open(self._track_path(exercise_id, self.overview_zoom), "r") as f:
+                features.append(json.load(f))
+
+        return {"type": "FeatureCollection", "features": features}
+
+    def _popups(self, df: pd.DataFrame) -> list:
+        names = [html.escape(os.path.basename(x)) for x in df["filepath"]]
+
+        if self.preview_cache is None or "st_mtime_ns" not in df.columns:
+            return names
+
+        # Linking a preview does not count as using it
+        srcs = [
+            None if x is None else html.escape(os.path.relpath(x, self.path).replace(os.sep, "/"))
+            for x in self.preview_cache.paths_of(df)
+        ]
+
+        return [
+            name if src is None else f'<img src="{src}" style="max-width:320px"><br>{name}'
+            for name, src in zip(names, srcs)
+        ]
+
+    def _write_photos(self, df_joined: pd.DataFrame) -> list:
+        """Write one marker file per grid cell. Returns [cell, south, west, north, east, count, lat, lon] per cell."""
+        photo_dir = os.path.join(self.path, "photos")
+
+        # Photos are rejoined and deleted between exports, so the cells are written from scratch
+        if os.path.exists(photo_dir):
+            shutil.rmtree(photo_dir)
+        os.makedirs(photo_dir)
+
+        df = df_joined[df_joined["latitude"].notna() & df_joined["longitude"].notna()].reset_index(drop=True)
+        if not len(df):
+            return []
+
+        df = df.assign(
+            _cell=grid_cells(df["latitude"], df["longitude"], self.photo_cell_degrees),
+            _popup=self._popups(df)
+        )
+        cells = []
+
+        for cell, photos in df.groupby("_cell"):
+            rows = [
+                [round(lat, 6), round(lon, 6), popup]
+                for lat, lon, popup in zip(photos["latitude"], photos["longitude"], photos["_popup"])
+            ]
+
+            with open(os.path.join(photo_dir, f"{cell}.json"), "w") as f:
+                json.dump(rows, f)
+
+            latitude, longitude = photos["latitude"], photos["longitude"]
+            cells.append([
+                int(cell), *np.round([latitude.min(), longitude.min(), latitude.max(), longitude.max()], 6).tolist(),
+                len(photos), *np.round([latitude.mean(), longitude.mean()], 6).tolist()
+            ])
+
+        return cells
+
+    def export(self, df_route: pd.DataFrame, df_joined: pd.DataFrame) -> str:
+        """Write the map of the route table and the joined photos (IncrementalJoiner). Returns the path of the HTML."""
+        started = time.perf_counter()
+        os.makedirs(self.path, exist_ok=True)
+
+        df_route = self._as_route(df_route)
+        n_written = self._write_tracks(df_route)
+
+        bounds = df_route.groupby("exercise_id").agg(
+            south=("latitude", "min"), west=("longitude", "min"), north=("latitude", "max"), east=("longitude", "max")
+        )
+        tracks = [[int(i), *np.round(x, 6).tolist()] for i, x in zip(bounds.index, bounds.to_numpy("float64"))]
+        cells = self._write_photos(df_joined)
+
+        m = folium.Map(tiles=self.tiles, prefer_canvas=True)
+        if len(bounds):
+            m.fit_bounds([[bounds["south"].min(), bounds["west"].min()], [bounds["north"].max(), bounds["east"].max()]])
+
+        folium.GeoJson(self._overview(bounds.index), name="Routes", style_function=lambda _: self.STYLE).add_to(m)
+        cluster = MarkerCluster(name="Photos").add_to(m)
+
+        m.add_child(_LazyLayers(cluster, tracks, cells, self.detail_zooms, self.photo_zoom, self.STYLE))
+
+        html_path = os.path.join(self.path, "index.html")
+        m.save(html_path)
+
+        self.stats = {
+            "exercises": len(bounds),
+            "exercises_written": n_written,
+            "photo_cells": len(cells),
+            "html_bytes": os.path.getsize(html_path),
+            "seconds": time.perf_counter() - started
+        }
+        print(f"[INFO] Map of {len(bounds)} exercises ({n_written} new) and {len(cells)} photo cells written to "
+              f"{html_path} ({self.stats['html_bytes'] / 1e6:.1f} MB) in {self.stats['seconds']:.1f} s")
+
+        return html_path
+
+    def __str__(self):
+        return f"MapExporter({self.path})"
+
+    def __repr__(self):
+        return f"MapExporter({self.path})"
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+
+class ColumnBuffer:
+    """Typed, per-column staging area for the rows of a Materializer.
+
+    Each SCHEMA column is a preallocated NumPy array that doubles in size when full, so staging a row costs one
+    assignment per column instead of a Python tuple. Columns of the pandas 'string' dtype are kept as object arrays.
+    """
+
+    def __init__(self, schema: dict, capacity: int = 1024):
+        # Settings
+        self.schema = schema
+        self.initial_capacity = capacity
+
+        # Containers
+        self._columns = {}
+        self._size = 0
+        self._allocate(capacity)
+
+    @staticmethod
+    def _numpy_dtype(dtype: str) -> np.dtype:
+        if dtype == "string":
+            return np.dtype("object")
+        return np.dtype(dtype)
+
+    def _allocate(self, capacity: int):
+        # Copy the staged rows into new arrays of the given capacity
+        columns = {}
+        for name, dtype in self.schema.items():
+            column = np.empty(capacity, dtype=self._numpy_dtype(dtype))
+
+            if name in self._columns:
+                column[:self._size] = self._columns[name][:self._size]
+
+            columns[name] = column
+
+        self._columns = columns
+        self.capacity = capacity
+
+    def _reserve(self, n: int):
+        # Geometric growth keeps appends amortized O(1)
+        if self._size + n > self.capacity:
+            self._allocate(max(2 * self.capacity, self._size + n))
+
+    def append(self, row: tuple):
+        self._reserve(1)
+
+        for column, value in zip(self._columns.values(), row):
+            column[self._size] = value
+
+        self._size += 1
+
+    def extend(self, columns: dict):
+        """Append many rows given as one array-like per column."""
+        n = len(next(iter(columns.values())))
+        self._reserve(n)
+
+        for name, column in self._columns.items():
+            column[self._size:self._size + n] = columns[name]
+
+        self._size += n
+
+    def to_dataframe(self) -> pd.DataFrame:
+        df = pd.DataFrame({name: column[:self._size] for name, column in self._columns.items()})
+        return df.astype(self.schema)
+
+    def clear(self):
+        # Release the memory of a grown buffer
+        self._columns = {}
+        self._size = 0
+        self._allocate(self.initial_capacity)
+
+    @property
+    def nbytes(self) -> int:
+        # Bytes of the staged rows, not of the spare capacity. Object columns count their pointers only.
+        return self._size * sum(column.itemsize for column in self._columns.values())
+
+    def __len__(self):
+        return self._size
@@ -1,9 +1,12 @@
+import pyarrow as pa
+
 from exif_gps_mapper.materialisers.materializer import Materializer
 
 
 class ExerciseMaterializer(Materializer):
 
     # Class variables as constants
+    TABLE = "exercise"
     INDEX = "id"
     SCHEMA = {
         'id': 'int64',
@@ -13,10 +16,11 @@ class ExerciseMaterializer(Materializer):
         'has-route': 'bool',
         'detailed-sport-info': 'string'
     }
+    PARTITION_SCHEMA = pa.schema([("transaction-id", pa.int64())])
 
     def add(self, exercise_data: dict):
         # Convert to tuple
         row = tuple(exercise_data[col] for col in self.SCHEMA)
 
         # Add
-        self.rows.append(row)
+        self.add_row(row)
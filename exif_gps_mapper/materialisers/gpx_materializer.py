@@ -1,11 +1,20 @@
-import gpxpy
+import os
 
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+from exif_gps_mapper.helpers.dataset_store import MONTH_PARTITION_SCHEMA, month_partitions
+from exif_gps_mapper.helpers.route_index import RouteIndex, route_filter
+from exif_gps_mapper.helpers.simplify import thin_route
+from exif_gps_mapper.materialisers.gpx_parser import parse_gpx
 from exif_gps_mapper.materialisers.materializer import Materializer
 
 
 class GpxMaterializer(Materializer):
 
     # Class variables as constants
+    TABLE = "route"
     INDEX = "point_time"
     SCHEMA = {
         'exercise_id': 'int64',
@@ -13,6 +22,116 @@ class GpxMaterializer(Materializer):
         'longitude': 'float64',
         'point_time': 'datetime64[ns]'
     }
+    PARTITION_SCHEMA = MONTH_PARTITION_SCHEMA
+
+    def __init__(self, path: str, layout: str = "file", parser: str = "fast", row_group_size: int = 65536,
+                 cell_degrees: float | None = 0.05, simplify: dict | None = None, simplified_path: str | None = None,
+                 **kwargs):
+        # "fast": streaming expat parser into arrays, with gpxpy as the fallback. "gpxpy": gpxpy only.
+        assert parser in ("fast", "gpxpy"), f"Unknown GPX parser ({parser})."
+        self.parser = parser
+
+        # Route index: rows are sorted by point_time in row groups of this size, and close() writes a sidecar of the
+        # grid cells of each row group. None skips the sidecar.
+        self.cell_degrees = cell_degrees
+
+        super().__init__(path, layout, **kwargs)
+        self.write_options = {"row_group_size": row_group_size}
+
+        # Optional reduced-resolution copy of the table, written on every flush. `simplify` holds the keyword
+        # arguments of helpers.simplify.thin_route: tolerance (m), min_interval (e.g. "5s") and min_distance (m).
+        self.simplify = simplify
+        self.simplified = None
+        if simplify is not None:
+            assert simplified_path is not None, "A simplified route table needs a path."
+            self.simplified = GpxMaterializer(
+                simplified_path, layout, parser, row_group_size=row_group_size, cell_degrees=cell_degrees, **kwargs
+            )
+
+    @classmethod
+    def from_config(cls, config: dict, **kwargs):
+        c = config["db"]
+        kwargs.setdefault("row_group_size", c.get("route_row_group_size", 65536))
+        kwargs.setdefault("cell_degrees", c.get("route_cell_degrees", 0.05))
+
+        if c.get("route_simplify"):
+            kwargs.setdefault("simplify", c["route_simplify"])
+            kwargs.setdefault("simplified_path", c["route_simplified"])
+
+        return super().from_config(config, **kwargs)
+
+    def partitioner(self):
+        return lambda df: month_partitions(df["point_time"])
+
+    def _partition_filter(self, df_batch: pd.DataFrame) -> ds.Expression:
+        # A point_time can only exist in the partition of its own month
+        partitions = month_partitions(df_batch["point_time"]).drop_duplicates()
+
+        return ds.field("year").isin(partitions["year"].tolist()) & \
+            ds.field("month").isin(partitions["month"].tolist())
+
+    def generate_dataframe(self) -> pd.DataFrame:
+        # Sorted rows give tight point_time statistics per row group
+        return super().generate_dataframe().sort_index()
+
+    def flush(self, fsync: bool = False):
+        if self.simplified is not None and len(self):
+            # add() and add_arrays() stage each track whole, so it is simplified in one piece. Rows staged one by one
+            # with add_row() can be split between flushes by flush_rows, and are simplified per part.
+            df = self.buffer.to_dataframe().sort_values(["exercise_id", "point_time"], kind="stable")
+
+            keep = thin_route(
+                df["latitude"].to_numpy(), df["longitude"].to_numpy(), df["point_time"].to_numpy(),
+                df["exercise_id"].to_numpy(), **self.simplify
+            )
+            self.simplified.add_columns({name: df[name].to_numpy()[keep] for name in self.SCHEMA})
+
+        super().flush(fsync)
+
+        if self.simplified is not None:
+            self.simplified.flush(fsync)
+
+    def close(self):
+        super().close()
+
+        # Only when the table has been written since the sidecar was built: building reads every row group
+        if self.layout == "file" and self.cell_degrees is not None and os.path.exists(self.path):
+            route_index = self.route_index()
+            if not route_index.is_current():
+                route_index.build()
+
+        if self.simplified is not None:
+            self.simplified.close()
+
+    def _empty(self) -> pd.DataFrame:
+        return pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in self.SCHEMA.items()}).set_index(self.INDEX)
+
+    def route_index(self) -> RouteIndex:
+        return RouteIndex(self.path, self.cell_degrees or 0.05)
+
+    def query(self, bbox: tuple | None = None, start=None, end=None) -> pd.DataFrame:
+        """Route points inside `bbox` (south, west, north, east) between `start` and `end`, both inclusive.
+
+        Only the row groups (file layout) or partitions and row groups (partitioned layout) that can contain matching
+        points are read.
+        """
+        if self.layout == "partitioned":
+            expression = route_filter(bbox, start, end)
+
+            # Month partitions of the time range
+            if start is not None and end is not None:
+                months = pd.period_range(pd.Timestamp(start), pd.Timestamp(end), freq="M")
+                partitions = ds.field("year").isin(sorted(set(months.year))) & \
+                    ds.field("month").isin(sorted(set(months.month)))
+                expression = partitions if expression is None else expression & partitions
+
+            df = self.read(filter=expression)
+            return self._empty() if df is None else df.sort_index()
+
+        if not os.path.exists(self.path):
+            return self._empty()
+
+        return self.route_index().query(bbox, start, end)
 
     def add(self, gpx_data: str, exercise_id: int):
 
@@ -20,17 +139,14 @@ class GpxMaterializer(Materializer):
 
             assert exercise_id is not None, "The required foreign key exercise_id was passed in as NULL."
 
-            # Parse to GPX object
-            gpx = gpxpy.parse(gpx_data)
-
-            # Generate rows
-            for track in gpx.tracks:
-                for segment in track.segments:
-                    for p in segment.points:
-                        # Cut out microseconds
-                        time_trunc = p.time.replace(microsecond=0, tzinfo=None)
+            # Each track is staged as one columnar batch, whichever parser reads it
+            self.add_arrays(parse_gpx(gpx_data, self.parser), exercise_id)
 
-                        # Append as tuple
-                        self.rows.append(
-                            (exercise_id, p.latitude, p.longitude, time_trunc)
-                        )
+    def add_arrays(self, arrays: dict, exercise_id: int):
+        """Stage the output of `parse_gpx_arrays` as one columnar batch."""
+        self.add_columns({
+            "exercise_id": np.full(len(arrays["point_time"]), exercise_id, dtype="int64"),
+            "latitude": arrays["latitude"],
+            "longitude": arrays["longitude"],
+            "point_time": arrays["point_time"]
+        })
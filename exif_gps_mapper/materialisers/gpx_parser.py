@@ -0,0 +1,121 @@
+from array import array
+from xml.parsers import expat
+
+import gpxpy
+import numpy as np
+import pandas as pd
+
+
+class _TrackPointHandler:
+    """Expat callbacks that collect lat/lon/time of every <trkpt> without building an element tree."""
+
+    def __init__(self):
+        # Containers
+        self.latitudes = array("d")
+        self.longitudes = array("d")
+        self.times = []
+
+        # Parser state
+        self._in_trkpt = False
+        self._in_time = False
+        self._time = None
+
+    @staticmethod
+    def _local_name(name: str) -> str:
+        # Namespaced names come in as "<uri> <local name>"
+        return name.rpartition(" ")[2]
+
+    def start(self, name: str, attrs: dict):
+        name = self._local_name(name)
+
+        if name == "trkpt":
+            self._in_trkpt = True
+            self._time = None
+            self.latitudes.append(float(attrs["lat"]))
+            self.longitudes.append(float(attrs["lon"]))
+
+        elif name == "time" and self._in_trkpt:
+            self._in_time = True
+
+    def end(self, name: str):
+        name = self._local_name(name)
+
+        if name == "time":
+            self._in_time = False
+
+        elif name == "trkpt":
+            if self._time is None:
+                raise ValueError("Track point without a time.")
+
+            self.times.append(self._time)
+            self._in_trkpt = False
+
+    def text(self, data: str):
+        if self._in_time:
+            self._time = data.strip()
+
+
+def parse_gpx_arrays(gpx_data: str | bytes) -> dict:
+    """Parse the track points of a GPX document into typed arrays.
+
+    Returns {"latitude": float64, "longitude": float64, "point_time": datetime64[ns]} where times are naive UTC and
+    truncated to whole seconds. Raises ValueError or expat.ExpatError for documents this parser does not handle.
+    """
+    handler = _TrackPointHandler()
+
+    parser = expat.ParserCreate(namespace_separator=" ")
+    parser.buffer_text = True
+    parser.StartElementHandler = handler.start
+    parser.EndElementHandler = handler.end
+    parser.CharacterDataHandler = handler.text
+    parser.Parse(gpx_data, True)
+
+    # Vectorized ISO 8601 parsing, then cut out microseconds
+    point_time = pd.to_datetime(handler.times, utc=True).tz_convert(None).floor("s")
+
+    return {
+        "latitude": np.frombuffer(handler.latitudes, dtype="float64"),
+        "longitude": np.frombuffer(handler.longitudes, dtype="float64"),
+        "point_time": point_time.to_numpy(dtype="datetime64[ns]")
+    }
+
+
+def parse_gpx_gpxpy(gpx_data: str) -> dict:
+    """Parse the track points of a GPX document with gpxpy, into the arrays of `parse_gpx_arrays`."""
+    gpx = gpxpy.parse(gpx_data)
+    points = [p for track in gpx.tracks for segment in track.segments for p in segment.points]
+
+    return {
+        "latitude": np.array([p.latitude for p in points], dtype="float64"),
+        "longitude": np.array([p.longitude for p in points], dtype="float64"),
+        # Cut out microseconds
+        "point_time": np.array([p.time.replace(microsecond=0, tzinfo=None) for p in points], dtype="datetime64[ns]")
+    }
+
+
+def parse_gpx(gpx_data: str, parser: str = "fast") -> dict:
+    """Parse with a parser setting of GpxMaterializer.
+
+    "fast" uses `parse_gpx_arrays`, with gpxpy as the fallback for documents it does not handle. "gpxpy" uses gpxpy
+    only.
+    """
+    if parser == "fast":
+        try:
+            return parse_gpx_arrays(gpx_data)
+        except (ValueError, KeyError, expat.ExpatError):
+            # Odd files go through gpxpy
+            pass
+
+    return parse_gpx_gpxpy(gpx_data)
+
+
+def try_parse_gpx(gpx_data: str, parser: str = "fast") -> dict | None:
+    """`parse_gpx` for process pool jobs. None if the document cannot be parsed.
+
+    gpxpy exceptions do not survive pickling, so the caller parses a failed document again with
+    `GpxMaterializer.add` to raise the error in its own process.
+    """
+    try:
+        return parse_gpx(gpx_data, parser)
+    except (ValueError, KeyError, expat.ExpatError, gpxpy.gpx.GPXException):
+        return None
@@ -2,6 +2,12 @@ import os
 from abc import ABC, abstractmethod
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from exif_gps_mapper.helpers.dataset_store import PartitionedStore
+from exif_gps_mapper.helpers.fsync import fsync_dir, fsync_file
+from exif_gps_mapper.materialisers.column_buffer import ColumnBuffer
 
 
 class Materializer(ABC):
@@ -9,26 +15,90 @@ class Materializer(ABC):
     SCHEMA = None
     INDEX = None
 
-    def __init__(self, path: str):
+    # Key of the table in config["db"]
+    TABLE = None
+
+    # Partition columns of the "partitioned" layout
+    PARTITION_SCHEMA: pa.Schema = None
+
+    def __init__(self, path: str, layout: str = "file", flush_rows: int | None = None, flush_bytes: int | None = None):
         # Settings
         self.path = path
 
+        # add() writes the staged rows automatically once either threshold is passed. None: only close() writes.
+        # Partitioned layout only: the file layout rewrites the whole table on every flush.
+        self.flush_rows = flush_rows
+        self.flush_bytes = flush_bytes
+
+        # "file": one parquet file rewritten on close. "partitioned": append-only dataset directory.
+        assert layout in ("file", "partitioned"), f"Unknown layout ({layout})."
+        self.layout = layout
+
+        self.store = None
+        if layout == "partitioned":
+            self.store = PartitionedStore(
+                path, self.INDEX, self.PARTITION_SCHEMA, partitioner=self.partitioner()
+            )
+
+        # Passed to DataFrame.to_parquet in the "file" layout
+        self.write_options = {}
+
         # Container
         self.db = self._read()
-        self.rows = []
+        self.buffer = ColumnBuffer(self.SCHEMA)
+
+    @classmethod
+    def from_config(cls, config: dict, **kwargs):
+        """Build from a config that has been passed through `helpers.config.add_config_filenames`."""
+        c = config["db"]
+
+        return cls(
+            c[cls.TABLE],
+            layout=c.get("layout", "file"),
+            flush_rows=c.get("flush_rows"),
+            flush_bytes=c.get("flush_bytes"),
+            **kwargs
+        )
+
+    def partitioner(self):
+        # None: the partition columns are data columns
+        return None
+
+    def _partition_filter(self, df_batch: pd.DataFrame) -> ds.Expression | None:
+        # Partitions that can contain the keys of df_batch. None reads the keys of every partition.
+        return None
 
     def _read(self) -> pd.DataFrame | None:
+        # The partitioned layout is not loaded into memory. Use read() instead.
+        if self.layout == "partitioned":
+            return None
+
         if os.path.exists(self.path):
             return pd.read_parquet(self.path)
         else:
             return None
 
+    def read(self, filter: ds.Expression | None = None) -> pd.DataFrame | None:
+        if self.layout == "partitioned":
+            df = self.store.read(filter=filter)
+            return None if df is None else df.astype(self.SCHEMA).set_index(self.INDEX)
+
+        return self._read()
+
     def generate_dataframe(self) -> pd.DataFrame:
-        # Apply schema to list<tuples>
-        df_batch = pd.DataFrame(self.rows, columns=self.SCHEMA)
-        df_batch = df_batch.astype(self.SCHEMA)
+        """Return the table to be written.
+
+        In the "file" layout this is the existing table plus the new rows. In the "partitioned" layout this is only
+        the new rows, since they are appended to the dataset.
+        """
+        # Typed columns to DataFrame
+        df_batch = self.buffer.to_dataframe()
         df_batch = df_batch.set_index(self.INDEX)
 
+        if self.layout == "partitioned":
+            existing = self.store.keys(filter=self._partition_filter(df_batch.reset_index()))
+            return df_batch[~df_batch.index.isin(existing)]
+
         if self.db is None:
             # Full Load
             return df_batch
@@ -42,21 +112,68 @@ class Materializer(ABC):
             )
         return df_joined
 
-    def close(self):
+    def add_row(self, row: tuple):
+        """Stage one row with values in SCHEMA order."""
+        self.buffer.append(row)
+        self._flush_if_full()
+
+    def add_columns(self, columns: dict):
+        """Stage rows given as one array per SCHEMA column, without building a tuple per row."""
+        self.buffer.extend(columns)
+        self._flush_if_full()
+
+    def _flush_if_full(self):
+        # The file layout keeps the whole table in self.db and rewrites it on every flush. Spilling would not bound
+        # memory, and long loads would become quadratic.
+        if self.layout == "file":
+            return
+
+        if self.flush_rows is not None and len(self.buffer) >= self.flush_rows:
+            self.flush()
+        elif self.flush_bytes is not None and self.buffer.nbytes >= self.flush_bytes:
+            self.flush()
+
+    def flush(self, fsync: bool = False):
+        """Write the staged rows and empty the buffer.
 
-        if len(self.rows):
+        With `fsync`, the written files and directories are on disk when this returns, and survive a power loss.
+        """
+
+        if len(self):
             # Generate
             df = self.generate_dataframe()
 
             # Write
-            if len(df):
-                df.to_parquet(self.path)
+            if self.layout == "partitioned":
+                self.store.append(df.reset_index(), fsync=fsync)
+
+            elif len(df):
+                # A crash during the write leaves the previous table in place
+                df.to_parquet(f"{self.path}.tmp", **self.write_options)
+
+                # The contents must be on disk before the rename makes them the table
+                if fsync:
+                    fsync_file(f"{self.path}.tmp")
+                os.replace(f"{self.path}.tmp", self.path)
+                if fsync:
+                    fsync_dir(os.path.dirname(os.path.abspath(self.path)))
+
+                # Later flushes join against what was just written
+                self.db = df
+
+            # Clear staging
+            self.buffer.clear()
+
+    def close(self):
+        self.flush()
 
-                # Clear staging
-                self.rows = []
+    def compact(self):
+        # Only the partitioned layout accumulates files and tombstones
+        if self.layout == "partitioned":
+            self.store.compact()
 
     def __len__(self):
-        return len(self.rows)
+        return len(self.buffer)
 
     @abstractmethod
     def add(self, *args):
@@ -0,0 +1,198 @@
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from exif_gps_mapper.accesslink.journal import TransactionJournal
+from exif_gps_mapper.accesslink.raw_cache import RawCache
+from exif_gps_mapper.accesslink.transaction_pool import TransactionPool
+from exif_gps_mapper.materialisers.exercise_materializer import ExerciseMaterializer
+from exif_gps_mapper.materialisers.gpx_materializer import GpxMaterializer
+from exif_gps_mapper.materialisers.gpx_parser import try_parse_gpx
+
+
+class SyncPipeline:
+    """Overlap Accesslink downloads with GPX parsing.
+
+    A downloader thread iterates the TransactionPool and puts the exercises into a bounded queue. The calling thread
+    takes them off the queue, parses GPX files on a process pool and stages the rows in the materializers. When a
+    transaction has been consumed, both materializers are flushed, and only then is the downloader allowed to ask
+    for the next transaction, which is when TransactionPool commits the previous one.
+
+    With a TransactionJournal, each transaction is sealed in the journal before it can be committed and marked
+    applied once the flushed files have been synced to disk. Transactions left in the journal by a crash are replayed
+    when run() starts. With a RawCache, every download is also kept for `rebuild`.
+    """
+
+    # Queue items
+    _EXERCISE, _END, _DONE, _ERROR = range(4)
+
+    def __init__(self, pool: TransactionPool, exercise_materializer: ExerciseMaterializer,
+                 gpx_materializer: GpxMaterializer, parse_workers: int | None = None, queue_size: int = 64,
+                 journal: TransactionJournal | None = None, raw_cache: RawCache | None = None):
+        self.pool = pool
+        self.exercise_materializer = exercise_materializer
+        self.gpx_materializer = gpx_materializer
+        self.journal = journal
+        self.raw_cache = raw_cache
+
+        # Settings. None uses one parse process per CPU.
+        self.parse_workers = parse_workers
+        self.queue_size = queue_size
+
+        # Downloader -> consumer, and the consumer's answer at the end of each transaction
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._flushed: queue.Queue = queue.Queue()
+        self._stop = threading.Event()
+
+        self.stats = {"transactions": 0, "exercises": 0, "gpx": 0, "replayed": 0}
+
+    @classmethod
+    def from_config(cls, config: dict, access_token: str, user_id: str):
+        """Build the pipeline of `user_id` from a config passed through `helpers.config.add_config_filenames`.
+
+        The transaction pool gets the accesslink.max_workers and accesslink.ordered settings.
+        """
+        c = config["accesslink"]
+        journal_path = config["db"].get("journal", os.path.join(config["db"]["dir"], "journal"))
+        raw_path = config["db"].get("raw", os.path.join(config["db"]["dir"], "raw"))
+
+        return cls(
+            TransactionPool.from_config(config, access_token, user_id),
+            ExerciseMaterializer.from_config(config),
+            GpxMaterializer.from_config(config),
+            parse_workers=c.get("parse_workers"),
+            queue_size=c.get("queue_size", 64),
+            journal=TransactionJournal(journal_path),
+            raw_cache=RawCache(raw_path)
+        )
+
+    def _put(self, item: tuple) -> bool:
+        # Blocks while the queue is full (backpressure), but gives up if the consumer has failed
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _download(self):
+        try:
+            # next() commits the previous transaction
+            for transaction in self.pool:
+                entries = []
+
+                for exercise, gpx in transaction:
+                    entries.append((exercise, gpx))
+
+                    if self.raw_cache is not None:
+                        self.raw_cache.put(exercise, gpx, transaction.transaction_id)
+
+                    if not self._put((self._EXERCISE, exercise, gpx)):
+                        return
+
+                # Durable before the commit
+                if self.journal is not None:
+                    self.journal.seal(transaction.transaction_id, entries)
+
+                if not self._put((self._END, transaction)):
+                    return
+
+                # Wait until the rows of this transaction have been written
+                if not self._flushed.get():
+                    return
+
+            self._put((self._DONE,))
+
+        except BaseException as err:
+            self._put((self._ERROR, err))
+
+    def _collect(self, exercise_id: int, gpx: str, future):
+        arrays = future.result()
+
+        if arrays is not None:
+            self.gpx_materializer.add_arrays(arrays, exercise_id)
+        else:
+            # Parsed again here, to raise the parse error in this process
+            self.gpx_materializer.add(gpx, exercise_id)
+
+        self.stats["gpx"] += 1
+
+    def run(self) -> dict:
+        """Sync until the pool is exhausted. Returns counts of transactions, exercises and GPX files."""
+        if self.journal is not None:
+            self.stats["replayed"] = self.journal.replay(self.exercise_materializer, self.gpx_materializer)
+
+        downloader = threading.Thread(target=self._download, name="accesslink-downloader", daemon=True)
+
+        try:
+            parse_workers = self.parse_workers or os.cpu_count() or 1
+
+            with ProcessPoolExecutor(max_workers=parse_workers) as executor:
+                downloader.start()
+
+                # GPX files being parsed, in arrival order
+                pending = deque()
+                max_pending = 2 * parse_workers
+
+                while True:
+                    item = self._queue.get()
+
+                    if item[0] == self._EXERCISE:
+                        _, exercise, gpx = item
+                        self.exercise_materializer.add(exercise)
+                        self.stats["exercises"] += 1
+
+                        if gpx:
+                            future = executor.submit(try_parse_gpx, gpx, self.gpx_materializer.parser)
+                            pending.append((exercise["id"], gpx, future))
+
+                        while len(pending) > max_pending:
+                            self._collect(*pending.popleft())
+
+                    elif item[0] == self._END:
+                        transaction = item[1]
+
+                        while pending:
+                            self._collect(*pending.popleft())
+
+                        # With a journal, the rows must be on disk before the journal entry is removed
+                        fsync = self.journal is not None
+                        self.exercise_materializer.flush(fsync=fsync)
+                        self.gpx_materializer.flush(fsync=fsync)
+                        self.stats["transactions"] += 1
+
+                        if self.journal is not None:
+                            self.journal.mark_applied(transaction.transaction_id)
+
+                        # Allow the commit
+                        self._flushed.put(True)
+
+                    elif item[0] == self._DONE:
+                        break
+
+                    else:
+                        raise item[1]
+
+        except BaseException:
+            # Nothing more is committed
+            self._stop.set()
+            self._flushed.put(False)
+            raise
+
+        finally:
+            downloader.join()
+
+        # Everything is flushed already; close() also refreshes the route index
+        self.exercise_materializer.close()
+        self.gpx_materializer.close()
+
+        return self.stats
+
+    def __str__(self):
+        return f"SyncPipeline({self.pool})"
+
+    def __repr__(self):
+        return f"SyncPipeline({self.pool})"
@@ -0,0 +1,290 @@
+import base64
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from exif_gps_mapper.exiftool_pool import ExifToolPool
+from exif_gps_mapper.helpers.blob_store import BlobStore
+
+try:
+    from PIL import Image
+except ImportError:
+    # Pillow is optional (poetry install -E previews). Without it, previews are cached at their embedded size.
+    Image = None
+
+
+class PreviewCache:
+    """Small JPEG previews of the images, for map popups.
+
+    RAW files carry an embedded JPEG preview. It is read with exiftool -b in parallel batches, downsized to
+    `max_size` pixels (with Pillow) and stored in `<path>/<key[:2]>/<key>.jpg`, where the key is a hash of the
+    filepath and modification time. An image that has not changed is never read again, and an edited image gets a
+    new key. Images without a preview are stored as empty files, so that they are not read again either.
+
+    With a `blob_store`, previews that ExifDatabase.extract_blobs has already stored in its `blob_field` are taken
+    from there, and only the other images are read with exiftool.
+
+    The cache is capped at `max_bytes`. Every hit refreshes the file's modification time, and the least recently
+    used previews are evicted first.
+    """
+
+    # Embedded images in order of preference. The first one found is used.
+    PREVIEW_TAGS = ["PreviewImage", "JpgFromRaw", "ThumbnailImage"]
+
+    def __init__(self, path: str, max_bytes: int = 1 << 30, max_size: int | None = 320, quality: int = 80,
+                 n_workers: int = 1, chunk_size: int = 20, blob_store: BlobStore | None = None,
+                 blob_field: str | None = None):
+        assert (blob_store is None) == (blob_field is None), "A blob store needs a blob field, and vice versa."
+
+        # Settings
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_size = max_size
+        self.quality = quality
+
+        # Parallel exiftool processes, and images per exiftool call. Previews are large, so chunks are small.
+        self.n_workers = n_workers
+        self.chunk_size = chunk_size
+
+        # Embedded previews already read by ExifDatabase.extract_blobs
+        self.blob_store = blob_store
+        self.blob_field = blob_field
+
+        # Bytes on disk, counted on first use
+        self._bytes: int | None = None
+        self._lock = threading.Lock()
+
+        self.stats = {}
+
+        os.makedirs(path, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """Build from a config that has been passed through `helpers.config.add_config_filenames`."""
+        c = config.get("preview") or {}
+
+        # A blob field of input.exif_blobs that holds one of the preview tags
+        blobs = (config.get("input") or {}).get("exif_blobs") or {}
+        blob_field = next((name for name, tag in blobs.items() if tag.rsplit(":", 1)[-1] in cls.PREVIEW_TAGS), None)
+
+        return cls(
+            config["db"]["previews"],
+            max_bytes=c.get("max_bytes", 1 << 30),
+            max_size=c.get("max_size", 320),
+            quality=c.get("quality", 80),
+            n_workers=c.get("workers", 1),
+            chunk_size=c.get("chunk_size", 20),
+            blob_store=BlobStore(config["db"]["blobs"]) if blob_field is not None else None,
+            blob_field=blob_field
+        )
+
+    @staticmethod
+    def key(filepath: str, st_mtime_ns: int) -> str:
+        return hashlib.sha256(f"{filepath}\0{int(st_mtime_ns)}".encode("utf-8")).hexdigest()
+
+    def _object_path(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], f"{key}.jpg")
+
+    def path_of(self, row: pd.Series) -> str | None:
+        """Path of the cached preview of an exif table row, or None if there is none."""
+        path = self._object_path(self.key(row["filepath"], row["st_mtime_ns"]))
+
+        try:
+            if not os.path.getsize(path):
+                return None
+
+            # Recently used
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            return None
+
+    def paths_of(self, df_exif: pd.DataFrame) -> pd.Series:
+        """Paths of the cached previews of exif table rows, None where there is none.
+
+        Unlike `path_of()`, the previews are not marked as used, so linking every preview does not defeat the eviction
+        order.
+        """
+        paths = [self._object_path(self.key(x, y)) for x, y in zip(df_exif["filepath"], df_exif["st_mtime_ns"])]
+        return pd.Series([x if self._exists(x) else None for x in paths], index=df_exif.index, dtype="object")
+
+    @staticmethod
+    def _exists(path: str) -> bool:
+        # Empty files mark images without a preview
+        try:
+            return os.path.getsize(path) > 0
+        except FileNotFoundError:
+            return False
+
+    def get(self, row: pd.Series) -> bytes | None:
+        """The cached preview of an exif table row as JPEG bytes."""
+        path = self.path_of(row)
+        if path is None:
+            return None
+
+        with open(path, "rb") as f:
+            return f.read()
+
+    def _missing(self, df_exif: pd.DataFrame) -> list:
+        # (filepath, key) of the rows that have not been read at their current mtime
+        keys = [self.key(x, y) for x, y in zip(df_exif["filepath"], df_exif["st_mtime_ns"])]
+        return [(x, key) for x, key in zip(df_exif["filepath"], keys) if not os.path.exists(self._object_path(key))]
+
+    def _preview(self, tags: dict) -> bytes | None:
+        # exiftool -G names the tags "EXIF:ThumbnailImage", "Composite:PreviewImage" etc.
+        by_name = {name.rsplit(":", 1)[-1]: value for name, value in tags.items()}
+
+        for name in self.PREVIEW_TAGS:
+            value = by_name.get(name)
+            if isinstance(value, str) and value.startswith("base64:"):
+                return base64.b64decode(value[len("base64:"):])
+
+        return None
+
+    def _downsize(self, data: bytes) -> bytes:
+        if Image is None or self.max_size is None:
+            return data
+
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                # For JPEG, decode at a reduced scale (1/2 ... 1/8) instead of decoding full size and shrinking
+                image.draft("RGB", (self.max_size, self.max_size))
+                image.thumbnail((self.max_size, self.max_size))
+
+                out = io.BytesIO()
+                image.convert("RGB").save(out, format="JPEG", quality=self.quality)
+        except (OSError, ValueError, SyntaxError, Image.DecompressionBombError) as e:
+            # A corrupt or unknown embedded image is stored as it is, like without Pillow. The rest of the chunk
+            # is not affected.
+            print(f"[ERROR] Preview could not be downsized: {e!r}")
+            return data
+
+        return out.getvalue()
+
+    def _store(self, key: str, data: bytes | None) -> int:
+        path = self._object_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        data = self._downsize(data) if data is not None else b""
+
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        return len(data)
+
+    def _from_blobs(self, df_exif: pd.DataFrame, missing: list) -> tuple:
+        # ([(key, preview)] found in the blob store, [(filepath, key)] still to be read with exiftool)
+        if self.blob_store is None or "st_size" not in df_exif.columns:
+            return [], missing
+
+        stats = dict(zip(df_exif["filepath"], zip(df_exif["st_mtime_ns"], df_exif["st_size"])))
+        found, remaining = [], []
+
+        for filepath, key in missing:
+            # Only a blob read from the file as it is now. A missing tag may still be found under another name.
+            data = self.blob_store.get(self.blob_field, filepath, *stats[filepath])
+
+            if data is None:
+                remaining.append((filepath, key))
+            else:
+                found.append((key, data))
+
+        return found, remaining
+
+    def build(self, df_exif: pd.DataFrame) -> int:
+        """Cache the previews of the rows of `df_exif` (an ExifDatabase table) that are not cached yet.
+
+        Returns the number of images cached, from the blob store or read with exiftool.
+        """
+        missing = self._missing(df_exif)
+        if not len(missing):
+            return 0
+
+        from_blobs, missing = self._from_blobs(df_exif, missing)
+
+        # exiftool reports SourceFile in its own spelling of the path, so both sides are normalised
+        keys = {os.path.normpath(x): key for x, key in missing}
+        n_previews = len(from_blobs)
+
+        # Pillow releases the GIL while decoding, so previews are downsized in parallel
+        with ThreadPoolExecutor(max_workers=self.n_workers) as executor:
+            self._add_bytes(sum(executor.map(lambda x: self._store(*x), from_blobs)))
+
+            if keys:
+                with ExifToolPool(self.n_workers, self.chunk_size) as pool:
+                    for chunk in pool.imap_chunks(sorted(keys), tags=self.PREVIEW_TAGS, params=["-b"]):
+                        previews = [
+                            (keys[os.path.normpath(x["SourceFile"])], self._preview(x)) for x in chunk
+                            if os.path.normpath(x["SourceFile"]) in keys
+                        ]
+                        written = list(executor.map(lambda x: self._store(*x), previews))
+
+                        n_previews += sum(x[1] is not None for x in previews)
+                        self._add_bytes(sum(written))
+
+        self.evict()
+
+        n_images = len(from_blobs) + len(keys)
+        self.stats = {"images": n_images, "previews": n_previews, "from_blobs": len(from_blobs)}
+        print(f"[INFO] Cached {n_previews} previews of {n_images} images in {self.path}" +
+              (f" ({len(from_blobs)} from {self.blob_store})" if self.blob_store is not None else ""))
+
+        return n_images
+
+    def _objects(self) -> list:
+        # [(mtime, size, path)] of every cached preview
+        objects = []
+        for root, _, file_names in os.walk(self.path):
+            for file_name in file_names:
+                if file_name.endswith(".jpg"):
+                    stat = os.stat(os.path.join(root, file_name))
+                    objects.append((stat.st_mtime_ns, stat.st_size, os.path.join(root, file_name)))
+        return objects
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = sum(size for _, size, _ in self._objects())
+            return self._bytes
+
+    def _add_bytes(self, n: int):
+        self.size_bytes()
+        with self._lock:
+            self._bytes += n
+
+    def evict(self) -> int:
+        """Remove the least recently used previews until the cache fits in `max_bytes`. Returns the number removed."""
+        if self.size_bytes() <= self.max_bytes:
+            return 0
+
+        objects = sorted(self._objects())
+        total = sum(size for _, size, _ in objects)
+        removed = 0
+
+        for _, size, path in objects:
+            if total <= self.max_bytes:
+                break
+
+            os.remove(path)
+            total -= size
+            removed += 1
+
+        with self._lock:
+            self._bytes = total
+
+        return removed
+
+    def __len__(self):
+        return len(self._objects())
+
+    def __str__(self):
+        return f"PreviewCache({self.path})"
+
+    def __repr__(self):
+        return f"PreviewCache({self.path})"
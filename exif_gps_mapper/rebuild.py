@@ -0,0 +1,145 @@
+import argparse
+import os
+import shutil
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from exif_gps_mapper.accesslink.raw_cache import RawCache
+from exif_gps_mapper.helpers import config
+from exif_gps_mapper.helpers.route_index import RouteIndex
+from exif_gps_mapper.materialisers.exercise_materializer import ExerciseMaterializer
+from exif_gps_mapper.materialisers.gpx_materializer import GpxMaterializer
+from exif_gps_mapper.materialisers.gpx_parser import try_parse_gpx
+
+
+def _load_chunk(cache_path: str, entries: list, parser: str) -> list:
+    # Runs in a worker process: decompress and parse with the GpxMaterializer's parser. Files that cannot be parsed
+    # are returned as text, so that the materializer raises the error in the main process.
+    cache = RawCache(cache_path)
+    loaded = []
+
+    for entry in entries:
+        exercise, gpx = cache.get(entry)
+        arrays = None
+
+        if gpx:
+            arrays = try_parse_gpx(gpx, parser)
+            if arrays is not None:
+                gpx = None
+
+        loaded.append((exercise, arrays, gpx))
+
+    return loaded
+
+
+def _stage(loaded: list, exercise_materializer: ExerciseMaterializer, gpx_materializer: GpxMaterializer):
+    for exercise, arrays, gpx in loaded:
+        exercise_materializer.add(exercise)
+
+        if arrays is not None:
+            gpx_materializer.add_arrays(arrays, exercise["id"])
+        elif gpx:
+            gpx_materializer.add(gpx, exercise["id"])
+
+
+def _remove(path: str):
+    # A parquet file or a dataset directory, and its route index sidecar
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+    sidecar = RouteIndex(path).sidecar_path
+    if os.path.exists(sidecar):
+        os.remove(sidecar)
+
+
+def _swap(new_path: str, path: str):
+    # Works for both a parquet file and a dataset directory
+    old_path = f"{path}.old"
+
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(new_path, path)
+
+    if os.path.isdir(old_path):
+        shutil.rmtree(old_path)
+    elif os.path.exists(old_path):
+        os.remove(old_path)
+
+    # The route index sidecar of a parquet file moves with it. A sidecar of the old file would describe stale data.
+    new_sidecar, sidecar = RouteIndex(new_path).sidecar_path, RouteIndex(path).sidecar_path
+    if os.path.exists(new_sidecar):
+        os.replace(new_sidecar, sidecar)
+    elif os.path.exists(sidecar):
+        os.remove(sidecar)
+
+
+def rebuild(c: dict, workers: int | None = None, chunk_size: int = 64) -> dict:
+    """Materialize the exercise and route tables again from the RawCache, without network calls.
+
+    The tables are written next to the current ones and swapped in when complete, so an interrupted rebuild leaves
+    the current tables untouched. `c` is a config that has been passed through `helpers.config.add_config_filenames`.
+    """
+    started = time.perf_counter()
+
+    cache = RawCache(c["db"]["raw"])
+    entries = cache.entries()
+
+    # Fresh tables, written next to the current ones. route_simplified only exists with db.route_simplify.
+    tables = ["exercise", "route"] + (["route_simplified"] if c["db"].get("route_simplify") else [])
+    paths = {table: c["db"][table] for table in tables if table in c["db"]}
+    c = dict(c, db=dict(c["db"]))
+
+    for table, path in paths.items():
+        c["db"][table] = f"{path}.rebuild"
+        _remove(c["db"][table])
+
+    exercise_materializer = ExerciseMaterializer.from_config(c)
+    gpx_materializer = GpxMaterializer.from_config(c)
+
+    workers = workers or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = (entries[i:i + chunk_size] for i in range(0, len(entries), chunk_size))
+        max_pending = 2 * workers
+        pending = deque()
+
+        for chunk in chunks:
+            pending.append(executor.submit(_load_chunk, cache.path, chunk, gpx_materializer.parser))
+
+            # Chunks are staged in order, so the tables come out sorted by exercise id
+            while len(pending) > max_pending:
+                _stage(pending.popleft().result(), exercise_materializer, gpx_materializer)
+
+        while pending:
+            _stage(pending.popleft().result(), exercise_materializer, gpx_materializer)
+
+    exercise_materializer.close()
+    gpx_materializer.close()
+
+    for table, path in paths.items():
+        if os.path.exists(c["db"][table]):
+            _swap(c["db"][table], path)
+
+    # A simplified table of an earlier setting would no longer match the route table
+    if "route_simplified" not in paths and c["db"].get("route_simplified"):
+        _remove(c["db"]["route_simplified"])
+
+    stats = {"exercises": len(entries), "seconds": time.perf_counter() - started}
+    print(f"[INFO] Rebuilt {stats['exercises']} exercises from {cache} in {stats['seconds']:.1f} s")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the exercise and route tables from the raw cache.")
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--workers", type=int, default=None, help="Parse processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    rebuild(config.add_config_filenames(config.read(args.config)), workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
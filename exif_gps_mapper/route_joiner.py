@@ -0,0 +1,258 @@
+import numpy as np
+import pandas as pd
+
+from exif_gps_mapper.helpers.exif_time import parse_exif_datetime
+from exif_gps_mapper.helpers.geo import haversine
+
+
+class RouteJoiner:
+    """Join photos to route points using sorted, vectorized nearest-in-time lookups.
+
+    The EXIF `created` time is camera local time, whereas route points are stored in UTC. Each exercise knows its own
+    `start-time-utc-offset`, so a photo is first assigned to the exercise whose local time window contains it, and
+    then moved to UTC using that exercise's offset before it is matched to the track points.
+
+    Matchers:
+        * "nearest": the closest track point within the tolerance.
+        * "interpolate": linear interpolation between the track points before and after the photo.
+        * "bracket": interpolation between the bracketing track points, unless they are more than `max_gap` apart
+          or imply a speed above `max_speed` (m/s, a GPS jump). Those photos fall back to the nearest point within
+          the tolerance. Adds the `time_gap` (s) and `distance` (m) to the nearest recorded point used, and a
+          `confidence` that falls linearly from 1 to 0 as `time_gap` grows to `max_gap`.
+    """
+
+    MATCHERS = ("nearest", "interpolate", "bracket")
+
+    def __init__(self, tolerance: str = "60s", interpolate: bool = False, matcher: str | None = None,
+                 max_gap: str = "300s", max_speed: float | None = 85.0):
+        # Settings. `interpolate` is the older spelling of matcher="interpolate".
+        matcher = matcher if matcher is not None else ("interpolate" if interpolate else "nearest")
+        assert matcher in self.MATCHERS, f"Unknown matcher ({matcher})."
+
+        self.tolerance = pd.Timedelta(tolerance)
+        self.matcher = matcher
+        self.interpolate = matcher == "interpolate"
+        self.max_gap = pd.Timedelta(max_gap)
+        self.max_speed = max_speed
+
+    @staticmethod
+    def _as_columns(df: pd.DataFrame, index_name: str) -> pd.DataFrame:
+        # Materializers store the key as the index. Accept both shapes.
+        if index_name in df.columns:
+            return df
+        return df.reset_index()
+
+    @staticmethod
+    def _to_local_time(created: pd.Series) -> pd.Series:
+        # ExifDatabase stores `created` as a timestamp. Strings come from tables written before that.
+        return parse_exif_datetime(created)
+
+    def exercise_windows(self, df_exercise: pd.DataFrame, df_route: pd.DataFrame) -> pd.DataFrame:
+        """Return one row per exercise with its route time window both in UTC and in local time."""
+        df_exercise = self._as_columns(df_exercise, "id")
+        df_route = self._as_columns(df_route, "point_time")
+
+        # First and last track point per exercise
+        windows = df_route.groupby("exercise_id")["point_time"].agg(utc_start="min", utc_end="max")
+
+        # Attach the UTC offset (minutes). Routes without an exercise summary cannot be localized.
+        offsets = df_exercise.set_index("id")["start-time-utc-offset"].rename("offset")
+        windows = windows.join(offsets, how="inner")
+
+        offset = pd.to_timedelta(windows["offset"].astype("int64"), unit="m")
+        windows["local_start"] = windows["utc_start"] + offset
+        windows["local_end"] = windows["utc_end"] + offset
+
+        windows.index.name = "exercise_id"
+        return windows.reset_index().sort_values("local_start", ignore_index=True)
+
+    def _assign_exercises(self, photos: pd.DataFrame, windows: pd.DataFrame) -> pd.DataFrame:
+        # The window is widened by the tolerance so that photos taken just before/after recording still match
+        windows = windows.assign(search_start=windows["local_start"] - self.tolerance)
+        windows = windows.sort_values("search_start", ignore_index=True)
+
+        start = windows["search_start"].to_numpy("datetime64[ns]")
+        end = (windows["local_end"] + self.tolerance).to_numpy("datetime64[ns]")
+        t = photos["local_time"].to_numpy("datetime64[ns]")
+
+        # Latest window that starts before each photo
+        candidate = np.searchsorted(start, t, side="right") - 1
+
+        # With overlapping exercises, that window may have ended already while an earlier one is still open. Step
+        # back while some earlier window ends after the photo (the running maximum of the ends).
+        latest_end = np.maximum.accumulate(end) if len(end) else end
+        while True:
+            valid = candidate >= 0
+            step = np.zeros(len(t), dtype=bool)
+            step[valid] = (end[candidate[valid]] < t[valid]) & (latest_end[candidate[valid]] >= t[valid])
+            if not step.any():
+                break
+            candidate[step] -= 1
+
+        inside = candidate >= 0
+        inside[inside] = end[candidate[inside]] >= t[inside]
+
+        assigned = photos[inside].reset_index(drop=True)
+        matched_windows = windows.iloc[candidate[inside]].reset_index(drop=True)
+
+        assigned["exercise_id"] = matched_windows["exercise_id"].astype("int64")
+        assigned["utc_time"] = assigned["local_time"] - pd.to_timedelta(
+            matched_windows["offset"].astype("int64"), unit="m"
+        )
+        return assigned
+
+    def _match_nearest(self, photos: pd.DataFrame, route: pd.DataFrame) -> pd.DataFrame:
+        matched = pd.merge_asof(
+            photos.sort_values("utc_time"),
+            route,
+            left_on="utc_time",
+            right_on="point_time",
+            by="exercise_id",
+            direction="nearest",
+            tolerance=self.tolerance
+        )
+        return matched.drop(columns="point_time")
+
+    def _match_interpolated(self, photos: pd.DataFrame, route: pd.DataFrame) -> pd.DataFrame:
+        photos = photos.sort_values("utc_time")
+
+        # Bracketing track points on both sides of the photo
+        sides = {}
+        for direction in ("backward", "forward"):
+            sides[direction] = pd.merge_asof(
+                photos[["utc_time", "exercise_id"]],
+                route,
+                left_on="utc_time",
+                right_on="point_time",
+                by="exercise_id",
+                direction=direction,
+                tolerance=self.tolerance
+            )
+
+        prev, nxt = sides["backward"], sides["forward"]
+
+        # Linear weight between the two points. Exact hits and one-sided matches fall back to the available point.
+        span = (nxt["point_time"] - prev["point_time"]).dt.total_seconds()
+        weight = ((prev["utc_time"] - prev["point_time"]).dt.total_seconds() / span).where(span > 0, 0.0)
+
+        matched = photos.reset_index(drop=True)
+        for col in ("latitude", "longitude"):
+            interpolated = prev[col] + weight * (nxt[col] - prev[col])
+            matched[col] = interpolated.fillna(prev[col]).fillna(nxt[col]).to_numpy()
+
+        return matched
+
+    def _match_bracketing(self, photos: pd.DataFrame, route: pd.DataFrame) -> pd.DataFrame:
+        matched = photos.reset_index(drop=True)
+        route = route.sort_values(["exercise_id", "point_time"], ignore_index=True)
+
+        # Milliseconds keep sub-second photo times and leave room for the offset keys in int64
+        r_ex = route["exercise_id"].to_numpy("int64")
+        r_t = route["point_time"].to_numpy("datetime64[ms]").astype("int64")
+        p_ex = matched["exercise_id"].to_numpy("int64")
+        p_t = matched["utc_time"].to_numpy("datetime64[ms]").astype("int64")
+
+        if not len(r_t) or not len(p_t):
+            for col in ("latitude", "longitude", "time_gap", "distance", "confidence"):
+                matched[col] = np.nan
+            return matched
+
+        # Per-exercise offset keys: exercise rank * span + time is one sorted array over all tracks
+        exercise_ids = np.unique(r_ex)
+        t0 = min(r_t.min(), p_t.min())
+        span = max(r_t.max(), p_t.max()) - t0 + 1
+        r_key = np.searchsorted(exercise_ids, r_ex) * span + (r_t - t0)
+        p_key = np.searchsorted(exercise_ids, p_ex) * span + (p_t - t0)
+
+        # Bracketing points, which must belong to the photo's own exercise
+        lo = np.searchsorted(r_ex, p_ex, side="left")
+        hi = np.searchsorted(r_ex, p_ex, side="right")
+        prev = np.searchsorted(r_key, p_key, side="right") - 1
+        nxt = np.searchsorted(r_key, p_key, side="left")
+        has_prev = (prev >= lo) & (prev < hi)
+        has_next = (nxt >= lo) & (nxt < hi)
+        prev = np.clip(prev, 0, len(r_t) - 1)
+        nxt = np.clip(nxt, 0, len(r_t) - 1)
+
+        lat = route["latitude"].to_numpy("float64")
+        lon = route["longitude"].to_numpy("float64")
+
+        gap_prev = (p_t - r_t[prev]) / 1000
+        gap_next = (r_t[nxt] - p_t) / 1000
+        gap = gap_prev + gap_next
+        moved = haversine(lat[prev], lon[prev], lat[nxt], lon[nxt])
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            speed = np.where(gap > 0, moved / gap, 0.0)
+            weight = np.where(gap > 0, gap_prev / gap, 0.0)
+
+        bracket = has_prev & has_next & (gap <= self.max_gap.total_seconds())
+        if self.max_speed is not None:
+            bracket &= speed <= self.max_speed
+
+        # Otherwise the nearest point within the tolerance
+        use_prev = has_prev & (~has_next | (gap_prev <= gap_next))
+        nearest = np.where(use_prev, prev, nxt)
+        nearest_gap = np.where(use_prev, gap_prev, gap_next)
+        single = ~bracket & (has_prev | has_next) & (nearest_gap <= self.tolerance.total_seconds())
+
+        matched["latitude"] = np.where(
+            bracket, lat[prev] + weight * (lat[nxt] - lat[prev]), np.where(single, lat[nearest], np.nan)
+        )
+        matched["longitude"] = np.where(
+            bracket, lon[prev] + weight * (lon[nxt] - lon[prev]), np.where(single, lon[nearest], np.nan)
+        )
+
+        # Distance and time to the closest recorded point of the position
+        time_gap = np.where(bracket, np.minimum(gap_prev, gap_next), nearest_gap)
+        matched["time_gap"] = np.where(bracket | single, time_gap, np.nan)
+        matched["distance"] = np.where(bracket, np.minimum(weight, 1 - weight) * moved, np.where(single, 0.0, np.nan))
+        matched["confidence"] = np.where(
+            bracket | single, np.clip(1 - time_gap / self.max_gap.total_seconds(), 0.0, 1.0), np.nan
+        )
+
+        return matched
+
+    def join(self, df_exif: pd.DataFrame, df_exercise: pd.DataFrame, df_route: pd.DataFrame,
+             windows: pd.DataFrame | None = None) -> pd.DataFrame:
+        """Return every photo with `local_time`, `utc_time`, `exercise_id`, `latitude` and `longitude` columns.
+
+        Photos that do not fall inside any exercise, or that have no track point within the tolerance, keep null
+        coordinates. The row order and index of `df_exif` are preserved. The "bracket" matcher adds its quality
+        columns. `windows` from `exercise_windows` can be
+        passed in when they are already known.
+        """
+        df_route = self._as_columns(df_route, "point_time")
+
+        # Photos with a parseable timestamp, sorted for merge_asof
+        photos = df_exif.assign(local_time=self._to_local_time(df_exif["created"]))
+        photos = photos.rename_axis("_row").reset_index()
+        photos = photos[photos["local_time"].notna()].sort_values("local_time", ignore_index=True)
+
+        if windows is None:
+            windows = self.exercise_windows(df_exercise, df_route)
+        assigned = self._assign_exercises(photos[["_row", "local_time"]], windows)
+
+        route = df_route[["point_time", "exercise_id", "latitude", "longitude"]].sort_values("point_time")
+
+        if self.matcher == "bracket":
+            matched = self._match_bracketing(assigned, route)
+        elif self.matcher == "interpolate":
+            matched = self._match_interpolated(assigned, route)
+        else:
+            matched = self._match_nearest(assigned, route)
+
+        # Back to the original shape of df_exif
+        matched = matched.set_index("_row")
+        df = df_exif.copy()
+        df["local_time"] = photos.set_index("_row")["local_time"]
+        df["utc_time"] = matched["utc_time"]
+        df["exercise_id"] = matched["exercise_id"].astype("Int64")
+        df["latitude"] = matched["latitude"]
+        df["longitude"] = matched["longitude"]
+
+        if self.matcher == "bracket":
+            for col in ("time_gap", "distance", "confidence"):
+                df[col] = matched[col]
+
+        return df
@@ -0,0 +1,76 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubAccesslink:
+    """A local Accesslink stand-in that answers exercise and GPX requests after a fixed delay.
+
+    `responses` can queue (status, headers) overrides that are served before the normal responses, e.g. to test
+    retries.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.responses = []
+        self.requests = []
+        self._lock = threading.Lock()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status: int, body: bytes = b"", content_type: str = "application/json",
+                       headers: dict | None = None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _handle(self):
+                with stub._lock:
+                    stub.requests.append((self.command, self.path))
+                    override = stub.responses.pop(0) if stub.responses else None
+
+                time.sleep(stub.delay)
+
+                if override is not None:
+                    status, headers = override
+                    return self._reply(status, headers=headers)
+
+                parts = self.path.strip("/").split("/")
+
+                if parts[-1] == "gpx":
+                    body = f'<gpx><trk><trkseg><trkpt lat="64.0" lon="27.{parts[-2]}"/></trkseg></trk></gpx>'
+                    return self._reply(200, body.encode(), "application/gpx+xml")
+
+                if parts[0] == "exercises":
+                    return self._reply(200, json.dumps({"id": int(parts[-1])}).encode())
+
+                self._reply(204)
+
+            do_GET = _handle
+            do_POST = _handle
+            do_PUT = _handle
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def exercise_urls(self, n: int) -> list:
+        return [f"{self.url}/exercises/{i}" for i in range(n)]
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+
+from unittest import mock, TestCase
+from exif_gps_mapper.accesslink.async_client import AsyncAccesslinkClient
+from exif_gps_mapper.accesslink.transaction import Transaction
+
+
+class ApiState:
+    """Fake Accesslink: every user has two transactions of three exercises."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.populated = {}
+        self.commits = []
+
+    def populate(self, transaction: Transaction) -> bool:
+        with self.lock:
+            n = self.populated.get(transaction._user_id, 0)
+            self.populated[transaction._user_id] = n + 1
+
+        if n >= 2:
+            return False
+
+        transaction.transaction_id = n
+        transaction._exercise_urls = [f"{transaction._user_id}/{n}/{i}" for i in range(3)]
+        return True
+
+    def fetch(self, transaction: Transaction, url: str) -> tuple:
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        time.sleep(0.01)
+
+        with self.lock:
+            self.in_flight -= 1
+        return {"url": url}, None
+
+    def commit(self, transaction: Transaction):
+        assert transaction.completed
+        self.commits.append((transaction._user_id, transaction.transaction_id))
+
+
+class TestAsyncTransactionPool(TestCase):
+
+    def setUp(self):
+        self.api = ApiState()
+
+        for name, func in (("populate", self.api.populate), ("_fetch", self.api.fetch), ("commit", self.api.commit)):
+            patcher = mock.patch.object(Transaction, name, autospec=True, side_effect=func)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def sync_user(self, pool) -> list:
+        fetched = []
+        async for transaction in pool:
+            async for exercise, gpx in transaction:
+                fetched.append(exercise["url"])
+        return fetched
+
+    def test_many_users_in_one_loop(self):
+        client = AsyncAccesslinkClient(max_concurrency=4)
+        users = ["user_a", "user_b", "user_c"]
+
+        async def main():
+            return await asyncio.gather(*(self.sync_user(client.pool("token", user)) for user in users))
+
+        returned = asyncio.run(main())
+
+        for user, fetched in zip(users, returned):
+            self.assertEqual(fetched, [f"{user}/{n}/{i}" for n in range(2) for i in range(3)])
+
+        # Both transactions of every user were committed, after being fully fetched
+        self.assertCountEqual(self.api.commits, [(user, n) for user in users for n in range(2)])
+
+        # Global limit over all pools
+        self.assertLessEqual(self.api.max_in_flight, 4)
+        self.assertGreater(self.api.max_in_flight, 1)
+
+    def test_runs_on_own_threads_in_many_loops(self):
+        # More than the default executor's 32 threads at most
+        client = AsyncAccesslinkClient(max_concurrency=48)
+        self.addCleanup(client.close)
+
+        def call():
+            self.api.fetch(None, "url")
+            return threading.current_thread().name
+
+        async def main():
+            return await asyncio.gather(*(client.call(call) for _ in range(96)))
+
+        # A second event loop with the same client
+        for _ in range(2):
+            names = asyncio.run(main())
+
+        self.assertEqual(self.api.max_in_flight, 48)
+        self.assertTrue(all(name.startswith("accesslink") for name in names))
+
+    def test_failed_fetch_is_not_committed(self):
+        client = AsyncAccesslinkClient(max_concurrency=4)
+
+        def failing_fetch(transaction, url):
+            raise ConnectionError("502")
+
+        Transaction._fetch.side_effect = failing_fetch
+
+        with self.assertRaises(ConnectionError):
+            asyncio.run(self.sync_user(client.pool("token", "user_a")))
+
+        self.assertEqual(self.api.commits, [])
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from unittest import TestCase
+from exif_gps_mapper.materialisers.column_buffer import ColumnBuffer
+
+SCHEMA = {
+    'id': 'int64',
+    'start-time': 'datetime64[ns]',
+    'has-route': 'bool',
+    'detailed-sport-info': 'string'
+}
+
+
+class TestColumnBuffer(TestCase):
+
+    def test_grows_geometrically(self):
+        buffer = ColumnBuffer(SCHEMA, capacity=2)
+
+        for i in range(5):
+            buffer.append((i, "2023-01-22T12:00:00", True, "WALKING"))
+
+        self.assertEqual(len(buffer), 5)
+        self.assertEqual(buffer.capacity, 8)
+
+    def test_to_dataframe_applies_schema(self):
+        buffer = ColumnBuffer(SCHEMA)
+        buffer.append((1, "2023-01-22T12:00:00", True, "WALKING"))
+        buffer.extend({
+            "id": np.array([2, 3]),
+            "start-time": pd.to_datetime(["2023-01-23", "2023-01-24"]),
+            "has-route": [False, True],
+            "detailed-sport-info": ["RUNNING", None]
+        })
+
+        df = buffer.to_dataframe()
+
+        self.assertEqual(dict(df.dtypes.astype(str)), SCHEMA)
+        self.assertEqual(list(df["id"]), [1, 2, 3])
+        self.assertEqual(df["start-time"].iloc[0], pd.Timestamp("2023-01-22 12:00:00"))
+        self.assertTrue(pd.isna(df["detailed-sport-info"].iloc[2]))
+
+    def test_nbytes_counts_staged_rows(self):
+        buffer = ColumnBuffer(SCHEMA, capacity=1024)
+        buffer.append((1, "2023-01-22T12:00:00", True, "WALKING"))
+
+        # int64 + datetime64 + bool + one object pointer, for one row
+        self.assertEqual(buffer.nbytes, 8 + 8 + 1 + 8)
+
+    def test_clear_releases_memory(self):
+        buffer = ColumnBuffer(SCHEMA, capacity=4)
+        buffer.extend({name: [None] * 100 if dtype == "string" else np.zeros(100, dtype=dtype)
+                       for name, dtype in SCHEMA.items()})
+
+        buffer.clear()
+
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(buffer.capacity, 4)
@@ -0,0 +1,112 @@
+import os
+import shutil
+
+import pandas as pd
+import pyarrow.dataset as ds
+
+from unittest import mock, TestCase
+from exif_gps_mapper.helpers import fsync
+from exif_gps_mapper.helpers.dataset_store import MONTH_PARTITION_SCHEMA, PartitionedStore, month_partitions
+
+DF_ROUTE = pd.DataFrame({
+    "point_time": pd.to_datetime(["2023-01-22 10:00:00", "2023-02-22 10:00:00", "2023-02-23 10:00:00"]),
+    "exercise_id": [1, 2, 2],
+    "latitude": [64.0, 65.0, 66.0]
+})
+
+
+class TestPartitionedStore(TestCase):
+
+    def setUp(self):
+        self.test_dir = os.path.join("tests", "test_data", "TestPartitionedStore")
+
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+        self.store = PartitionedStore(
+            os.path.join(self.test_dir, "route"),
+            "point_time",
+            MONTH_PARTITION_SCHEMA,
+            partitioner=lambda df: month_partitions(df["point_time"])
+        )
+
+    def count_data_files(self) -> int:
+        return sum(len([f for f in files if f.endswith(".parquet")])
+                   for root, _, files in os.walk(self.store.path) if "_tombstones" not in root)
+
+    def test_empty_store(self):
+        self.assertIsNone(self.store.read())
+        self.assertEqual(len(self.store.keys()), 0)
+
+    def test_append_writes_new_files_per_partition(self):
+        self.store.append(DF_ROUTE)
+        self.store.append(DF_ROUTE.iloc[:1])
+
+        # Two months in the first append, one in the second. Nothing is rewritten.
+        self.assertEqual(self.count_data_files(), 3)
+        self.assertTrue(os.path.isdir(os.path.join(self.store.path, "year=2023", "month=2")))
+
+        df = self.store.read()
+        self.assertEqual(list(df.columns), list(DF_ROUTE.columns))
+        self.assertEqual(len(df), 4)
+
+    def test_append_with_fsync(self):
+        with mock.patch.object(fsync, "fsync_file", wraps=fsync.fsync_file) as fsync_file, \
+                mock.patch.object(fsync, "fsync_dir", wraps=fsync.fsync_dir) as fsync_dir:
+            self.store.append(DF_ROUTE, fsync=True)
+
+        # Every data file and the sequence file, then the new partition directories up to the parent of the store
+        data_files = {os.path.join(root, f) for root, _, files in os.walk(self.store.path) for f in files}
+        self.assertEqual({os.path.abspath(c.args[0]) for c in fsync_file.call_args_list},
+                         {os.path.abspath(x) for x in data_files})
+
+        synced_dirs = [c.args[0] for c in fsync_dir.call_args_list]
+        self.assertIn(os.path.abspath(os.path.join(self.store.path, "year=2023", "month=2")), synced_dirs)
+        self.assertEqual(synced_dirs[-2:], [os.path.abspath(self.store.path), os.path.abspath(self.test_dir)])
+
+    def test_partition_pruning(self):
+        self.store.append(DF_ROUTE)
+
+        df = self.store.read(filter=ds.field("month") == 2)
+        self.assertEqual(sorted(df["exercise_id"]), [2, 2])
+
+    def test_tombstones_hide_older_rows_only(self):
+        self.store.append(DF_ROUTE)
+        self.store.delete({pd.Timestamp("2023-02-22 10:00:00")})
+
+        self.assertEqual(len(self.store.read()), 2)
+
+        # Appended after the tombstone
+        self.store.append(DF_ROUTE.iloc[1:2])
+        self.assertEqual(len(self.store.read()), 3)
+
+    def test_deduplicate_reads_latest_version(self):
+        self.store.deduplicate = True
+        self.store.append(DF_ROUTE)
+        self.store.append(DF_ROUTE.iloc[:1].assign(latitude=70.0))
+
+        df = self.store.read().set_index("point_time")
+        self.assertEqual(len(df), 3)
+        self.assertEqual(df.loc[pd.Timestamp("2023-01-22 10:00:00"), "latitude"], 70.0)
+
+    def test_compact(self):
+        self.store.deduplicate = True
+        self.store.append(DF_ROUTE)
+        self.store.append(DF_ROUTE.iloc[:1].assign(latitude=70.0))
+        self.store.delete({pd.Timestamp("2023-02-23 10:00:00")})
+        before = self.store.read().sort_values("point_time", ignore_index=True)
+
+        self.store.compact()
+
+        # One file per partition, no tombstones, same content
+        self.assertEqual(self.count_data_files(), 2)
+        self.assertFalse(os.path.exists(os.path.join(self.store.path, "_tombstones")))
+        pd.testing.assert_frame_equal(self.store.read().sort_values("point_time", ignore_index=True), before)
+
+        # The sequence continues after compaction
+        self.store.append(DF_ROUTE.iloc[2:])
+        self.assertEqual(len(self.store.read()), 3)
+
+    def tearDown(self) -> None:
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
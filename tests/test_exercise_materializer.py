@@ -1,4 +1,5 @@
 import os
+import shutil
 import pandas as pd
 
 from unittest import TestCase
@@ -81,3 +82,20 @@ class TestExerciseMaterializer(TestCase):
             exercise_materializer.close()
 
         self.assertEqual(len(pd.read_parquet(self.test_file_path)), 2)
+
+    def test_partitioned_layout_appends_and_does_not_add_duplicates(self):
+        dataset_path = os.path.join(self.test_dir, "exercise")
+
+        # Try to add same rows twice
+        for i in range(2):
+            exercise_materializer = ExerciseMaterializer(dataset_path, layout="partitioned")
+            exercise_materializer.add(EXERCISE_DICT_A)
+            exercise_materializer.add(EXERCISE_DICT_B)
+            exercise_materializer.close()
+
+        df = ExerciseMaterializer(dataset_path, layout="partitioned").read()
+        self.assertEqual(len(df), 2)
+        self.assertEqual(df.loc[1, "transaction-id"], 123)
+        self.assertTrue(os.path.isdir(os.path.join(dataset_path, "transaction-id=123")))
+
+        shutil.rmtree(dataset_path)
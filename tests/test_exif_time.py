@@ -0,0 +1,34 @@
+from unittest import TestCase
+
+import pandas as pd
+
+from exif_gps_mapper.helpers.exif_time import parse_exif_datetime, parse_exif_offset
+
+
+class TestExifTime(TestCase):
+
+    def test_parse_exif_datetime(self):
+        created = pd.Series(["2023:01:22 12:00:00", "0000:00:00 00:00:00", None, "2023:01:22 12:00:01+02:00"])
+        parsed = parse_exif_datetime(created)
+
+        self.assertEqual(parsed.iloc[0], pd.Timestamp("2023-01-22 12:00:00"))
+        self.assertTrue(parsed.iloc[1:3].isna().all())
+        self.assertEqual(parsed.iloc[3], pd.Timestamp("2023-01-22 12:00:01"))
+
+    def test_parse_exif_datetime_subsec(self):
+        created = pd.Series(["2023:01:22 12:00:00"] * 4)
+        subsec = pd.Series(["5", "05", "1234", None])
+
+        parsed = parse_exif_datetime(created, subsec) - pd.Timestamp("2023-01-22 12:00:00")
+        self.assertEqual(parsed.dt.total_seconds().tolist(), [0.5, 0.05, 0.123, 0.0])
+
+    def test_parse_exif_datetime_passes_timestamps(self):
+        created = pd.Series(pd.to_datetime(["2023-01-22 12:00:00"]))
+        self.assertIs(parse_exif_datetime(created), created)
+
+    def test_parse_exif_offset(self):
+        offset = parse_exif_offset(pd.Series(["+02:00", "-0530", None, "garbage"]))
+
+        self.assertEqual(offset.dtype, "Int16")
+        self.assertEqual(offset.iloc[:2].tolist(), [120, -330])
+        self.assertTrue(offset.iloc[2:].isna().all())
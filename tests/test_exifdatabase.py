@@ -1,6 +1,8 @@
+import base64
 import os
 import unittest
 import pandas as pd
+import pyarrow.parquet as pq
 import shutil
 
 from unittest import mock, TestCase
@@ -8,47 +10,53 @@ from exif_gps_mapper import ExifDatabase
 
 base_dir_files = [
     (r"BaseDir", ["FolderA", "FolderB", "FolderC"], []),
-    (r"BaseDir\FolderA", [], ["FileA1.TXT", "filea2.txt"]),
-    (r"BaseDir\FolderB", [], ["FileB1.TXT", "fileb2.txt"]),
-    (r"BaseDir\FolderC", ["FolderCInner"], []),
-    (r"BaseDir\FolderC\FolderCInner", [], ["FileC1.TXT", "filec2.txt"])
+    (r"BaseDir/FolderA", [], ["FileA1.TXT", "filea2.txt"]),
+    (r"BaseDir/FolderB", [], ["FileB1.TXT", "fileb2.txt"]),
+    (r"BaseDir/FolderC", ["FolderCInner"], []),
+    (r"BaseDir/FolderC/FolderCInner", [], ["FileC1.TXT", "filec2.txt"])
 ]
 
 
+def create_tree(test_dir: str, tree: list):
+    # Build the (root, dirs, files) listing on disk
+    for root, dirs, file_names in tree:
+        root = os.path.join(test_dir, *root.split("/"))
+        os.makedirs(root, exist_ok=True)
+
+        for file_name in file_names:
+            open(os.path.join(root, file_name), "w").close()
+
+
 class TestExifDatabaseScanFolder(TestCase):
 
     def setUp(self):
+        self.test_dir = os.path.join("tests", "test_data", "TestExifDatabaseScanFolder")
+
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        create_tree(self.test_dir, base_dir_files)
+
         self.exif_db = ExifDatabase(
             db_path="not_exists.parquet",  # Does not need to exist
-            lookup_path="fake_dir",  # Does not need to exist
+            lookup_path=os.path.join(self.test_dir, "BaseDir"),
             ignore_dirs=[],
             file_extensions=[".txt"],
             case_sensitive_extensions=False
         )
 
-    @mock.patch("exif_gps_mapper.exifdatabase.os.path.exists")
-    @mock.patch("exif_gps_mapper.exifdatabase.os.walk")
-    def test_scan_folder(self, mock_os_walk, mock_os_exists):
+    def test_scan_folder(self):
         self.exif_db.case_sensitive_extensions = False
 
-        mock_os_exists.return_value = True
-        mock_os_walk.return_value = base_dir_files
-
         # Perform scan and convert full path to set of filenames (e.g. {"FileA1.TXT", "filea2.txt"}
         returned = self.exif_db.scan_images()
         returned_filenames = {os.path.split(x)[-1] for x in returned}
 
         self.assertEqual(len(returned_filenames), 6)
 
-    @mock.patch("exif_gps_mapper.exifdatabase.os.path.exists")
-    @mock.patch("exif_gps_mapper.exifdatabase.os.walk")
-    def test_scan_folder_case_sensitive(self, mock_os_walk, mock_os_exists):
+    def test_scan_folder_case_sensitive(self):
         # Set on
         self.exif_db.case_sensitive_extensions = True
 
-        mock_os_exists.return_value = True
-        mock_os_walk.return_value = base_dir_files
-
         # Perform scan and convert full path to set of filenames (e.g. {"FileA1.TXT", "filea2.txt"}
         returned = self.exif_db.scan_images()
         returned_filenames = {os.path.split(x)[-1] for x in returned}
@@ -56,6 +64,40 @@ class TestExifDatabaseScanFolder(TestCase):
         # With case-sensitive, we should only get those files that end .txt and not .TXT
         self.assertEqual(len(returned_filenames), 3)
 
+    def test_scan_folder_ignore_dirs(self):
+        self.exif_db.ignore_dirs = ["FolderC"]
+
+        returned = self.exif_db.scan_images()
+
+        # The inner folder is skipped together with its parent
+        self.assertEqual(len(returned), 4)
+
+    def test_parallel_scanner_matches_sequential(self):
+        self.exif_db.ignore_dirs = ["FolderB"]
+
+        for case_sensitive in (False, True):
+            self.exif_db.case_sensitive_extensions = case_sensitive
+
+            self.exif_db.scanner = "sequential"
+            expected = self.exif_db.scan_images()
+
+            self.exif_db.scanner = "parallel"
+            self.exif_db.scan_workers = 2
+            returned = self.exif_db.scan_images()
+
+            self.assertEqual(returned, expected)
+
+    def test_scan_folder_returns_stats(self):
+        returned = self.exif_db.scan_images()
+
+        for path, stat in returned.items():
+            self.assertTrue(os.path.isabs(path))
+            self.assertEqual(stat.st_size, 0)
+            self.assertEqual(stat.st_mtime_ns, os.stat(path).st_mtime_ns)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir)
+
 
 class TestExifDatabase(unittest.TestCase):
 
@@ -177,3 +219,247 @@ class TestExifDatabase(unittest.TestCase):
 
         if os.path.exists(test_dir):
             shutil.rmtree(test_dir)
+
+
+def fake_get_tags(paths, tags):
+    return [{"SourceFile": p, "EXIF:CreateDate": "2023:01:22 12:00:00", "EXIF:LensModel": 50} for p in paths]
+
+
+class TestExifDatabaseMockedExifTool(TestCase):
+
+    def setUp(self):
+        self.test_dir = os.path.join("tests", "test_data", "TestExifDatabaseMockedExifTool")
+        self.lookup_path = os.path.join(self.test_dir, "images")
+        self.db_path = os.path.join(self.test_dir, "exif.parquet")
+
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        os.makedirs(self.lookup_path)
+
+        # Empty files are enough, exiftool is mocked
+        for i in range(25):
+            open(os.path.join(self.lookup_path, f"image_{i:02d}.NEF"), "w").close()
+
+        self.exif_database = ExifDatabase(
+            self.db_path, self.lookup_path, [], [".nef"], exiftool_chunk_size=5, batch_size=10
+        )
+
+    @mock.patch("exif_gps_mapper.exiftool_pool.exiftool.ExifToolHelper")
+    def test_full_load_writes_row_groups(self, mock_helper):
+        mock_helper.return_value.get_tags.side_effect = fake_get_tags
+
+        self.exif_database.full_load()
+
+        self.assertEqual(pq.ParquetFile(self.db_path).num_row_groups, 3)
+        self.assertEqual(len(self.exif_database.as_df), 25)
+        self.assertEqual(self.exif_database.as_df["lens"].iloc[0], "50")
+        self.assertTrue(self.exif_database.as_df["lat"].isna().all())
+        self.assertFalse(os.path.exists(self.exif_database.staging_dir))
+
+    @mock.patch("exif_gps_mapper.exiftool_pool.exiftool.ExifToolHelper")
+    def test_full_load_resumes_after_crash(self, mock_helper):
+        # Crash while reading the 4th chunk of 5 files. One batch of 10 rows has been committed by then.
+        calls = []
+
+        def crashing_get_tags(paths, tags):
+            calls.append(paths)
+            if len(calls) == 4:
+                raise OSError("exiftool died")
+            return fake_get_tags(paths, tags)
+
+        mock_helper.return_value.get_tags.side_effect = crashing_get_tags
+
+        with self.assertRaises(OSError):
+            self.exif_database.full_load()
+
+        self.assertFalse(os.path.exists(self.db_path))
+
+        # Resume reads only the files that were not committed
+        mock_helper.return_value.get_tags.side_effect = fake_get_tags
+        mock_helper.return_value.get_tags.reset_mock()
+        self.exif_database.full_load()
+
+        read_again = [p for c in mock_helper.return_value.get_tags.call_args_list for p in c.args[0]]
+        self.assertEqual(len(read_again), 15)
+        self.assertEqual(len(self.exif_database.as_df), 25)
+        self.assertEqual(self.exif_database.as_df["filepath"].nunique(), 25)
+
+    @mock.patch("exif_gps_mapper.exiftool_pool.exiftool.ExifToolHelper")
+    def test_incremental_load_refreshes_changed_images(self, mock_helper):
+        mock_helper.return_value.get_tags.side_effect = fake_get_tags
+        self.exif_database.full_load()
+
+        # Re-export one image and add a new one
+        with open(os.path.join(self.lookup_path, "image_03.NEF"), "w") as f:
+            f.write("edited")
+        open(os.path.join(self.lookup_path, "image_99.NEF"), "w").close()
+
+        mock_helper.return_value.get_tags.reset_mock()
+        self.exif_database.incremental_load()
+
+        read_again = {os.path.basename(p) for c in mock_helper.return_value.get_tags.call_args_list for p in c.args[0]}
+        self.assertEqual(read_again, {"image_03.NEF", "image_99.NEF"})
+
+        df = self.exif_database.as_df
+        self.assertEqual(len(df), 26)
+        self.assertEqual(df.loc[df["filepath"].str.endswith("image_03.NEF"), "st_size"].item(), 6)
+
+    @mock.patch("exif_gps_mapper.exiftool_pool.exiftool.ExifToolHelper")
+    def test_sync_applies_new_changed_and_deleted(self, mock_helper):
+        mock_helper.return_value.get_tags.side_effect = fake_get_tags
+        self.exif_database.full_load()
+
+        with open(os.path.join(self.lookup_path, "image_03.NEF"), "w") as f:
+            f.write("edited")
+        open(os.path.join(self.lookup_path, "image_99.NEF"), "w").close()
+        os.remove(os.path.join(self.lookup_path, "image_00.NEF"))
+
+        with mock.patch.object(ExifDatabase, "scan_images", wraps=self.exif_database.scan_images) as mock_scan:
+            returned = self.exif_database.sync()
+
+        # One walk for everything
+        self.assertEqual(mock_scan.call_count, 1)
+        self.assertEqual({k: {os.path.basename(p) for p in v} for k, v in returned.items()}, {
+            "new": {"image_99.NEF"}, "changed": {"image_03.NEF"}, "deleted": {"image_00.NEF"}
+        })
+        self.assertEqual(len(self.exif_database.as_df), 25)
+
+    @mock.patch("exif_gps_mapper.exiftool_pool.exiftool.ExifToolHelper")
+    def test_partitioned_layout_sync(self, mock_helper):
+        mock_helper.return_value.get_tags.side_effect = fake_get_tags
+        self.exif_database = ExifDatabase(
+            os.path.join(self.test_dir, "exif"), self.lookup_path, [], [".nef"], batch_size=10, layout="partitioned"
+        )
+
+        self.exif_database.sync()
+        self.assertTrue(os.path.isdir(os.path.join(self.test_dir, "exif", "year=2023", "month=1")))
+
+        with open(os.path.join(self.lookup_path, "image_03.NEF"), "w") as f:
+            f.write("edited")
+        os.remove(os.path.join(self.lookup_path, "image_00.NEF"))
+
+        self.exif_database.sync()
+        df = self.exif_database.as_df
+        self.assertEqual(len(df), 24)
+        self.assertEqual(df.loc[df["filepath"].str.endswith("image_03.NEF"), "st_size"].item(), 6)
+
+        self.exif_database.compact()
+        self.assertEqual(len(self.exif_database.as_df), 24)
+
+    @mock.patch("exif_gps_mapper.exiftool_pool.exiftool.ExifToolHelper")
+    def test_typed_columns(self, mock_helper):
+        def get_tags(paths, tags):
+            return [{"SourceFile": p, "EXIF:CreateDate": "2023:01:22 12:00:00", "EXIF:SubSecTimeDigitized": "05",
+                     "EXIF:OffsetTimeDigitized": "+02:00", "EXIF:LensModel": "XF23mmF1.4 R"} for p in paths]
+
+        mock_helper.return_value.get_tags.side_effect = get_tags
+        self.exif_database.full_load()
+
+        df = self.exif_database.as_df
+        self.assertTrue(pd.api.types.is_datetime64_any_dtype(df["created"]))
+        self.assertEqual(df["created"].iloc[0], pd.Timestamp("2023-01-22 12:00:00.050"))
+        self.assertEqual(df["created_offset"].iloc[0], 120)
+        self.assertEqual(df["lens"].dtype, "category")
+        self.assertEqual(df["directory"].dtype, "category")
+        self.assertEqual(list(df["directory"].cat.categories), [os.path.dirname(df["filepath"].iloc[0])])
+        self.assertEqual(df["filepath"].dtype, pd.StringDtype("pyarrow"))
+
+    @mock.patch("exif_gps_mapper.exiftool_pool.exiftool.ExifToolHelper")
+    def test_reads_table_with_string_dates(self, mock_helper):
+        mock_helper.return_value.get_tags.side_effect = fake_get_tags
+
+        # Written before the typed schema
+        images = sorted(os.path.join(self.lookup_path, x) for x in os.listdir(self.lookup_path))
+        pd.DataFrame({
+            "filepath": images, "created": "2023:01:22 12:00:00", "lat": None, "long": None, "lens": "50",
+            "st_mtime_ns": [os.stat(x).st_mtime_ns for x in images], "st_size": 0
+        }).to_parquet(self.db_path)
+
+        df = self.exif_database.read()
+        self.assertEqual(df["created"].iloc[0], pd.Timestamp("2023-01-22 12:00:00"))
+        self.assertEqual(df["directory"].iloc[0], os.path.normpath(self.lookup_path))
+
+        # Nothing changed, but the next write is in the typed schema
+        returned = self.exif_database.sync()
+        self.assertEqual(returned["changed"], set())
+
+        self.exif_database.update_rows(pd.DataFrame({"filepath": images[:1], "lat": [64.1]}))
+        created = pq.read_schema(self.db_path).field("created")
+        self.assertEqual(created.type, ExifDatabase.arrow_schema.field("created").type)
+
+    @mock.patch("exif_gps_mapper.exiftool_pool.exiftool.ExifToolHelper")
+    def test_added_field_is_read_incrementally(self, mock_helper):
+        def get_tags(paths, tags):
+            return [{"SourceFile": p, "EXIF:CreateDate": "2023:01:22 12:00:00", "EXIF:ISO": 200} for p in paths]
+
+        mock_helper.return_value.get_tags.side_effect = get_tags
+        fields = {"iso": {"tag": "EXIF:ISO", "type": "int"}, "model": {"tag": "EXIF:Model", "type": "category"}}
+
+        for layout, db_path in (("file", self.db_path), ("partitioned", os.path.join(self.test_dir, "exif"))):
+            ExifDatabase(db_path, self.lookup_path, [], [".nef"], batch_size=10, layout=layout).sync()
+
+            # The same table with more fields
+            exif_database = ExifDatabase(db_path, self.lookup_path, [], [".nef"], layout=layout, fields=fields)
+
+            mock_helper.return_value.get_tags.reset_mock()
+            exif_database.sync()
+
+            # One pass over the missing tags only
+            calls = mock_helper.return_value.get_tags.call_args_list
+            self.assertEqual({tuple(c.kwargs["tags"]) for c in calls}, {("EXIF:ISO", "EXIF:Model")})
+            self.assertEqual(sum(len(c.args[0]) for c in calls), 25)
+
+            df = exif_database.as_df
+            self.assertEqual(df["iso"].dtype, "Int64")
+            self.assertTrue((df["iso"] == 200).all())
+            self.assertEqual(df["model"].dtype, "category")
+            self.assertEqual(df["created"].iloc[0], pd.Timestamp("2023-01-22 12:00:00"))
+
+            # The columns are stored now
+            mock_helper.return_value.get_tags.reset_mock()
+            exif_database.sync()
+            self.assertEqual(mock_helper.return_value.get_tags.call_count, 0)
+
+    @mock.patch("exif_gps_mapper.exiftool_pool.exiftool.ExifToolHelper")
+    def test_blob_fields(self, mock_helper):
+        def get_tags(paths, tags, params=None):
+            if params == ["-b"]:
+                # Every image but the first has a preview
+                return [{"SourceFile": p, **({"EXIF:JpgFromRaw": "base64:" + base64.b64encode(b"JPEG" + p[-6:-4]
+                         .encode()).decode()} if not p.endswith("_00.NEF") else {})} for p in paths]
+            return fake_get_tags(paths, tags)
+
+        mock_helper.return_value.get_tags.side_effect = get_tags
+        exif_database = ExifDatabase(
+            self.db_path, self.lookup_path, [], [".nef"], blob_fields={"preview": "EXIF:JpgFromRaw"},
+            blob_path=os.path.join(self.test_dir, "blobs"), blob_chunk_size=4
+        )
+        exif_database.sync()
+
+        df = exif_database.as_df.set_index(exif_database.as_df["filepath"].map(os.path.basename))
+        self.assertNotIn("preview", df.columns)
+        self.assertEqual(exif_database.get_blob(df.loc["image_07.NEF"], "preview"), b"JPEG07")
+        self.assertIsNone(exif_database.get_blob(df.loc["image_00.NEF"], "preview"))
+
+        # Blob reads are chunked separately
+        blob_calls = [c for c in mock_helper.return_value.get_tags.call_args_list if c.kwargs.get("params")]
+        self.assertEqual([len(c.args[0]) for c in blob_calls], [4] * 6 + [1])
+
+        # Only the changed image is read again
+        with open(os.path.join(self.lookup_path, "image_07.NEF"), "w") as f:
+            f.write("edited")
+
+        mock_helper.return_value.get_tags.reset_mock()
+        exif_database.sync()
+
+        blob_calls = [c for c in mock_helper.return_value.get_tags.call_args_list if c.kwargs.get("params")]
+        self.assertEqual([os.path.basename(p) for c in blob_calls for p in c.args[0]], ["image_07.NEF"])
+        self.assertEqual(exif_database.get_blob(self._row(exif_database, "image_07.NEF"), "preview"), b"JPEG07")
+
+    @staticmethod
+    def _row(exif_database: ExifDatabase, file_name: str) -> pd.Series:
+        df = exif_database.as_df
+        return df[df["filepath"].str.endswith(file_name)].iloc[0]
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir)
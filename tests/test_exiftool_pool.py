@@ -0,0 +1,36 @@
+from unittest import mock, TestCase
+
+from exif_gps_mapper.exiftool_pool import ExifToolPool
+
+
+def fake_get_tags(paths, tags):
+    return [{"SourceFile": p, "EXIF:LensModel": "lens"} for p in paths]
+
+
+class TestExifToolPool(TestCase):
+
+    @mock.patch("exif_gps_mapper.exiftool_pool.exiftool.ExifToolHelper")
+    def test_results_keep_input_order(self, mock_helper):
+        mock_helper.return_value.get_tags.side_effect = fake_get_tags
+
+        paths = [f"image_{i:03d}.NEF" for i in range(103)]
+
+        with ExifToolPool(n_workers=4, chunk_size=10) as pool:
+            returned = pool.get_tags(paths, tags=["EXIF:LensModel"])
+
+        self.assertEqual([d["SourceFile"] for d in returned], paths)
+        self.assertEqual(pool.stats["files"], 103)
+
+    @mock.patch("exif_gps_mapper.exiftool_pool.exiftool.ExifToolHelper")
+    def test_processes_are_long_lived(self, mock_helper):
+        mock_helper.return_value.get_tags.side_effect = fake_get_tags
+
+        paths = [f"image_{i:03d}.NEF" for i in range(100)]
+
+        with ExifToolPool(n_workers=3, chunk_size=10) as pool:
+            pool.get_tags(paths, tags=["EXIF:LensModel"])
+
+        # One process per worker, reused for all 10 chunks
+        self.assertEqual(mock_helper.call_count, 3)
+        self.assertEqual(mock_helper.return_value.get_tags.call_count, 10)
+        self.assertEqual(mock_helper.return_value.terminate.call_count, 3)
@@ -0,0 +1,140 @@
+import os
+import shutil
+
+import pandas as pd
+
+from unittest import mock, TestCase
+from exif_gps_mapper import ExifDatabase
+from exif_gps_mapper.geotag_writer import GeotagWriter
+
+
+class TestGeotagWriter(TestCase):
+
+    def setUp(self):
+        # Dir
+        self.test_dir = os.path.join("tests", "test_data", "TestGeotagWriter")
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        os.makedirs(self.test_dir)
+
+        self.paths = {name: os.path.join(self.test_dir, name) for name in ("a.jpg", "b.jpg", "c.NEF", "d.NEF", "e.jpg")}
+        for path in self.paths.values():
+            open(path, "w").close()
+
+        # d.NEF already has a sidecar
+        open(os.path.join(self.test_dir, "d.xmp"), "w").close()
+
+        self.df_joined = pd.DataFrame({
+            "filepath": list(self.paths.values()),
+            "lat": [None, None, None, None, 61.0],
+            "latitude": [64.1, -33.9, 64.2, 64.3, 64.4],
+            "longitude": [27.1, -70.6, 27.2, 27.3, 27.4],
+            "confidence": [1.0, 0.9, 0.8, 0.1, 1.0]
+        })
+
+        # Commands sent to exiftool, with the CSV they imported
+        self.executed = []
+
+    def execute(self, *params):
+        csv_path = params[0][len("-csv="):]
+        self.executed.append((params, pd.read_csv(csv_path)))
+
+        # The written images grow
+        for path in params:
+            if path.endswith(".jpg"):
+                with open(path, "a") as f:
+                    f.write("gps")
+        return ""
+
+    def test_plan(self):
+        plan = GeotagWriter(sidecar_extensions=[".NEF"], min_confidence=0.5).plan(self.df_joined)
+
+        # e.jpg has coordinates already, d.NEF is a weak match
+        self.assertEqual([os.path.basename(x) for x in plan["filepath"]], ["a.jpg", "b.jpg", "c.NEF"])
+        self.assertEqual(list(plan["mode"]), ["file", "file", "new_sidecar"])
+        self.assertEqual(plan["target"].iloc[2], os.path.join(self.test_dir, "c.xmp"))
+
+        plan = GeotagWriter(sidecar_extensions=[".nef"], overwrite=True).plan(self.df_joined)
+        self.assertEqual(list(plan["mode"]), ["file", "file", "new_sidecar", "sidecar", "file"])
+
+    @mock.patch("exif_gps_mapper.exiftool_pool.exiftool.ExifToolHelper")
+    def test_dry_run(self, mock_helper):
+        plan = GeotagWriter(dry_run=True).write(self.df_joined)
+
+        self.assertEqual(len(plan), 4)
+        mock_helper.assert_not_called()
+
+    @mock.patch("exif_gps_mapper.exiftool_pool.exiftool.ExifToolHelper")
+    def test_write_in_batches(self, mock_helper):
+        mock_helper.return_value.execute.side_effect = self.execute
+
+        plan = GeotagWriter(n_workers=2, chunk_size=1, sidecar_extensions=[".NEF"]).write(self.df_joined)
+
+        # One command per chunk of one mode. CSV files are numbered in command order.
+        self.assertEqual(len(self.executed), 4)
+        self.executed.sort(key=lambda x: os.path.basename(x[0][0]).split("-")[-1])
+        self.assertEqual(set(plan["status"]), {"written"})
+
+        params, csv = self.executed[0]
+        self.assertIn("-overwrite_original", params)
+        self.assertEqual(csv.iloc[0]["EXIF:GPSLatitude"], 64.1)
+
+        params, csv = self.executed[1]
+        self.assertEqual(csv.iloc[0]["EXIF:GPSLatitudeRef"], "S")
+        self.assertEqual(csv.iloc[0]["EXIF:GPSLongitudeRef"], "W")
+
+        # A missing sidecar is created from the RAW file, an existing one is updated
+        params, csv = self.executed[2]
+        self.assertEqual(params[-3:], ("-o", "%d%f.xmp", self.paths["c.NEF"]))
+        self.assertEqual(csv.iloc[0]["SourceFile"], self.paths["c.NEF"])
+
+        params, csv = self.executed[3]
+        self.assertEqual(csv.iloc[0]["SourceFile"], os.path.join(self.test_dir, "d.xmp"))
+        self.assertEqual(csv.iloc[0]["XMP:GPSLatitude"], 64.3)
+
+        # Temporary CSV files are removed
+        self.assertFalse(os.path.exists(os.path.dirname(params[0][len("-csv="):])))
+
+    @mock.patch("exif_gps_mapper.exiftool_pool.exiftool.ExifToolHelper")
+    def test_exif_database_is_updated(self, mock_helper):
+        db_path = os.path.join(self.test_dir, "exif.parquet")
+        pd.DataFrame({
+            "filepath": list(self.paths.values()),
+            "created": "2023:01:22 12:00:00",
+            "lat": [None, None, None, None, 61.0],
+            "long": [None, None, None, None, 25.0],
+            "lens": "X",
+            "st_mtime_ns": 0,
+            "st_size": 0
+        }).to_parquet(db_path)
+
+        def failing_execute(*params):
+            if self.paths["b.jpg"] in params:
+                raise RuntimeError("exiftool exited with status 1")
+            return self.execute(*params)
+
+        mock_helper.return_value.execute.side_effect = failing_execute
+
+        exif_database = ExifDatabase(db_path, self.test_dir, [], [".jpg", ".NEF"])
+        plan = GeotagWriter(chunk_size=1, sidecar_extensions=[".NEF"]).write(self.df_joined, exif_database)
+
+        self.assertEqual(plan.set_index("filepath").loc[self.paths["b.jpg"], "status"], "failed")
+
+        df = pd.read_parquet(db_path).set_index("filepath")
+        self.assertEqual(df.loc[self.paths["a.jpg"], "lat"], 64.1)
+        self.assertEqual(df.loc[self.paths["a.jpg"], "st_size"], 3)
+
+        # Failed images keep their rows
+        self.assertTrue(pd.isna(df.loc[self.paths["b.jpg"], "lat"]))
+
+        # Images with a sidecar are untouched, but have coordinates
+        self.assertEqual(df.loc[self.paths["c.NEF"], "lat"], 64.2)
+        self.assertEqual(df.loc[self.paths["c.NEF"], "st_size"], 0)
+
+        # The next plan only has the failed image
+        df_joined = self.df_joined.drop(columns="lat").merge(df["lat"].reset_index(), on="filepath")
+        plan = GeotagWriter(sidecar_extensions=[".NEF"]).plan(df_joined)
+        self.assertEqual(list(plan["filepath"]), [self.paths["b.jpg"]])
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir, ignore_errors=True)
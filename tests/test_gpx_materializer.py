@@ -0,0 +1,141 @@
+import os
+import shutil
+
+import pandas as pd
+
+from unittest import mock, TestCase
+from exif_gps_mapper import GpxMaterializer
+from exif_gps_mapper.materialisers.gpx_parser import parse_gpx_arrays, try_parse_gpx
+
+GPX_DATA = """<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="Polar Flow" xmlns="http://www.topografix.com/GPX/1/1">
+  <metadata>
+    <time>2023-01-22T10:00:00.000Z</time>
+  </metadata>
+  <trk>
+    <trkseg>
+      <trkpt lat="64.174200" lon="27.600540">
+        <ele>120.0</ele>
+        <time>2023-01-22T11:55:36.250Z</time>
+      </trkpt>
+      <trkpt lat="64.174083" lon="27.600893">
+        <time>2023-01-22T11:55:37.000Z</time>
+      </trkpt>
+    </trkseg>
+    <trkseg>
+      <trkpt lat="64.174000" lon="27.601000">
+        <time>2023-01-22T11:59:22Z</time>
+      </trkpt>
+    </trkseg>
+  </trk>
+</gpx>
+"""
+
+
+class TestGpxMaterializer(TestCase):
+
+    def setUp(self):
+        # Dir
+        # Removes the tables together with their route index sidecars
+        self.test_dir = "tests/test_data/TestGpxMaterializer"
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        os.makedirs(self.test_dir)
+
+        self.test_file_path = os.path.join(self.test_dir, "TestGpxMaterializer.parquet")
+        self.simplified_path = os.path.join(self.test_dir, "TestGpxMaterializer_simplified.parquet")
+        self.dataset_path = os.path.join(self.test_dir, "route")
+
+    def test_parse_gpx_arrays(self):
+        arrays = parse_gpx_arrays(GPX_DATA)
+
+        self.assertEqual(arrays["latitude"].dtype, "float64")
+        self.assertEqual(list(arrays["longitude"]), [27.600540, 27.600893, 27.601000])
+
+        # Naive UTC, microseconds cut out
+        self.assertEqual(arrays["point_time"][0], pd.Timestamp("2023-01-22 11:55:36").to_datetime64())
+
+    def test_fast_parser_matches_gpxpy(self):
+        dataframes = []
+
+        for parser in ("fast", "gpxpy"):
+            gpx_materializer = GpxMaterializer(self.test_file_path, parser=parser)
+            gpx_materializer.add(GPX_DATA, 1)
+            dataframes.append(gpx_materializer.generate_dataframe())
+
+        self.assertEqual(len(dataframes[0]), 3)
+        pd.testing.assert_frame_equal(dataframes[0], dataframes[1])
+
+    @mock.patch("exif_gps_mapper.materialisers.gpx_parser.parse_gpx_arrays")
+    def test_falls_back_to_gpxpy(self, mock_parse):
+        mock_parse.side_effect = ValueError("Track point without a time.")
+
+        gpx_materializer = GpxMaterializer(self.test_file_path)
+        gpx_materializer.add(GPX_DATA, 1)
+
+        self.assertEqual(len(gpx_materializer), 3)
+        self.assertEqual(len(gpx_materializer.generate_dataframe()), 3)
+
+    @mock.patch("exif_gps_mapper.materialisers.gpx_parser.parse_gpx_arrays")
+    def test_try_parse_gpx_uses_parser_setting(self, mock_parse):
+        arrays = try_parse_gpx(GPX_DATA, "gpxpy")
+
+        mock_parse.assert_not_called()
+        self.assertEqual(len(arrays["point_time"]), 3)
+        self.assertIsNone(try_parse_gpx("<gpx><trk", "gpxpy"))
+
+    def test_can_write(self):
+        gpx_materializer = GpxMaterializer(self.test_file_path)
+        gpx_materializer.add(GPX_DATA, 1)
+        gpx_materializer.add(None, 2)
+        gpx_materializer.close()
+
+        df = pd.read_parquet(self.test_file_path)
+        self.assertEqual(len(df), 3)
+        self.assertEqual(df.index.name, "point_time")
+
+    def test_flush_threshold_spills_batches(self):
+        gpx_materializer = GpxMaterializer(self.dataset_path, layout="partitioned", flush_rows=3)
+
+        # Three points pass the threshold and are written by add()
+        gpx_materializer.add(GPX_DATA, 1)
+        self.assertEqual(len(gpx_materializer), 0)
+        self.assertEqual(len(gpx_materializer.read()), 3)
+
+        # Same points again are not duplicated
+        gpx_materializer.add(GPX_DATA, 1)
+        gpx_materializer.close()
+        self.assertEqual(len(gpx_materializer.read()), 3)
+
+    def test_file_layout_writes_on_flush_only(self):
+        # Every write rewrites the whole file, so thresholds do not spill
+        gpx_materializer = GpxMaterializer(self.test_file_path, flush_rows=1)
+        gpx_materializer.add(GPX_DATA, 1)
+
+        self.assertEqual(len(gpx_materializer), 3)
+        self.assertFalse(os.path.exists(self.test_file_path))
+
+        gpx_materializer.close()
+        self.assertEqual(len(pd.read_parquet(self.test_file_path)), 3)
+
+    def test_simplified_table(self):
+        gpx_materializer = GpxMaterializer(
+            self.test_file_path, simplify={"min_interval": "60s"}, simplified_path=self.simplified_path
+        )
+        gpx_materializer.add(GPX_DATA, 1)
+        gpx_materializer.close()
+
+        # 11:55:36 and 11:55:37 fall in the same minute, the last point is kept
+        df = pd.read_parquet(self.test_file_path)
+        df_simplified = pd.read_parquet(self.simplified_path)
+        self.assertEqual(len(df), 3)
+        self.assertEqual(df_simplified.index.name, "point_time")
+        self.assertEqual(list(df_simplified.index), [df.index[0], df.index[2]])
+
+        # Same points again are not duplicated
+        gpx_materializer.add(GPX_DATA, 1)
+        gpx_materializer.close()
+        self.assertEqual(len(pd.read_parquet(self.simplified_path)), 2)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir, ignore_errors=True)
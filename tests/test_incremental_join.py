@@ -0,0 +1,96 @@
+import os
+import shutil
+
+import pandas as pd
+
+from unittest import TestCase
+from exif_gps_mapper import RouteJoiner
+from exif_gps_mapper.incremental_join import IncrementalJoiner
+from tests.test_route_joiner import DF_EXERCISE, DF_ROUTE, DF_EXIF
+
+
+class TestIncrementalJoiner(TestCase):
+
+    def setUp(self):
+        # Dir
+        self.test_dir = "tests/test_data/TestIncrementalJoiner"
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        os.makedirs(self.test_dir)
+
+        self.path = os.path.join(self.test_dir, "joined.parquet")
+
+        # Exercise 1 only; exercise 2 arrives later
+        self.df_exercise = DF_EXERCISE.loc[[1]]
+        self.df_route = DF_ROUTE[DF_ROUTE["exercise_id"] == 1]
+
+    def assert_matches_full_join(self, df: pd.DataFrame, df_exif: pd.DataFrame, df_exercise, df_route):
+        expected = RouteJoiner().join(df_exif, df_exercise, df_route)
+        columns = ["filepath", "exercise_id", "latitude", "longitude"]
+
+        pd.testing.assert_frame_equal(
+            df[columns].sort_values("filepath", ignore_index=True),
+            expected[columns].sort_values("filepath", ignore_index=True)
+        )
+
+    def test_first_run_is_a_full_join(self):
+        joiner = IncrementalJoiner(self.path)
+        df = joiner.update(DF_EXIF, self.df_exercise, self.df_route)
+
+        self.assertEqual(joiner.stats["rejoined"], 4)
+        self.assertTrue(os.path.exists(joiner.state_path))
+        self.assert_matches_full_join(df, DF_EXIF, self.df_exercise, self.df_route)
+
+    def test_nothing_changed(self):
+        IncrementalJoiner(self.path).update(DF_EXIF, self.df_exercise, self.df_route)
+
+        joiner = IncrementalJoiner(self.path)
+        mtime_ns = os.stat(self.path).st_mtime_ns
+        df = joiner.update(DF_EXIF, self.df_exercise, self.df_route)
+
+        self.assertEqual(joiner.stats, {"rejoined": 0, "new_exercises": 0, "deleted": 0})
+        self.assert_matches_full_join(df, DF_EXIF, self.df_exercise, self.df_route)
+
+        # The table is not rewritten
+        self.assertEqual(os.stat(self.path).st_mtime_ns, mtime_ns)
+
+    def test_new_exercise_rejoins_photos_in_its_window(self):
+        IncrementalJoiner(self.path).update(DF_EXIF, self.df_exercise, self.df_route)
+
+        # c.NEF (14:00 local) is inside exercise 2
+        joiner = IncrementalJoiner(self.path)
+        df = joiner.update(DF_EXIF, DF_EXERCISE, DF_ROUTE)
+
+        self.assertEqual(joiner.stats, {"rejoined": 1, "new_exercises": 1, "deleted": 0})
+        self.assertEqual(df.set_index("filepath").loc["c.NEF", "exercise_id"], 2)
+        self.assert_matches_full_join(df, DF_EXIF, DF_EXERCISE, DF_ROUTE)
+
+    def test_route_arrives_after_its_exercise(self):
+        # Exercise 2 is known, but its route is not there yet
+        joiner = IncrementalJoiner(self.path)
+        joiner.update(DF_EXIF, DF_EXERCISE, self.df_route)
+        self.assertEqual(joiner.stats["new_exercises"], 1)
+
+        joiner = IncrementalJoiner(self.path)
+        df = joiner.update(DF_EXIF, DF_EXERCISE, DF_ROUTE)
+
+        self.assertEqual(joiner.stats, {"rejoined": 1, "new_exercises": 1, "deleted": 0})
+        self.assertEqual(df.set_index("filepath").loc["c.NEF", "exercise_id"], 2)
+        self.assert_matches_full_join(df, DF_EXIF, DF_EXERCISE, DF_ROUTE)
+
+    def test_new_changed_and_deleted_photos(self):
+        IncrementalJoiner(self.path).update(DF_EXIF, DF_EXERCISE, DF_ROUTE)
+
+        df_exif = DF_EXIF[DF_EXIF["filepath"] != "d.NEF"].copy()
+        df_exif.loc[df_exif["filepath"] == "c.NEF", "created"] = "2023:01:22 12:02:00"
+        df_exif = pd.concat([df_exif, pd.DataFrame({"filepath": ["e.NEF"], "created": ["2023:01:22 14:01:00"]})])
+
+        joiner = IncrementalJoiner(self.path)
+        df = joiner.update(df_exif, DF_EXERCISE, DF_ROUTE, changed={"a.NEF"})
+
+        self.assertEqual(joiner.stats, {"rejoined": 3, "new_exercises": 0, "deleted": 1})
+        self.assertEqual(df.set_index("filepath").loc["c.NEF", "exercise_id"], 1)
+        self.assert_matches_full_join(df, df_exif, DF_EXERCISE, DF_ROUTE)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir, ignore_errors=True)
@@ -0,0 +1,54 @@
+import os
+import shutil
+
+import pandas as pd
+
+from unittest import TestCase
+from exif_gps_mapper import ExerciseMaterializer, GpxMaterializer
+from exif_gps_mapper.accesslink.journal import TransactionJournal
+from tests.test_exercise_materializer import EXERCISE_DICT_A, EXERCISE_DICT_B
+from tests.test_gpx_materializer import GPX_DATA
+
+
+class TestTransactionJournal(TestCase):
+
+    def setUp(self):
+        # Dir
+        self.test_dir = "tests/test_data/TestTransactionJournal"
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+        self.journal = TransactionJournal(os.path.join(self.test_dir, "journal"))
+        self.exercise_path = os.path.join(self.test_dir, "exercise.parquet")
+        self.route_path = os.path.join(self.test_dir, "route.parquet")
+
+    def test_seal_and_mark_applied(self):
+        self.journal.seal(123, [(EXERCISE_DICT_A, GPX_DATA), (EXERCISE_DICT_B, None)])
+
+        self.assertEqual(self.journal.pending(), [123])
+        self.assertEqual(self.journal.load(123), [(EXERCISE_DICT_A, GPX_DATA), (EXERCISE_DICT_B, None)])
+
+        self.journal.mark_applied(123)
+        self.assertEqual(self.journal.pending(), [])
+
+    def test_replay_is_idempotent(self):
+        entries = [(EXERCISE_DICT_A, GPX_DATA), (EXERCISE_DICT_B, None)]
+
+        # Left behind by a crash: one sealed transaction and one unfinished seal
+        self.journal.seal(123, entries)
+        with open(os.path.join(self.journal.path, "transaction-124.json.tmp"), "w") as f:
+            f.write("{")
+
+        replayed = self.journal.replay(ExerciseMaterializer(self.exercise_path), GpxMaterializer(self.route_path))
+        self.assertEqual(replayed, 1)
+
+        # A crash after the rows were written, but before the journal was marked applied
+        self.journal.seal(123, entries)
+        self.journal.replay(ExerciseMaterializer(self.exercise_path), GpxMaterializer(self.route_path))
+
+        self.assertEqual(os.listdir(self.journal.path), [])
+        self.assertEqual(sorted(pd.read_parquet(self.exercise_path).index), [1, 2])
+        self.assertEqual(len(pd.read_parquet(self.route_path)), 3)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir, ignore_errors=True)
@@ -0,0 +1,91 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from unittest import TestCase
+from exif_gps_mapper import MapExporter, PreviewCache
+
+
+class TestMapExporter(TestCase):
+
+    def setUp(self):
+        # Dir
+        self.test_dir = os.path.join("tests", "test_data", "TestMapExporter")
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+        # Two straight tracks of 100 points, stored like GpxMaterializer stores them
+        point_time = pd.date_range("2023-01-22 12:00", periods=200, freq="s", name="point_time")
+        self.df_route = pd.DataFrame({
+            "exercise_id": np.repeat([1, 2], 100),
+            "latitude": np.r_[np.linspace(64.0, 64.1, 100), np.full(100, 61.5)],
+            "longitude": np.r_[np.full(100, 27.0), np.linspace(23.7, 23.8, 100)]
+        }, index=point_time)
+
+        self.df_joined = pd.DataFrame({
+            "filepath": ["/photos/a.NEF", "/photos/b<1>.NEF", "/photos/c.NEF"],
+            "latitude": [64.05, 61.5, None],
+            "longitude": [27.0, 23.75, None]
+        })
+
+        self.exporter = MapExporter(os.path.join(self.test_dir, "map"), detail_zooms=(12, 15))
+
+    def test_export(self):
+        html_path = self.exporter.export(self.df_route, self.df_joined)
+
+        # Straight tracks keep their end points only, at every level
+        for zoom in (8, 12, 15):
+            with open(os.path.join(self.exporter.path, "tracks", "1", f"z{zoom}.geojson")) as f:
+                self.assertEqual(len(json.load(f)["geometry"]["coordinates"]), 2)
+
+        # One marker file per cell, with escaped popups
+        cells = {}
+        for file_name in os.listdir(os.path.join(self.exporter.path, "photos")):
+            with open(os.path.join(self.exporter.path, "photos", file_name)) as f:
+                cells[file_name] = json.load(f)
+
+        self.assertEqual(sorted(len(x) for x in cells.values()), [1, 1])
+        self.assertIn([61.5, 23.75, "b&lt;1&gt;.NEF"], [row for rows in cells.values() for row in rows])
+
+        with open(html_path) as f:
+            page = f.read()
+        self.assertIn("markerClusterGroup", page)
+        self.assertIn('"tracks/" + t[0]', page)
+        self.assertEqual(self.exporter.stats["exercises_written"], 2)
+
+        # Tracks that have been written are not simplified again
+        self.exporter.export(self.df_route, self.df_joined)
+        self.assertEqual(self.exporter.stats["exercises_written"], 0)
+
+        # A track that changed in place, with the same number of points, is simplified again
+        self.df_route.loc[self.df_route["exercise_id"] == 1, "latitude"] += 0.5
+        self.exporter.export(self.df_route, self.df_joined)
+        self.assertEqual(self.exporter.stats["exercises_written"], 1)
+
+        with open(os.path.join(self.exporter.path, "tracks", "1", "z15.geojson")) as f:
+            self.assertEqual(json.load(f)["geometry"]["coordinates"][0], [27.0, 64.5])
+
+    def test_popups_do_not_touch_previews(self):
+        cache = PreviewCache(os.path.join(self.test_dir, "previews"))
+        self.exporter.preview_cache = cache
+        df_joined = self.df_joined.assign(st_mtime_ns=[1, 2, 3])
+
+        # a.NEF has a preview, b<1>.NEF has an empty marker
+        paths = [cache._object_path(cache.key(x, y)) for x, y in zip(df_joined["filepath"], df_joined["st_mtime_ns"])]
+        for path, data in zip(paths, [b"JPEG", b""]):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+            os.utime(path, ns=(1, 1))
+
+        popups = self.exporter._popups(df_joined)
+
+        self.assertTrue(popups[0].startswith('<img src="../previews/'))
+        self.assertEqual(popups[1:], ["b&lt;1&gt;.NEF", "c.NEF"])
+        self.assertEqual([os.stat(x).st_mtime_ns for x in paths[:2]], [1, 1])
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir)
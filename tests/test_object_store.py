@@ -0,0 +1,60 @@
+import gzip
+import os
+import shutil
+
+from unittest import TestCase
+from exif_gps_mapper.helpers.blob_store import BlobStore
+from exif_gps_mapper.helpers.object_store import ObjectStore
+
+
+class TestObjectStore(TestCase):
+
+    def setUp(self):
+        # Dir
+        self.test_dir = os.path.join("tests", "test_data", "TestObjectStore")
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+    def test_objects(self):
+        plain = ObjectStore(os.path.join(self.test_dir, "plain"))
+        compressed = ObjectStore(os.path.join(self.test_dir, "compressed"), compresslevel=6)
+
+        for store in (plain, compressed):
+            sha = store.put_object(b"data")
+            self.assertEqual(store.put_object(b"data"), sha)
+            self.assertEqual(store.get_object(sha), b"data")
+
+        # Identical content is stored once, compressed with a .gz suffix
+        with open(compressed._object_path(sha), "rb") as f:
+            self.assertEqual(gzip.decompress(f.read()), b"data")
+        self.assertTrue(compressed._object_path(sha).endswith(".gz"))
+        self.assertEqual(sum(len(files) for _, _, files in os.walk(os.path.join(plain.path, "objects"))), 1)
+
+    def test_torn_index_line_is_skipped(self):
+        store = ObjectStore(self.test_dir)
+        store._append_index([{"a": 1}, {"a": 2}])
+        with open(os.path.join(store.path, ObjectStore.INDEX_FILE), "a") as f:
+            f.write('{"a": 3')
+
+        self.assertEqual(list(store._read_index()), [{"a": 1}, {"a": 2}])
+
+    def test_blob_store(self):
+        store = BlobStore(self.test_dir)
+        sha = store.put_object(b"JPEG")
+        store.add_entries([
+            {"field": "preview", "filepath": "a.NEF", "st_mtime_ns": 1, "st_size": 10, "sha": sha},
+            {"field": "preview", "filepath": "b.NEF", "st_mtime_ns": 1, "st_size": 10, "sha": None}
+        ])
+
+        # A new instance reads the index from disk
+        store = BlobStore(self.test_dir)
+        self.assertEqual(store.get("preview", "a.NEF", 1, 10), b"JPEG")
+        self.assertTrue(store.is_current("preview", "b.NEF", 1, 10))
+        self.assertIsNone(store.get("preview", "b.NEF", 1, 10))
+
+        # The image has changed since
+        self.assertIsNone(store.get("preview", "a.NEF", 2, 10))
+        self.assertFalse(store.is_current("preview", "a.NEF", 2, 10))
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir, ignore_errors=True)
@@ -0,0 +1,85 @@
+import threading
+
+from unittest import mock, TestCase
+from exif_gps_mapper.accesslink.orchestrator import MultiUserSync
+from exif_gps_mapper.accesslink.transaction import Transaction
+from exif_gps_mapper.accesslink.transaction_pool import TransactionPool
+
+
+class TestMultiUserSync(TestCase):
+
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.populated = {}
+        self.commits = []
+
+        for name, func in (("populate", self.populate), ("_fetch", self.fetch), ("commit", self.commit)):
+            patcher = mock.patch.object(Transaction, name, autospec=True, side_effect=func)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def populate(self, transaction: Transaction) -> bool:
+        # One transaction of two exercises per user
+        with self.lock:
+            n = self.populated.get(transaction._user_id, 0)
+            self.populated[transaction._user_id] = n + 1
+
+        if n:
+            return False
+
+        transaction.transaction_id = 1
+        transaction._exercise_urls = [f"{transaction._user_id}/{i}" for i in range(2)]
+        return True
+
+    def fetch(self, transaction: Transaction, url: str) -> tuple:
+        if url.startswith("user_b"):
+            raise ConnectionError("502")
+        return {"url": url}, None
+
+    def commit(self, transaction: Transaction):
+        with self.lock:
+            self.commits.append(transaction._user_id)
+
+    def test_failures_are_isolated_per_user(self):
+        handled = []
+        users = [{"user_id": user_id, "access_token": "token"} for user_id in ("user_a", "user_b", "user_c")]
+
+        results = MultiUserSync(users, lambda user_id, exercise, gpx: handled.append(exercise["url"])).run()
+
+        self.assertEqual(results["user_a"]["status"], "ok")
+        self.assertEqual(results["user_a"]["exercises"], 2)
+        self.assertEqual(results["user_b"]["status"], "failed")
+        self.assertIsInstance(results["user_b"]["error"], ConnectionError)
+
+        self.assertCountEqual(self.commits, ["user_a", "user_c"])
+        self.assertCountEqual(handled, ["user_a/0", "user_a/1", "user_c/0", "user_c/1"])
+
+    def test_user_recovers_in_the_next_run(self):
+        users = [{"user_id": "user_b", "access_token": "token"}]
+
+        # The first run fails in the middle of a transaction
+        results = MultiUserSync(users, lambda user_id, exercise, gpx: None).run()
+        self.assertEqual(results["user_b"]["status"], "failed")
+
+        # The next runs start from a fresh transaction, with the new token and session
+        self.fetch = lambda transaction, url: ({"url": url}, None)
+        Transaction._fetch.side_effect = self.fetch
+
+        for run in range(2):
+            self.populated = {}
+            session = mock.Mock()
+            users = [{"user_id": "user_b", "access_token": f"token_{run}"}]
+
+            results = MultiUserSync(users, lambda user_id, exercise, gpx: None, session=session).run()
+            self.assertEqual(results["user_b"]["status"], "ok")
+            self.assertEqual(results["user_b"]["transactions"], 1)
+
+            pool = TransactionPool.for_user(f"token_{run}", "user_b")
+            self.assertEqual(pool._access_token, f"token_{run}")
+            self.assertIs(pool.session, session)
+            self.assertEqual(len(pool.previous_transactions), 1)
+
+        self.assertEqual(self.commits, ["user_b", "user_b"])
+
+    def tearDown(self) -> None:
+        TransactionPool._registry = {}
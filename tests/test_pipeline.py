@@ -0,0 +1,127 @@
+import os
+import shutil
+
+import pandas as pd
+
+from unittest import mock, TestCase
+from exif_gps_mapper import ExerciseMaterializer, GpxMaterializer
+from exif_gps_mapper.accesslink.journal import TransactionJournal
+from exif_gps_mapper.accesslink.transaction import Transaction
+from exif_gps_mapper.accesslink.transaction_pool import TransactionPool
+from exif_gps_mapper.materialisers import materializer
+from exif_gps_mapper.pipeline import SyncPipeline
+from tests.test_exercise_materializer import EXERCISE_DICT_A, EXERCISE_DICT_B
+from tests.test_gpx_materializer import GPX_DATA
+
+
+class TestSyncPipeline(TestCase):
+
+    def setUp(self):
+        # Dir
+        self.test_dir = "tests/test_data/TestSyncPipeline"
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        os.makedirs(self.test_dir)
+
+        self.exercise_path = os.path.join(self.test_dir, "exercise.parquet")
+        self.route_path = os.path.join(self.test_dir, "route.parquet")
+        self.journal = TransactionJournal(os.path.join(self.test_dir, "journal"))
+
+        # Two transactions of one exercise each
+        self.transactions = [[EXERCISE_DICT_A], [EXERCISE_DICT_B]]
+        self.exercises = {f"url/{exercise['id']}": exercise for exercises in self.transactions for exercise in exercises}
+        self.committed_rows = []
+        self.fail_on = None
+
+        for name, func in (("populate", self.populate), ("_fetch", self.fetch), ("commit", self.commit)):
+            patcher = mock.patch.object(Transaction, name, autospec=True, side_effect=func)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def populate(self, transaction: Transaction) -> bool:
+        if not self.transactions:
+            return False
+
+        exercises = self.transactions.pop(0)
+        transaction.transaction_id = exercises[0]["transaction-id"]
+        transaction._exercise_urls = [f"url/{exercise['id']}" for exercise in exercises]
+        return True
+
+    def fetch(self, transaction: Transaction, url: str) -> tuple:
+        exercise = self.exercises[url]
+        if exercise["id"] == self.fail_on:
+            raise KeyError("start-time")
+        # Route points are keyed on time
+        return exercise, GPX_DATA.replace("2023-01-22", f"2023-01-{21 + exercise['id']}")
+
+    def commit(self, transaction: Transaction):
+        # What is on disk when the commit is sent
+        self.committed_rows.append(len(pd.read_parquet(self.exercise_path)))
+
+    def run_pipeline(self) -> dict:
+        pool = TransactionPool.for_user("token", "user")
+        pipeline = SyncPipeline(pool, ExerciseMaterializer(self.exercise_path), GpxMaterializer(self.route_path),
+                                parse_workers=2, queue_size=1, journal=self.journal)
+        return pipeline.run()
+
+    def test_commit_after_flush(self):
+        stats = self.run_pipeline()
+
+        self.assertEqual(stats, {"transactions": 2, "exercises": 2, "gpx": 2, "replayed": 0})
+        self.assertEqual(self.journal.pending(), [])
+
+        # Each transaction was written before it was committed
+        self.assertEqual(self.committed_rows, [1, 2])
+
+        df_route = pd.read_parquet(self.route_path)
+        self.assertEqual(len(df_route), 6)
+        self.assertEqual(sorted(df_route["exercise_id"].unique()), [1, 2])
+
+    def test_rows_are_synced_before_the_journal_is_removed(self):
+        synced = []
+
+        def mark_applied(journal, transaction_id):
+            # Both tables were synced for this transaction
+            self.assertEqual(synced[-2:], [f"{self.exercise_path}.tmp", f"{self.route_path}.tmp"])
+            synced.clear()
+            os.remove(journal._file(transaction_id))
+
+        patch_applied = mock.patch.object(TransactionJournal, "mark_applied", autospec=True, side_effect=mark_applied)
+        with mock.patch.object(materializer, "fsync_file", side_effect=synced.append), patch_applied as mock_applied:
+            self.run_pipeline()
+
+        self.assertEqual(mock_applied.call_count, 2)
+
+    def test_from_config(self):
+        config = {
+            "db": {"dir": self.test_dir, "exercise": self.exercise_path, "route": self.route_path},
+            "accesslink": {"max_workers": 8, "ordered": False}
+        }
+        pipeline = SyncPipeline.from_config(config, "token", "user")
+
+        self.assertIs(pipeline.pool, TransactionPool.for_user("token", "user"))
+        self.assertEqual((pipeline.pool.max_workers, pipeline.pool.ordered), (8, False))
+
+    def test_failure_is_not_committed(self):
+        self.fail_on = EXERCISE_DICT_B["id"]
+
+        with self.assertRaises(KeyError):
+            self.run_pipeline()
+
+        # The first transaction was committed, the second one stays on the server
+        self.assertEqual(self.committed_rows, [1])
+
+    def test_replay_journal_before_sync(self):
+        # Committed on the server, but the process died before the rows were written
+        self.journal.seal(100, [(dict(EXERCISE_DICT_A, id=100), GPX_DATA.replace("2023-01-22", "2023-01-01"))])
+
+        stats = self.run_pipeline()
+
+        self.assertEqual(stats["replayed"], 1)
+        self.assertEqual(sorted(pd.read_parquet(self.exercise_path).index), [1, 2, 100])
+        self.assertEqual(len(pd.read_parquet(self.route_path)), 9)
+        self.assertEqual(self.journal.pending(), [])
+
+    def tearDown(self) -> None:
+        TransactionPool._registry = {}
+        shutil.rmtree(self.test_dir, ignore_errors=True)
@@ -0,0 +1,158 @@
+import base64
+import io
+import os
+import shutil
+import unittest
+
+import pandas as pd
+
+from unittest import mock, TestCase
+from exif_gps_mapper import PreviewCache
+from exif_gps_mapper import preview_cache
+from exif_gps_mapper.helpers.blob_store import BlobStore
+
+
+def fake_get_tags(paths, tags, params=None):
+    # b.NEF has no embedded preview
+    return [
+        {"SourceFile": p, **({} if p.endswith("b.NEF") else {
+            "Composite:PreviewImage": "base64:" + base64.b64encode(f"JPEG {os.path.basename(p)}".encode()).decode()
+        })} for p in paths
+    ]
+
+
+@mock.patch.object(preview_cache, "Image", None)
+class TestPreviewCache(TestCase):
+
+    def setUp(self):
+        # Dir
+        self.test_dir = os.path.join("tests", "test_data", "TestPreviewCache")
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+        self.df_exif = pd.DataFrame({
+            "filepath": [os.path.join(self.test_dir, "images", x) for x in ("a.NEF", "b.NEF", "c.NEF")],
+            "st_mtime_ns": [1, 2, 3]
+        })
+        self.cache = PreviewCache(os.path.join(self.test_dir, "previews"), chunk_size=2)
+
+    @mock.patch("exif_gps_mapper.exiftool_pool.exiftool.ExifToolHelper")
+    def test_build_and_lookup(self, mock_helper):
+        mock_helper.return_value.get_tags.side_effect = fake_get_tags
+
+        self.assertEqual(self.cache.build(self.df_exif), 3)
+        self.assertEqual(self.cache.stats, {"images": 3, "previews": 2, "from_blobs": 0})
+
+        rows = self.df_exif.set_index(self.df_exif["filepath"].map(os.path.basename))
+        self.assertEqual(self.cache.get(rows.loc["a.NEF"]), b"JPEG a.NEF")
+        self.assertIsNone(self.cache.get(rows.loc["b.NEF"]))
+
+        # Read with -b, two images per call
+        calls = mock_helper.return_value.get_tags.call_args_list
+        self.assertEqual([c.kwargs["params"] for c in calls], [["-b"], ["-b"]])
+
+        # Nothing is read again, not even the image without a preview
+        mock_helper.return_value.get_tags.reset_mock()
+        self.assertEqual(self.cache.build(self.df_exif), 0)
+        self.assertEqual(mock_helper.return_value.get_tags.call_count, 0)
+
+        # An edited image has a new mtime, and a new key
+        self.df_exif.loc[0, "st_mtime_ns"] = 10
+        self.assertIsNone(self.cache.get(self.df_exif.loc[0]))
+        self.assertEqual(self.cache.build(self.df_exif), 1)
+        self.assertEqual(self.cache.get(self.df_exif.loc[0]), b"JPEG a.NEF")
+
+    @mock.patch("exif_gps_mapper.exiftool_pool.exiftool.ExifToolHelper")
+    def test_least_recently_used_are_evicted(self, mock_helper):
+        mock_helper.return_value.get_tags.side_effect = fake_get_tags
+        self.cache.build(self.df_exif)
+
+        # a.NEF and c.NEF take 10 bytes each. Using a.NEF makes c.NEF the least recently used.
+        for i, row in self.df_exif.iterrows():
+            path = self.cache._object_path(self.cache.key(row["filepath"], row["st_mtime_ns"]))
+            os.utime(path, ns=(i + 1, i + 1))
+        self.cache.path_of(self.df_exif.loc[0])
+
+        self.cache.max_bytes = 15
+        self.assertEqual(self.cache.evict(), 2)
+
+        self.assertEqual(self.cache.size_bytes(), 10)
+        self.assertIsNotNone(self.cache.get(self.df_exif.loc[0]))
+        self.assertIsNone(self.cache.get(self.df_exif.loc[2]))
+
+    @mock.patch("exif_gps_mapper.exiftool_pool.exiftool.ExifToolHelper")
+    def test_previews_from_blob_store(self, mock_helper):
+        mock_helper.return_value.get_tags.side_effect = fake_get_tags
+        self.df_exif["st_size"] = 100
+
+        # ExifDatabase.extract_blobs has read a.NEF as it is now, and c.NEF before it was edited
+        blob_store = BlobStore(os.path.join(self.test_dir, "blobs"))
+        blob_store.add_entries([
+            {"field": "preview", "filepath": path, "st_mtime_ns": st_mtime_ns, "st_size": 100,
+             "sha": blob_store.put_object(b"BLOB " + os.path.basename(path).encode())}
+            for path, st_mtime_ns in zip(self.df_exif["filepath"][[0, 2]], [1, 0])
+        ])
+        self.cache.blob_store, self.cache.blob_field = blob_store, "preview"
+
+        self.assertEqual(self.cache.build(self.df_exif), 3)
+        self.assertEqual(self.cache.stats, {"images": 3, "previews": 2, "from_blobs": 1})
+        self.assertEqual(self.cache.get(self.df_exif.loc[0]), b"BLOB a.NEF")
+        self.assertEqual(self.cache.get(self.df_exif.loc[2]), b"JPEG c.NEF")
+
+        # Only the other images were read with exiftool
+        paths = [p for c in mock_helper.return_value.get_tags.call_args_list for p in c.args[0]]
+        self.assertEqual(sorted(os.path.basename(x) for x in paths), ["b.NEF", "c.NEF"])
+
+    def test_from_config_uses_preview_blob_field(self):
+        config = {
+            "input": {"exif_blobs": {"iptc": "IPTC:Caption", "preview": "EXIF:JpgFromRaw"}},
+            "db": {"previews": os.path.join(self.test_dir, "p"), "blobs": os.path.join(self.test_dir, "blobs")}
+        }
+        self.assertEqual(PreviewCache.from_config(config).blob_field, "preview")
+
+        config["input"]["exif_blobs"] = None
+        self.assertIsNone(PreviewCache.from_config(config).blob_store)
+
+    @mock.patch("exif_gps_mapper.exiftool_pool.exiftool.ExifToolHelper")
+    def test_source_file_is_normalised(self, mock_helper):
+        mock_helper.return_value.get_tags.side_effect = fake_get_tags
+
+        # exiftool reports the paths it was given, which are normalised
+        self.df_exif["filepath"] = [os.path.join(self.test_dir, ".", "images", x) for x in ("a.NEF", "b.NEF", "c.NEF")]
+
+        self.assertEqual(self.cache.build(self.df_exif), 3)
+        self.assertEqual(self.cache.get(self.df_exif.loc[0]), b"JPEG a.NEF")
+
+    @mock.patch("exif_gps_mapper.exiftool_pool.exiftool.ExifToolHelper")
+    def test_corrupt_preview_is_stored_as_is(self, mock_helper):
+        mock_helper.return_value.get_tags.side_effect = fake_get_tags
+
+        # Pillow cannot identify the embedded image of c.NEF
+        def open_image(f):
+            if f.getvalue().endswith(b"c.NEF"):
+                raise OSError("cannot identify image file")
+            return mock.MagicMock()
+
+        image = mock.Mock(DecompressionBombError=type("DecompressionBombError", (Exception,), {}))
+        image.open.side_effect = open_image
+
+        with mock.patch.object(preview_cache, "Image", image):
+            self.assertEqual(self.cache.build(self.df_exif), 3)
+
+        self.assertEqual(self.cache.stats, {"images": 3, "previews": 2, "from_blobs": 0})
+        self.assertEqual(self.cache.get(self.df_exif.loc[2]), b"JPEG c.NEF")
+
+    @unittest.skipIf(preview_cache.Image is None, "Pillow is not installed")
+    def test_downsize(self):
+        from PIL import Image
+
+        out = io.BytesIO()
+        Image.new("RGB", (1200, 800), "red").save(out, format="JPEG")
+
+        with mock.patch.object(preview_cache, "Image", Image):
+            data = self.cache._downsize(out.getvalue())
+
+        self.assertEqual(Image.open(io.BytesIO(data)).size, (320, 213))
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir)
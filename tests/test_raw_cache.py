@@ -0,0 +1,103 @@
+import os
+import shutil
+
+import pandas as pd
+
+from unittest import TestCase
+from exif_gps_mapper import ExerciseMaterializer, GpxMaterializer
+from exif_gps_mapper.accesslink.raw_cache import RawCache
+from exif_gps_mapper.rebuild import rebuild
+from tests.test_exercise_materializer import EXERCISE_DICT_A, EXERCISE_DICT_B
+from tests.test_gpx_materializer import GPX_DATA
+
+
+class TestRawCache(TestCase):
+
+    def setUp(self):
+        # Dir
+        self.test_dir = "tests/test_data/TestRawCache"
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+
+        self.config = {
+            "db": {
+                "dir": self.test_dir,
+                "raw": os.path.join(self.test_dir, "raw"),
+                "exercise": os.path.join(self.test_dir, "exercise.parquet"),
+                "route": os.path.join(self.test_dir, "route.parquet")
+            }
+        }
+        self.cache = RawCache(self.config["db"]["raw"])
+
+    def test_put_and_get(self):
+        entry_a = self.cache.put(EXERCISE_DICT_A, GPX_DATA, transaction_id=123)
+        entry_b = self.cache.put(EXERCISE_DICT_B, None, transaction_id=123)
+
+        self.assertEqual(self.cache.get(entry_a), (EXERCISE_DICT_A, GPX_DATA))
+        self.assertEqual(self.cache.get(entry_b), (EXERCISE_DICT_B, None))
+
+        # Downloaded again: one entry per exercise, identical content stored once
+        self.cache.put(EXERCISE_DICT_A, GPX_DATA, transaction_id=124)
+        self.assertEqual([entry["exercise_id"] for entry in self.cache.entries()], [1, 2])
+        self.assertEqual(self.cache.entries()[0]["transaction_id"], 124)
+        self.assertEqual(sum(len(files) for _, _, files in os.walk(self.cache.path)), 3 + 1)
+
+    def test_torn_index_line_is_skipped(self):
+        self.cache.put(EXERCISE_DICT_A, GPX_DATA)
+        with open(os.path.join(self.cache.path, RawCache.INDEX_FILE), "a") as f:
+            f.write('{"exercise_id": 2, "exer')
+
+        self.assertEqual(len(self.cache), 1)
+
+    def test_rebuild_matches_sync(self):
+        gpx_b = GPX_DATA.replace("2023-01-22", "2023-01-23")
+
+        # The tables as a sync writes them
+        exercise_materializer = ExerciseMaterializer(self.config["db"]["exercise"])
+        gpx_materializer = GpxMaterializer(self.config["db"]["route"])
+        for exercise, gpx in ((EXERCISE_DICT_A, GPX_DATA), (EXERCISE_DICT_B, gpx_b)):
+            self.cache.put(exercise, gpx)
+            exercise_materializer.add(exercise)
+            gpx_materializer.add(gpx, exercise["id"])
+        exercise_materializer.close()
+        gpx_materializer.close()
+
+        expected = {table: pd.read_parquet(self.config["db"][table]) for table in ("exercise", "route")}
+
+        # The current route table has other coordinates, but as many rows
+        expected["route"].assign(latitude=expected["route"]["latitude"] + 1.0).to_parquet(self.config["db"]["route"])
+        gpx_materializer.route_index().build()
+
+        stats = rebuild(self.config, workers=2, chunk_size=1)
+
+        self.assertEqual(stats["exercises"], 2)
+        for table in ("exercise", "route"):
+            pd.testing.assert_frame_equal(pd.read_parquet(self.config["db"][table]), expected[table])
+            self.assertFalse(os.path.exists(f"{self.config['db'][table]}.rebuild"))
+
+        # The sidecar moved in with the rebuilt table
+        route_index = GpxMaterializer(self.config["db"]["route"]).route_index()
+        self.assertFalse(os.path.exists(f"{self.config['db']['route']}.rebuild.cells.parquet"))
+        self.assertEqual(len(route_index.query(bbox=(64.0, 27.0, 64.2, 27.7))), len(expected["route"]))
+
+    def test_rebuild_route_simplified(self):
+        self.cache.put(EXERCISE_DICT_A, GPX_DATA)
+        self.config["db"]["route_simplified"] = os.path.join(self.test_dir, "route_simplified.parquet")
+        self.config["db"]["route_simplify"] = {"min_interval": "60s"}
+
+        rebuild(self.config, workers=1)
+
+        simplified = GpxMaterializer(self.config["db"]["route_simplified"]).route_index()
+        self.assertEqual(len(pd.read_parquet(simplified.path)), 2)
+        self.assertTrue(os.path.exists(simplified.sidecar_path))
+
+        # Without db.route_simplify, the table is not rebuilt, and the old one is removed with its sidecar
+        del self.config["db"]["route_simplify"]
+        rebuild(self.config, workers=1)
+
+        self.assertFalse(os.path.exists(simplified.path))
+        self.assertFalse(os.path.exists(simplified.sidecar_path))
+        self.assertTrue(os.path.exists(self.config["db"]["route"]))
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir, ignore_errors=True)
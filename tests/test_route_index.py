@@ -0,0 +1,164 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from unittest import mock, TestCase
+from exif_gps_mapper import GpxMaterializer
+from exif_gps_mapper.helpers.route_index import RouteIndex, grid_cells
+
+# Helsinki
+BBOX = (60.1, 24.9, 60.2, 25.0)
+
+
+def track(start: str, lat: tuple, lon: tuple, n: int = 1000) -> dict:
+    return {
+        "latitude": np.linspace(*lat, n),
+        "longitude": np.linspace(*lon, n),
+        "point_time": pd.date_range(start, periods=n, freq="s").to_numpy()
+    }
+
+
+class TestRouteIndex(TestCase):
+
+    def setUp(self):
+        # Dir
+        self.test_dir = "tests/test_data/TestRouteIndex"
+        if os.path.exists(self.test_dir):
+            shutil.rmtree(self.test_dir)
+        os.makedirs(self.test_dir)
+
+        self.tracks = {
+            # Inside the bbox
+            1: track("2023-01-10", (60.1, 60.2), (24.9, 25.0)),
+            # Passes by the bbox: its min/max box overlaps, its cells do not
+            2: track("2023-02-10", (60.0, 61.0), (24.0, 26.0)),
+            # Far away
+            3: track("2023-03-10", (65.0, 65.1), (25.4, 25.5))
+        }
+
+    def materialize(self, layout: str = "file") -> GpxMaterializer:
+        path = os.path.join(self.test_dir, "route" if layout == "partitioned" else "route.parquet")
+        gpx_materializer = GpxMaterializer(path, layout=layout, row_group_size=500)
+
+        # Added out of time order
+        for exercise_id in (3, 1, 2):
+            gpx_materializer.add_arrays(self.tracks[exercise_id], exercise_id)
+        gpx_materializer.close()
+
+        return gpx_materializer
+
+    def expected(self, bbox: tuple | None = None, start=None, end=None) -> pd.DataFrame:
+        df = pd.read_parquet(os.path.join(self.test_dir, "route.parquet"))
+
+        mask = pd.Series(True, index=df.index)
+        if bbox is not None:
+            mask &= df["latitude"].between(bbox[0], bbox[2]) & df["longitude"].between(bbox[1], bbox[3])
+        if start is not None:
+            mask &= df.index >= pd.Timestamp(start)
+        if end is not None:
+            mask &= df.index <= pd.Timestamp(end)
+
+        return df[mask]
+
+    def test_grid_cells(self):
+        cells = grid_cells(np.array([-90.0, 60.12, 60.12]), np.array([-180.0, 24.91, 180.0]), 0.05)
+
+        self.assertEqual(cells[0], 0)
+        self.assertEqual(cells[1], 3002 * 7200 + 4098)
+        self.assertEqual(cells[2], 3002 * 7200 + 7199)
+
+    def test_sorted_row_groups(self):
+        gpx_materializer = self.materialize()
+        df = pd.read_parquet(gpx_materializer.path)
+
+        self.assertTrue(df.index.is_monotonic_increasing)
+        self.assertEqual(list(df["exercise_id"].unique()), [1, 2, 3])
+        self.assertTrue(os.path.exists(gpx_materializer.route_index().sidecar_path))
+
+    def test_bbox_query_reads_matching_row_groups(self):
+        gpx_materializer = self.materialize()
+
+        df = gpx_materializer.query(bbox=BBOX)
+        pd.testing.assert_frame_equal(df, self.expected(bbox=BBOX))
+        self.assertEqual(set(df["exercise_id"]), {1})
+
+        # The row groups of exercise 2 are pruned by the cells, not by the statistics
+        index = gpx_materializer.route_index()
+        self.assertEqual(index.row_groups(bbox=BBOX), [0, 1])
+
+        os.remove(index.sidecar_path)
+        self.assertEqual(index.row_groups(bbox=BBOX), [0, 1, 2])
+
+    def test_time_range_query(self):
+        gpx_materializer = self.materialize()
+        start, end = "2023-02-10 00:05:00", "2023-02-10 00:09:59"
+
+        pd.testing.assert_frame_equal(gpx_materializer.query(start=start, end=end), self.expected(start=start, end=end))
+        self.assertEqual(gpx_materializer.route_index().row_groups(start=start, end=end), [2, 3])
+
+    def test_stale_sidecar_is_ignored(self):
+        gpx_materializer = self.materialize()
+        index = gpx_materializer.route_index()
+
+        # Written without close(): the sidecar no longer matches the file
+        gpx_materializer.add_arrays(track("2023-04-01", (60.15, 60.15), (24.95, 24.95), n=10), 4)
+        gpx_materializer.flush()
+
+        self.assertEqual(len(gpx_materializer.query(bbox=BBOX)), len(self.expected(bbox=BBOX)))
+        self.assertIn(4, set(gpx_materializer.query(bbox=BBOX)["exercise_id"]))
+        self.assertIsNone(index._cell_row_groups(pq.ParquetFile(index.path), BBOX))
+
+    def test_rewritten_coordinates_invalidate_sidecar(self):
+        self.materialize()
+        path = os.path.join(self.test_dir, "route.parquet")
+        index = RouteIndex(path)
+
+        # Same rows and row groups, but exercise 3 moved into the bbox behind the sidecar's back
+        df = pd.read_parquet(path)
+        moved = df["exercise_id"] == 3
+        df.loc[moved, "latitude"] -= 4.95
+        df.loc[moved, "longitude"] -= 0.5
+        df.to_parquet(path, row_group_size=500)
+
+        self.assertIsNone(index._cell_row_groups(pq.ParquetFile(path), BBOX))
+        self.assertIn(3, set(index.query(bbox=BBOX)["exercise_id"]))
+
+    def test_close_rebuilds_stale_sidecar_only(self):
+        self.materialize()
+        path = os.path.join(self.test_dir, "route.parquet")
+
+        with mock.patch.object(RouteIndex, "build", autospec=True, side_effect=RouteIndex.build) as mock_build:
+            # Nothing written in this session: the sidecar is current
+            GpxMaterializer(path, row_group_size=500).close()
+            self.assertEqual(mock_build.call_count, 0)
+
+            # Known points only: the table is written again with the same footer
+            gpx_materializer = GpxMaterializer(path, row_group_size=500)
+            gpx_materializer.add_arrays(self.tracks[1], 1)
+            gpx_materializer.close()
+            self.assertEqual(mock_build.call_count, 0)
+
+            gpx_materializer = GpxMaterializer(path, row_group_size=500)
+            gpx_materializer.add_arrays(track("2023-04-01", (60.15, 60.15), (24.95, 24.95), n=10), 4)
+            gpx_materializer.close()
+            self.assertEqual(mock_build.call_count, 1)
+
+        self.assertTrue(RouteIndex(path).is_current())
+
+    def test_partitioned_query(self):
+        self.materialize()
+        expected = self.expected(bbox=BBOX, start="2023-01-01", end="2023-02-28")
+
+        df = self.materialize("partitioned").query(bbox=BBOX, start="2023-01-01", end="2023-02-28")
+
+        pd.testing.assert_frame_equal(df, expected, check_index_type=False)
+
+    def test_empty_table(self):
+        gpx_materializer = GpxMaterializer(os.path.join(self.test_dir, "route.parquet"))
+        self.assertEqual(len(gpx_materializer.query(bbox=BBOX)), 0)
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir, ignore_errors=True)
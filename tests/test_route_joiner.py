@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+
+from unittest import TestCase
+from exif_gps_mapper import RouteJoiner
+from exif_gps_mapper.helpers.geo import haversine
+
+# Two exercises recorded in UTC+2 (120 minutes). Route points are stored in UTC.
+DF_EXERCISE = pd.DataFrame({
+    "id": [1, 2],
+    "transaction-id": [123, 123],
+    "start-time": pd.to_datetime(["2023-01-22T12:00:00", "2023-01-22T14:00:00"]),
+    "start-time-utc-offset": [120, 120],
+    "has-route": [True, True],
+    "detailed-sport-info": ["WALKING", "WALKING"]
+}).set_index("id")
+
+DF_ROUTE = pd.DataFrame({
+    "exercise_id": [1, 1, 1, 2, 2],
+    "latitude": [64.0, 64.1, 64.2, 65.0, 65.1],
+    "longitude": [27.0, 27.1, 27.2, 28.0, 28.1],
+    "point_time": pd.to_datetime([
+        "2023-01-22 10:00:00", "2023-01-22 10:01:00", "2023-01-22 10:02:00",
+        "2023-01-22 12:00:00", "2023-01-22 12:01:00"
+    ])
+}).set_index("point_time")
+
+DF_EXIF = pd.DataFrame({
+    "filepath": ["a.NEF", "b.NEF", "c.NEF", "d.NEF"],
+    "created": ["2023:01:22 12:01:00", "2023:01:22 12:01:30", "2023:01:22 14:00:00", "2023:01:22 18:00:00"],
+    "lat": [None, None, None, None],
+    "long": [None, None, None, None],
+    "lens": ["X", "X", "X", "X"]
+})
+
+
+class TestRouteJoiner(TestCase):
+
+    def test_exercise_windows_are_localized(self):
+        windows = RouteJoiner().exercise_windows(DF_EXERCISE, DF_ROUTE)
+
+        self.assertEqual(list(windows["exercise_id"]), [1, 2])
+        self.assertEqual(windows["local_start"].iloc[0], pd.Timestamp("2023-01-22 12:00:00"))
+        self.assertEqual(windows["local_end"].iloc[1], pd.Timestamp("2023-01-22 14:01:00"))
+
+    def test_nearest_join(self):
+        df = RouteJoiner(tolerance="60s").join(DF_EXIF, DF_EXERCISE, DF_ROUTE)
+
+        # Row order is preserved
+        self.assertEqual(list(df["filepath"]), list(DF_EXIF["filepath"]))
+
+        # Photo times are moved to UTC using the exercise offset
+        self.assertEqual(df["utc_time"].iloc[0], pd.Timestamp("2023-01-22 10:01:00"))
+
+        self.assertEqual(list(df["exercise_id"].iloc[:3]), [1, 1, 2])
+        self.assertEqual(df["latitude"].iloc[0], 64.1)
+        self.assertEqual(df["latitude"].iloc[2], 65.0)
+
+        # Outside every exercise
+        self.assertTrue(pd.isna(df["exercise_id"].iloc[3]))
+        self.assertTrue(pd.isna(df["latitude"].iloc[3]))
+
+    def test_overlapping_exercises(self):
+        # Exercise 3 starts inside exercise 1 and ends before it
+        df_exercise = pd.concat([
+            DF_EXERCISE, pd.DataFrame({"start-time-utc-offset": [120]}, index=pd.Index([3], name="id"))
+        ])
+        df_route = pd.concat([
+            DF_ROUTE.reset_index(),
+            pd.DataFrame({
+                "exercise_id": [3, 3],
+                "latitude": [66.0, 66.1],
+                "longitude": [29.0, 29.1],
+                "point_time": pd.to_datetime(["2023-01-22 10:00:10", "2023-01-22 10:00:20"])
+            })
+        ])
+        df_exif = pd.DataFrame({
+            "filepath": ["a.NEF", "b.NEF"],
+            "created": ["2023:01:22 12:00:15", "2023:01:22 12:02:00"]
+        })
+
+        # a.NEF is inside both and goes to the later one. b.NEF is only inside exercise 1.
+        df = RouteJoiner(tolerance="10s").join(df_exif, df_exercise, df_route)
+        self.assertEqual(list(df["exercise_id"]), [3, 1])
+        self.assertEqual(df["latitude"].iloc[1], 64.2)
+
+    def test_interpolated_join(self):
+        df = RouteJoiner(tolerance="60s", interpolate=True).join(DF_EXIF, DF_EXERCISE, DF_ROUTE)
+
+        # Halfway between 64.1 and 64.2
+        self.assertAlmostEqual(df["latitude"].iloc[1], 64.15)
+        self.assertAlmostEqual(df["longitude"].iloc[1], 27.15)
+
+        # Exact hit
+        self.assertAlmostEqual(df["latitude"].iloc[0], 64.1)
+
+    def test_bracket_join(self):
+        df = RouteJoiner(matcher="bracket", max_speed=None).join(DF_EXIF, DF_EXERCISE, DF_ROUTE)
+
+        # Exact hit
+        self.assertAlmostEqual(df["latitude"].iloc[0], 64.1)
+        self.assertEqual(df["time_gap"].iloc[0], 0)
+        self.assertEqual(df["confidence"].iloc[0], 1)
+
+        # Halfway between two points a minute apart
+        self.assertAlmostEqual(df["latitude"].iloc[1], 64.15)
+        self.assertEqual(df["time_gap"].iloc[1], 30)
+        self.assertAlmostEqual(df["confidence"].iloc[1], 0.9)
+        self.assertAlmostEqual(df["distance"].iloc[1], haversine(64.1, 27.1, 64.2, 27.2) / 2)
+
+        self.assertTrue(pd.isna(df["confidence"].iloc[3]))
+
+    def test_bracket_rejects_gaps_and_jumps(self):
+        # 12 km in a minute is a GPS jump
+        df = RouteJoiner(matcher="bracket").join(DF_EXIF, DF_EXERCISE, DF_ROUTE)
+        self.assertAlmostEqual(df["latitude"].iloc[1], 64.1)
+        self.assertEqual(df["distance"].iloc[1], 0)
+
+        # Too long a gap to interpolate, and the nearest point is outside the tolerance
+        df = RouteJoiner(tolerance="20s", matcher="bracket", max_gap="30s", max_speed=None).join(
+            DF_EXIF, DF_EXERCISE, DF_ROUTE
+        )
+        self.assertTrue(pd.isna(df["latitude"].iloc[1]))
+        self.assertAlmostEqual(df["latitude"].iloc[0], 64.1)
+
+    def test_bracket_matches_interpolation(self):
+        rng = np.random.default_rng(0)
+        n = 5000
+
+        df_route = pd.DataFrame({
+            "exercise_id": np.repeat([1, 2], n),
+            "latitude": 64 + np.cumsum(rng.normal(0, 1e-5, 2 * n)),
+            "longitude": 27 + np.cumsum(rng.normal(0, 1e-5, 2 * n)),
+            "point_time": np.concatenate([
+                pd.date_range("2023-01-22 10:00:00", periods=n, freq="2s"),
+                pd.date_range("2023-01-22 14:00:00", periods=n, freq="2s")
+            ])
+        })
+        df_exif = pd.DataFrame({
+            "filepath": [f"{i}.NEF" for i in range(1000)],
+            "created": (
+                pd.Timestamp("2023-01-22 12:00:00") + pd.to_timedelta(rng.integers(0, 6 * 3600, 1000), unit="s")
+            ).strftime("%Y:%m:%d %H:%M:%S")
+        })
+
+        bracket = RouteJoiner(matcher="bracket").join(df_exif, DF_EXERCISE, df_route)
+        interpolated = RouteJoiner(matcher="interpolate").join(df_exif, DF_EXERCISE, df_route)
+
+        self.assertGreater(bracket["latitude"].notna().sum(), 500)
+        np.testing.assert_allclose(bracket["latitude"], interpolated["latitude"])
+        np.testing.assert_allclose(bracket["longitude"], interpolated["longitude"])
@@ -0,0 +1,60 @@
+from unittest import mock, TestCase
+
+from exif_gps_mapper.accesslink.session import AccesslinkSession
+from exif_gps_mapper.accesslink.transaction import Transaction
+from tests.stub_server import StubAccesslink
+
+
+class TestAccesslinkSession(TestCase):
+
+    def setUp(self):
+        self.session = AccesslinkSession(max_retries=3, backoff_factor=0.01)
+
+    def test_endpoint_folds_ids(self):
+        endpoint = AccesslinkSession.endpoint(
+            "GET", "https://www.polaraccesslink.com/v3/users/12345678/exercise-transactions/123/exercises/456"
+        )
+        self.assertEqual(endpoint, "GET /v3/users/{id}/exercise-transactions/{id}/exercises/{id}")
+
+    def test_retries_transient_errors(self):
+        with StubAccesslink() as stub:
+            stub.responses = [(502, {}), (429, {"Retry-After": "0"}), (503, {})]
+            r = self.session.get(stub.exercise_urls(1)[0])
+
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json(), {"id": 0})
+        self.assertEqual(len(stub.requests), 4)
+
+        latency = self.session.latencies["GET /exercises/{id}"]
+        self.assertEqual(latency["count"], 4)
+        self.assertEqual(latency["retries"], 3)
+
+    def test_gives_up_after_max_retries(self):
+        with StubAccesslink() as stub:
+            stub.responses = [(502, {})] * 4
+            r = self.session.get(stub.exercise_urls(1)[0])
+
+        self.assertEqual(r.status_code, 502)
+        self.assertEqual(len(stub.requests), 4)
+
+    @mock.patch("exif_gps_mapper.accesslink.session.time.sleep")
+    def test_honours_retry_after(self, mock_sleep):
+        with StubAccesslink() as stub:
+            stub.responses = [(429, {"Retry-After": "7"})]
+            self.session.get(stub.exercise_urls(1)[0])
+
+        # The stub server sleeps too, with a zero delay
+        mock_sleep.assert_any_call(7.0)
+
+    def test_transaction_survives_transient_error(self):
+        with StubAccesslink() as stub:
+            stub.responses = [(502, {})]
+
+            transaction = Transaction("abc123", "def456", session=self.session)
+            transaction._exercise_urls = stub.exercise_urls(2)
+            returned = list(transaction)
+
+        self.assertEqual([exercise["id"] for exercise, _ in returned], [0, 1])
+
+    def tearDown(self) -> None:
+        self.session.close()
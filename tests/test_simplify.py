@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+from unittest import TestCase
+from exif_gps_mapper.helpers.simplify import mercator, pixel_degrees, rdp_mask, simplify_tracks, thin_by_distance, \
+    thin_by_time, thin_route
+
+
+class TestSimplify(TestCase):
+
+    def test_rdp_mask(self):
+        # A straight line with one corner
+        x = np.array([0, 1, 2, 3, 3, 3, 3], dtype="float64")
+        y = np.array([0, 0, 0, 0, 1, 2, 3], dtype="float64")
+        self.assertEqual(rdp_mask(x, y, 0.1).tolist(), [True, False, False, True, False, False, True])
+
+        # Small wiggles are removed, large ones are kept
+        y = np.array([0, 0.05, 0, 2, 0, -0.05, 0], dtype="float64")
+        x = np.arange(7, dtype="float64")
+        self.assertEqual(np.flatnonzero(rdp_mask(x, y, 0.1)).tolist(), [0, 2, 3, 4, 6])
+
+    def test_rdp_mask_groups(self):
+        # Two tracks simplified together are simplified as if they were separate
+        x = np.array([0, 1, 2, 10, 11, 12, 13], dtype="float64")
+        y = np.array([0, 1, 0, 0, 0, 0, 0], dtype="float64")
+        groups = np.array([1, 1, 1, 2, 2, 2, 2])
+
+        self.assertEqual(rdp_mask(x, y, 0.1, groups).tolist(), [True, True, True, True, False, False, True])
+        self.assertEqual(rdp_mask(x[:1], y[:1], 0.1).tolist(), [True])
+        self.assertEqual(rdp_mask(x[:0], y[:0], 0.1).tolist(), [])
+
+    def test_simplify_tracks_by_zoom(self):
+        rng = np.random.default_rng(0)
+        latitude = 60 + rng.normal(0, 1e-4, 1000).cumsum()
+        longitude = 25 + rng.normal(0, 1e-4, 1000).cumsum()
+
+        kept = [simplify_tracks(latitude, longitude, None, zoom).sum() for zoom in (8, 12, 16)]
+        self.assertTrue(kept[0] < kept[1] < kept[2] <= 1000)
+
+        # Equator: one degree of longitude is one degree in Web Mercator
+        self.assertAlmostEqual(mercator(np.array([0.0]), np.array([1.0]))[1][0], 0.0)
+        self.assertAlmostEqual(pixel_degrees(0), 360 / 256)
+
+    def test_thin_by_time(self):
+        point_time = pd.Timestamp("2023-01-22 12:00") + pd.to_timedelta([0, 1, 2, 5, 6, 11, 0, 3, 4], unit="s")
+        groups = np.array([1, 1, 1, 1, 1, 1, 2, 2, 2])
+
+        # One point per 5 s of each track, plus the last point of each track
+        keep = thin_by_time(point_time.to_numpy(), groups, "5s")
+        self.assertEqual(np.flatnonzero(keep).tolist(), [0, 3, 5, 6, 8])
+        self.assertEqual(thin_by_time(point_time[:0].to_numpy(), None, "5s").tolist(), [])
+
+    def test_thin_by_distance(self):
+        # Points 1.11 m apart along a meridian, in two tracks
+        latitude = 60 + np.r_[np.arange(10), np.arange(3)] * 1e-5
+        longitude = np.full(13, 25.0)
+        groups = np.r_[np.ones(10), np.full(3, 2)]
+
+        keep = thin_by_distance(latitude, longitude, groups, 5.0)
+        self.assertEqual(np.flatnonzero(keep).tolist(), [0, 5, 9, 10, 12])
+
+    def test_thin_route(self):
+        rng = np.random.default_rng(0)
+        n = 3600
+        point_time = (pd.Timestamp("2023-01-22 12:00") + pd.to_timedelta(np.arange(n), unit="s")).to_numpy()
+        latitude = 60 + rng.normal(0, 2e-5, n).cumsum()
+        longitude = 25 + rng.normal(0, 2e-5, n).cumsum()
+        groups = np.repeat([1, 2], n // 2)
+
+        by_time = thin_route(latitude, longitude, point_time, groups, min_interval="10s")
+        both = thin_route(latitude, longitude, point_time, groups, min_interval="10s", tolerance=5.0)
+
+        self.assertEqual(by_time.sum(), 2 * (180 + 1))
+        self.assertTrue(both.sum() < by_time.sum())
+        self.assertFalse((both & ~by_time).any())
+
+        # Ends of each track are kept, and nothing is removed without a step
+        self.assertTrue(both[[0, n // 2 - 1, n // 2, n - 1]].all())
+        self.assertTrue(thin_route(latitude, longitude, point_time, groups).all())
@@ -1,6 +1,9 @@
+import time
+
 from unittest import mock, TestCase
 
 from exif_gps_mapper.accesslink.transaction import Transaction
+from tests.stub_server import StubAccesslink
 
 
 class TestTransactionIterator(TestCase):
@@ -25,3 +28,79 @@ class TestTransactionIterator(TestCase):
         returned = [t for t in transaction]
 
         self.assertEqual(returned, expected)
+
+    @mock.patch.object(Transaction, "_get_exercise")
+    @mock.patch.object(Transaction, "_get_gpx")
+    def test_concurrent_iterator_keeps_order(self, mock_get_gpx, mock_get_exercise):
+        exercise_urls = [f"{i}.com" for i in range(20)]
+
+        # Answers depend on the url, since the calls happen in any order
+        mock_get_exercise.side_effect = lambda url: {"id": url}
+        mock_get_gpx.side_effect = lambda url: f"<?xml?>{url}"
+
+        transaction = Transaction("abc123", "def456", max_workers=4)
+        transaction._exercise_urls = exercise_urls
+
+        returned = [t for t in transaction]
+
+        self.assertEqual(returned, [({"id": url}, f"<?xml?>{url}") for url in exercise_urls])
+        self.assertTrue(transaction.completed)
+
+    @mock.patch.object(Transaction, "_get_exercise")
+    @mock.patch.object(Transaction, "_get_gpx")
+    def test_does_not_commit_after_failed_fetch(self, mock_get_gpx, mock_get_exercise):
+        mock_get_exercise.side_effect = lambda url: {"id": url}
+        mock_get_gpx.side_effect = ConnectionError("502")
+
+        transaction = Transaction("abc123", "def456", max_workers=4)
+        transaction._exercise_urls = ["a.com", "b.com"]
+
+        with self.assertRaises(ConnectionError):
+            list(transaction)
+
+        with self.assertRaises(RuntimeError):
+            transaction.commit()
+
+    @mock.patch.object(Transaction, "_get_exercise")
+    @mock.patch.object(Transaction, "_get_gpx")
+    def test_close_stops_prefetch_and_session(self, mock_get_gpx, mock_get_exercise):
+        mock_get_exercise.side_effect = lambda url: {"id": url}
+        mock_get_gpx.side_effect = lambda url: f"<?xml?>{url}"
+
+        with mock.patch("exif_gps_mapper.accesslink.transaction.AccesslinkSession") as mock_session:
+            with Transaction("abc123", "def456", max_workers=4) as transaction:
+                transaction._exercise_urls = [f"{i}.com" for i in range(20)]
+                next(transaction)
+                self.assertIsNotNone(transaction._executor)
+
+        # Only part of the transaction was read
+        self.assertIsNone(transaction._executor)
+        mock_session.return_value.close.assert_called_once()
+
+    def test_shared_session_is_not_closed(self):
+        session = mock.Mock()
+
+        Transaction("abc123", "def456", session=session).close()
+        session.close.assert_not_called()
+
+
+class TestTransactionStubServer(TestCase):
+
+    def fetch_all(self, stub: StubAccesslink, max_workers: int, ordered: bool = True) -> tuple[list, float]:
+        transaction = Transaction("abc123", "def456", max_workers=max_workers, ordered=ordered)
+        transaction._exercise_urls = stub.exercise_urls(10)
+
+        started = time.perf_counter()
+        returned = list(transaction)
+        return returned, time.perf_counter() - started
+
+    def test_concurrent_fetch_is_faster_than_serial(self):
+        with StubAccesslink(delay=0.05) as stub:
+            serial, serial_seconds = self.fetch_all(stub, max_workers=1)
+            concurrent, concurrent_seconds = self.fetch_all(stub, max_workers=5)
+            unordered, _ = self.fetch_all(stub, max_workers=5, ordered=False)
+
+        # 20 requests of 50 ms: about 1 s serially, about 0.2 s with five workers
+        self.assertEqual(concurrent, serial)
+        self.assertCountEqual(unordered, serial)
+        self.assertLess(concurrent_seconds * 2.5, serial_seconds)
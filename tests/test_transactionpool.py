@@ -1,5 +1,5 @@
 from unittest import mock, TestCase
-from exif_gps_mapper.accesslink.transaction_pool import TransactionPool, Singleton
+from exif_gps_mapper.accesslink.transaction_pool import TransactionPool
 
 
 class TestTransactionPoolIterator(TestCase):
@@ -58,5 +58,23 @@ class TestTransactionPoolIterator(TestCase):
         excepted = pool.max_round_trips
         self.assertEqual(actual_loop_count, excepted)
 
+    def test_pools_are_per_user(self):
+        pool_a = TransactionPool.for_user("token_a", "user_a")
+        pool_b = TransactionPool.for_user("token_b", "user_b")
+
+        self.assertIsNot(pool_a, pool_b)
+        self.assertEqual(pool_b.user_id, "user_b")
+        self.assertIs(TransactionPool.for_user("token_a", "user_a"), pool_a)
+
+    def test_from_config(self):
+        config = {"accesslink": {"max_workers": 8, "ordered": False}}
+        pool = TransactionPool.from_config(config, "token", "user")
+
+        self.assertEqual((pool.max_workers, pool.ordered), (8, False))
+        self.assertEqual((pool.get_transaction().max_workers, pool.get_transaction().ordered), (8, False))
+
+        # Settings left out keep the defaults
+        self.assertEqual(TransactionPool.from_config({"accesslink": {}}, "token", "other").max_workers, 1)
+
     def tearDown(self) -> None:
-        Singleton._instances = {}
\ No newline at end of file
+        TransactionPool._registry = {}
\ No newline at end of file